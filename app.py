@@ -7,6 +7,7 @@ import argparse
 from dotenv import load_dotenv
 
 from rag.pipeline import RAGPipeline
+from rag.warmup import ModelWarmup
 
 
 def main():
@@ -48,11 +49,40 @@ def main():
         action="store_true",
         help="Use full documents instead of vector search"
     )
+    parser.add_argument(
+        "--retrieval-mode",
+        choices=["vector", "hybrid", "mmr"],
+        default="vector",
+        help="Retrieval mode: vector search, hybrid vector and BM25 search, or vector search "
+             "without near-duplicate chunks (mmr) (default: vector)"
+    )
+    parser.add_argument(
+        "--k",
+        type=int,
+        default=8,
+        help="Number of chunks retrieved per query (default: 8)"
+    )
+    parser.add_argument(
+        "--sharded",
+        action="store_true",
+        help="Store each Akte in its own Chroma collection (must match between ingest and query)"
+    )
     parser.add_argument(
         "--stream",
         action="store_true",
         help="Stream the answers in real-time"
     )
+    parser.add_argument(
+        "--warmup-num-ctx",
+        type=int,
+        default=0,
+        help="Context window the LLM is loaded with at startup (default: the one of a --k chunk query)"
+    )
+    parser.add_argument(
+        "--no-warmup",
+        action="store_true",
+        help="Do not load the models in the background at startup"
+    )
     args = parser.parse_args()
     
     # Initialize the pipeline
@@ -60,9 +90,20 @@ def main():
         pdf_directory=args.pdf_dir,
         vector_store_dir=args.vector_store_dir,
         embedding_model=args.embedding_model,
-        llm_model=args.llm_model
+        llm_model=args.llm_model,
+        retrieval_mode=args.retrieval_mode,
+        retrieval_k=args.k,
+        sharded=args.sharded
     )
     
+    # Load the models in the background while documents are checked and the first query is typed
+    if not args.no_warmup:
+        ModelWarmup(
+            pipeline.ollama_llm,
+            pipeline.vector_store,
+            num_ctx=args.warmup_num_ctx or pipeline.retrieval_num_ctx()
+        ).start()
+    
     # Ingest documents if requested
     if args.ingest:
         print(f"Ingesting documents from {args.pdf_dir}...")
@@ -144,9 +185,9 @@ def main():
                 print("No documents loaded")
             continue
         
-        # Check if user wants to use a specific document
+        # Check if user wants to use a specific document (or retrieve from it only)
         doc_name = None
-        if use_full_docs and query.lower().startswith("doc:"):
+        if query.lower().startswith("doc:"):
             parts = query.split(" ", 1)
             if len(parts) >= 2:
                 doc_spec = parts[0].strip()[4:]  # Remove "doc:"
@@ -166,7 +207,7 @@ def main():
             if use_full_docs:
                 answer = pipeline.query_with_full_document(query, doc_name, stream=stream_output)
             else:
-                answer = pipeline.query(query, stream=stream_output)
+                answer = pipeline.query(query, source=doc_name, stream=stream_output)
                 
             # Only print the answer if not streaming (streaming already prints)
             if not stream_output:
@@ -0,0 +1,125 @@
+"""
+Production server for the web application.
+
+Serves the streaming endpoints natively on an asyncio event loop, so
+thousands of clients can follow their jobs without a thread each, and
+mounts the Flask application for all other routes (upload, downloads,
+status). Run with `python asgi_app.py` or `uvicorn asgi_app:app`.
+
+Jobs run on the worker threads of the imported web application, so the
+server must run as a single process; one event loop serves all streams.
+"""
+import json
+import os
+
+import uvicorn
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+
+from web_app import (
+    app as flask_app,
+    job_store,
+    job_manager,
+    model_warmup,
+    pipeline,
+    query_event_payload,
+    WEB_HOST,
+    WEB_PORT
+)
+
+# Seconds without events after which a stream sends a heartbeat, so proxies keep it open
+SSE_HEARTBEAT_SECONDS = float(os.getenv('SSE_HEARTBEAT_SECONDS', '15'))
+
+# Threads serving the mounted Flask routes (uploads and downloads)
+ASGI_WSGI_THREADS = int(os.getenv('ASGI_WSGI_THREADS', '8'))
+
+# Headers that stop proxies from buffering streamed responses
+STREAM_HEADERS = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+
+
+async def process_job(request):
+    """Stream the events of a job as NDJSON, replaying from the given offset."""
+    job_id = request.path_params['job_id']
+    if job_store.get(job_id) is None:
+        return JSONResponse({"error": "Job not found"}, status_code=404)
+    
+    job_store.touch(job_id)
+    offset = int(request.query_params.get('offset', 0))
+    
+    async def stream_events():
+        async for event in job_manager.astream(job_id, offset, idle_timeout=SSE_HEARTBEAT_SECONDS):
+            # Empty lines are skipped by NDJSON readers and keep the connection alive
+            yield "\n" if event is None else json.dumps(event) + "\n"
+    
+    return StreamingResponse(stream_events(), media_type='application/x-ndjson', headers=STREAM_HEADERS)
+
+
+async def job_events(request):
+    """
+    Stream the events of a job as server-sent events.
+    
+    Each event carries its event_id as SSE id, so EventSource reconnects
+    resume after the last received event via the Last-Event-ID header. An
+    "end" event marks the finished job.
+    """
+    job_id = request.path_params['job_id']
+    if job_store.get(job_id) is None:
+        return JSONResponse({"error": "Job not found"}, status_code=404)
+    
+    job_store.touch(job_id)
+    last_event_id = request.headers.get('last-event-id')
+    if last_event_id is not None and last_event_id.isdigit():
+        offset = int(last_event_id) + 1
+    else:
+        offset = int(request.query_params.get('offset', 0))
+    
+    async def stream_events():
+        yield "retry: 2000\n\n"
+        async for event in job_manager.astream(job_id, offset, idle_timeout=SSE_HEARTBEAT_SECONDS):
+            if event is None:
+                yield ": heartbeat\n\n"
+            else:
+                yield f"id: {event['event_id']}\ndata: {json.dumps(event)}\n\n"
+        yield "event: end\ndata: {}\n\n"
+    
+    return StreamingResponse(stream_events(), media_type='text/event-stream', headers=STREAM_HEADERS)
+
+
+async def query_documents(request):
+    """Answer a question about the ingested Akten, streaming the answer as NDJSON."""
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        data = {}
+    query = (data.get('query') or '').strip()
+    if not query:
+        return JSONResponse({"error": "No query provided"}, status_code=400)
+    if not model_warmup.ready.is_set():
+        return JSONResponse(
+            {"error": "Models are still loading, retry shortly"},
+            status_code=503,
+            headers={'Retry-After': '10'}
+        )
+    
+    async def stream_events():
+        async for event in pipeline.astream_query(query, data.get('source')):
+            yield json.dumps(query_event_payload(event)) + "\n"
+    
+    return StreamingResponse(stream_events(), media_type='application/x-ndjson', headers=STREAM_HEADERS)
+
+
+app = Starlette(routes=[
+    Route('/process/{job_id}', process_job),
+    Route('/events/{job_id}', job_events),
+    Route('/query', query_documents, methods=['POST']),
+    Mount('/', app=WSGIMiddleware(flask_app, workers=ASGI_WSGI_THREADS))
+])
+
+
+if __name__ == '__main__':
+    print(f"Starting ASGI server on {WEB_HOST}:{WEB_PORT}")
+    uvicorn.run(app, host=WEB_HOST, port=WEB_PORT)
@@ -0,0 +1,259 @@
+#!/usr/bin/env python
+"""
+Local stand-in for Ollama servers, for testing the multi-host pool.
+
+Starts one or more HTTP servers that answer the Ollama endpoints the
+application uses (/api/generate, /api/embed, /api/tags, /api/ps) without a
+GPU. They simulate what matters for routing: loading a model takes time,
+every request occupies one of a limited number of slots, and prompt prefill
+is only paid for the part of a prompt that does not continue a prompt the
+server has seen before (Ollama's prompt cache). Answers are a short fixed
+text and embeddings are derived from a hash of the input, so the servers
+are only useful for measuring routing, not answer quality.
+
+GET /fake/stats reports the requests, prefilled and cached prompt
+characters and model loads of a server; POST /fake/reset clears them
+together with the loaded models and the prompt cache.
+"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Text streamed as the answer to every prompt
+ANSWER_WORDS = ["Dies", "ist", "eine", "Testantwort", "des", "lokalen", "Ollama-Ersatzes."]
+
+
+class FakeOllama:
+    """
+    State of one simulated Ollama server.
+    """
+    
+    def __init__(self, args):
+        """
+        Initialize the server state.
+        
+        Args:
+            args: Parsed command line arguments
+        """
+        self.args = args
+        self.slots = threading.Semaphore(args.parallel)
+        self.lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        """
+        Unload all models and clear the prompt cache and statistics.
+        """
+        with self.lock:
+            self.loaded = {}
+            self.cached_prompts = []
+            self.stats = {"requests": 0, "prefill_chars": 0, "cached_chars": 0, "loads": 0}
+    
+    def load(self, model, options):
+        """
+        Load a model, or reload it if its context window changed.
+        
+        Args:
+            model: Model name
+            options: Request options
+        """
+        num_ctx = (options or {}).get("num_ctx")
+        with self.lock:
+            if model in self.loaded and self.loaded[model] == num_ctx:
+                return
+            self.loaded[model] = num_ctx
+            self.stats["loads"] += 1
+        time.sleep(self.args.load_seconds)
+    
+    def prefill(self, prompt):
+        """
+        Simulate the prefill of a prompt, reusing the longest cached prefix.
+        
+        Args:
+            prompt: Prompt string
+        
+        Returns:
+            Number of prompt characters evaluated
+        """
+        with self.lock:
+            cached = max((common_prefix(prompt, seen) for seen in self.cached_prompts), default=0)
+            self.cached_prompts = ([prompt] + [seen for seen in self.cached_prompts if seen != prompt])[:self.args.parallel]
+            self.stats["requests"] += 1
+            self.stats["prefill_chars"] += len(prompt) - cached
+            self.stats["cached_chars"] += cached
+        time.sleep((len(prompt) - cached) / 1000 * self.args.prefill_ms_per_kchar / 1000)
+        return len(prompt) - cached
+
+
+def common_prefix(a, b):
+    """
+    Get the length of the common prefix of two strings.
+    
+    Args:
+        a: First string
+        b: Second string
+    
+    Returns:
+        Number of equal leading characters
+    """
+    n = min(len(a), len(b))
+    i = 0
+    while i < n and a[i] == b[i]:
+        i += 1
+    return i
+
+
+def embed(text, dim):
+    """
+    Derive a deterministic embedding vector from a text.
+    
+    Args:
+        text: Text to embed
+        dim: Vector dimension
+    
+    Returns:
+        Embedding vector
+    """
+    digest = hashlib.sha256(text.encode("utf-8")).digest()
+    return [(digest[i % len(digest)] / 255.0) - 0.5 for i in range(dim)]
+
+
+def make_handler(server):
+    """
+    Create the request handler class of a server.
+    
+    Args:
+        server: FakeOllama state
+    
+    Returns:
+        Request handler class
+    """
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        
+        def log_message(self, *args):
+            """Keep the console quiet."""
+        
+        def send_json(self, obj, status=200):
+            """Send a JSON response."""
+            body = json.dumps(obj).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def send_chunk(self, obj):
+            """Send one NDJSON line of a chunked streaming response."""
+            data = (json.dumps(obj) + "\n").encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+        
+        def do_GET(self):
+            """Answer the model listing and statistics endpoints."""
+            if self.path == "/api/tags":
+                self.send_json({"models": [{"name": name, "model": name} for name in server.loaded]})
+            elif self.path == "/api/ps":
+                self.send_json({"models": [
+                    {"name": name, "model": name, "context_length": num_ctx}
+                    for name, num_ctx in server.loaded.items()
+                ]})
+            elif self.path == "/api/version":
+                self.send_json({"version": "0.0.0-fake"})
+            elif self.path == "/fake/stats":
+                with server.lock:
+                    self.send_json(dict(server.stats))
+            else:
+                self.send_json({"error": "not found"}, 404)
+        
+        def do_POST(self):
+            """Answer the embedding, generation and reset endpoints."""
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            if self.path == "/api/embed":
+                self.handle_embed(request)
+            elif self.path == "/fake/reset":
+                server.reset()
+                self.send_json({})
+            elif self.path == "/api/generate":
+                self.handle_generate(request)
+            else:
+                self.send_json({"error": "not found"}, 404)
+        
+        def handle_embed(self, request):
+            """Embed the input texts."""
+            texts = request.get("input", "")
+            texts = [texts] if isinstance(texts, str) else texts
+            with server.slots:
+                server.load(request["model"], None)
+                self.send_json({"model": request["model"], "embeddings": [embed(text, server.args.dim) for text in texts]})
+        
+        def handle_generate(self, request):
+            """Load the model for an empty prompt, otherwise answer it."""
+            prompt = request.get("prompt", "")
+            with server.slots:
+                server.load(request["model"], request.get("options"))
+                prefilled = server.prefill(prompt) if prompt else 0
+                done = {
+                    "model": request["model"],
+                    "response": "",
+                    "done": True,
+                    "done_reason": "load" if not prompt else "stop",
+                    "prompt_eval_count": prefilled // 4
+                }
+                if not prompt or not request.get("stream", True):
+                    done["response"] = "" if not prompt else " ".join(ANSWER_WORDS)
+                    self.send_json(done)
+                    return
+                
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for word in ANSWER_WORDS:
+                    time.sleep(1 / server.args.tokens_per_second)
+                    self.send_chunk({"model": request["model"], "response": word + " ", "done": False})
+                self.send_chunk(done)
+                self.wfile.write(b"0\r\n\r\n")
+    
+    return Handler
+
+
+def main():
+    """
+    Main function to run the fake servers.
+    """
+    parser = argparse.ArgumentParser(description="Run local stand-ins for Ollama servers")
+    parser.add_argument("--port", type=int, default=11434, help="Port of the first server (default: 11434)")
+    parser.add_argument("--hosts", type=int, default=1, help="Number of servers on consecutive ports (default: 1)")
+    parser.add_argument("--parallel", type=int, default=1, help="Requests served at the same time per server (default: 1)")
+    parser.add_argument("--load-seconds", type=float, default=2.0, help="Time to load a model (default: 2.0)")
+    parser.add_argument(
+        "--prefill-ms-per-kchar",
+        type=float,
+        default=20.0,
+        help="Prefill time per 1000 uncached prompt characters in ms (default: 20)"
+    )
+    parser.add_argument("--tokens-per-second", type=float, default=50.0, help="Generation speed (default: 50)")
+    parser.add_argument("--dim", type=int, default=768, help="Embedding dimension (default: 768)")
+    args = parser.parse_args()
+    
+    servers = []
+    for i in range(args.hosts):
+        server = ThreadingHTTPServer(("127.0.0.1", args.port + i), make_handler(FakeOllama(args)))
+        servers.append(server)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        print(f"Fake Ollama listening on http://127.0.0.1:{args.port + i}", flush=True)
+    
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        for server in servers:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+"""
+Benchmark the prompt tokens saved by MMR retrieval.
+
+Runs every query against the ingested vector store with plain similarity
+search and with maximal marginal relevance and reports, per query, the
+context tokens of the retrieved chunks, how many of them repeat text of
+another retrieved chunk (the chunk overlap of neighbouring chunks) and how
+many distinct pages are covered. The saved tokens are the duplicate tokens
+MMR avoids for the same number of chunks.
+"""
+import argparse
+import os
+import sys
+from difflib import SequenceMatcher
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rag.llm import OllamaWrapper
+from rag.vector_store import ChromaVectorStore, VECTOR_RETRIEVAL, MMR_RETRIEVAL
+
+DEFAULT_QUERIES = [
+    "Wer war an dem Unfall beteiligt?",
+    "Wie hoch ist der Schaden am Fahrzeug?",
+    "Wurde eine Blutprobe entnommen?",
+    "Was haben die Zeugen ausgesagt?",
+    "Wer ist der Versicherer des Unfallgegners?"
+]
+
+# Shortest repeated text counted as duplicate (shorter matches are common phrases)
+MIN_DUPLICATE_CHARS = 50
+
+
+def duplicate_tokens(documents, llm):
+    """
+    Count the tokens of text that repeats text of an earlier retrieved chunk.
+    
+    Args:
+        documents: Retrieved chunks in rank order
+        llm: OllamaWrapper used for token estimates
+    
+    Returns:
+        Estimated duplicate tokens
+    """
+    tokens = 0
+    for i, doc in enumerate(documents):
+        longest = ""
+        for earlier in documents[:i]:
+            matcher = SequenceMatcher(None, earlier.page_content, doc.page_content, autojunk=False)
+            match = matcher.find_longest_match(0, len(earlier.page_content), 0, len(doc.page_content))
+            if match.size > len(longest):
+                longest = doc.page_content[match.b:match.b + match.size]
+        if len(longest) >= MIN_DUPLICATE_CHARS:
+            tokens += llm.token_counter.count(longest)
+    return tokens
+
+
+def measure(store, llm, query, mode, k):
+    """
+    Retrieve chunks for a query and measure them.
+    
+    Args:
+        store: Vector store to search
+        llm: OllamaWrapper used for token estimates
+        query: Query string
+        mode: Retrieval mode
+        k: Number of chunks
+    
+    Returns:
+        Tuple of (context tokens, duplicate tokens, distinct pages)
+    """
+    documents = store.search(query, mode, k)
+    pages = {(doc.metadata.get("source"), doc.metadata.get("page")) for doc in documents}
+    return llm.count_context_tokens(documents), duplicate_tokens(documents, llm), len(pages)
+
+
+def main():
+    """
+    Main function to run the benchmark.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the tokens saved by MMR retrieval")
+    parser.add_argument("queries", nargs="*", help="Queries to run (default: a few Akte questions)")
+    parser.add_argument("--vector-store-dir", default="data/chroma", help="Vector store directory (default: data/chroma)")
+    parser.add_argument(
+        "--embedding-model",
+        default="jina/jina-embeddings-v2-base-de",
+        help="Ollama embedding model (default: jina/jina-embeddings-v2-base-de)"
+    )
+    parser.add_argument("--k", type=int, default=8, help="Chunks retrieved per query (default: 8)")
+    args = parser.parse_args()
+    
+    store = ChromaVectorStore(persist_directory=args.vector_store_dir, embedding_model=args.embedding_model)
+    if not store.count():
+        sys.exit(f"No documents in {args.vector_store_dir}, run ingest.py first")
+    llm = OllamaWrapper()
+    
+    saved = []
+    for query in args.queries or DEFAULT_QUERIES:
+        vector = measure(store, llm, query, VECTOR_RETRIEVAL, args.k)
+        mmr = measure(store, llm, query, MMR_RETRIEVAL, args.k)
+        saved.append(vector[1] - mmr[1])
+        print(f"\n{query}")
+        for name, (tokens, duplicates, pages) in ((VECTOR_RETRIEVAL, vector), (MMR_RETRIEVAL, mmr)):
+            print(f"  {name:>6}: {tokens:>6} tokens, {duplicates:>5} duplicate tokens, {pages} pages")
+        print(f"  Saved with mmr: {saved[-1]} tokens")
+    
+    print(f"\nAverage duplicate tokens saved per query with mmr: {sum(saved) / len(saved):.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+"""
+Benchmark routing the questions of several Akten over a pool of Ollama hosts.
+
+Answers every question-specific prompt for every given PDF, with the
+questions of all Akten interleaved as concurrent uploads would send them,
+once routed by load only and once with prompt-prefix affinity. Reports the
+wall time, the requests per host and failovers, and, against the fake
+servers of benchmarks/fake_ollama.py, how many prompt characters each host
+prefilled and how many it reused from its prompt cache:
+
+    python benchmarks/fake_ollama.py --hosts 3 --port 11500
+    python benchmarks/ollama_pool_benchmark.py a.pdf b.pdf c.pdf \\
+        --hosts http://127.0.0.1:11500,http://127.0.0.1:11501,http://127.0.0.1:11502
+
+Add the URL of a host that is not running to see requests fail over.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rag.document_loader import PDFProcessor
+from rag.llm import OllamaWrapper
+from rag.ollama_pool import OllamaPool, parse_hosts
+from rag.prompts import QUESTION_INSTRUCTIONS
+
+
+def fake_stats(hosts, reset=False):
+    """
+    Get (or reset) the statistics of fake Ollama servers.
+    
+    Args:
+        hosts: Host URLs
+        reset: Whether to reset the servers instead
+    
+    Returns:
+        Statistics per host URL; hosts that are not fake servers are left out
+    """
+    stats = {}
+    for host in hosts:
+        try:
+            if reset:
+                httpx.post(f"{host}/fake/reset", timeout=5)
+            else:
+                response = httpx.get(f"{host}/fake/stats", timeout=5)
+                if response.status_code == 200:
+                    stats[host] = response.json()
+        except httpx.HTTPError:
+            pass
+    return stats
+
+
+def run(args, documents, sticky_slack):
+    """
+    Answer all prompts through a fresh pool.
+    
+    Args:
+        args: Parsed command line arguments
+        documents: Loaded PDF documents
+        sticky_slack: Sticky slack of the pool (None routes by load only)
+    
+    Returns:
+        Tuple of (wall seconds, pool statistics, fake server statistics)
+    """
+    hosts = parse_hosts(args.hosts)
+    fake_stats(hosts, reset=True)
+    pool = OllamaPool(hosts, sticky_slack=sticky_slack, cooldown_seconds=60)
+    llm = OllamaWrapper(model_name=args.llm_model, num_ctx=args.num_ctx, context_buckets=None, pool=pool)
+    
+    # The n-th question of every Akte before the (n+1)-th, like concurrent uploads
+    contexts = [llm.format_context([document]) for document in documents]
+    prompts = [
+        llm.build_prompt(context, question, question)
+        for question in QUESTION_INSTRUCTIONS
+        for context in contexts
+    ]
+    
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(llm.invoke, prompts))
+    return time.perf_counter() - started, pool.stats(), fake_stats(hosts)
+
+
+def main():
+    """
+    Main function to run the benchmark.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark load-only and prefix-affine routing over Ollama hosts")
+    parser.add_argument("pdfs", nargs="+", help="PDF files (one Akte each)")
+    parser.add_argument("--hosts", required=True, help="Comma-separated Ollama host URLs")
+    parser.add_argument("--llm-model", default="qwq:32b", help="Ollama model (default: qwq:32b)")
+    parser.add_argument("--num-ctx", type=int, default=98304, help="Context window size (default: 98304)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Requests in flight (default: 4)")
+    parser.add_argument("--sticky-slack", type=int, default=1, help="Sticky slack of the affine run (default: 1)")
+    args = parser.parse_args()
+    
+    processor = PDFProcessor()
+    documents = [processor.load_single_document(pdf) for pdf in args.pdfs]
+    if not all(documents):
+        sys.exit("Could not load all PDFs")
+    
+    for name, sticky_slack in (("load only", None), ("prefix-affine", args.sticky_slack)):
+        seconds, pool_stats, server_stats = run(args, documents, sticky_slack)
+        print(f"\n{name}: {seconds:.1f}s, {pool_stats['failovers']} failovers")
+        for host, host_stats in pool_stats["hosts"].items():
+            line = f"  {host}: {host_stats['requests']} requests, {host_stats['failures']} failures"
+            if host in server_stats:
+                prefilled = server_stats[host]["prefill_chars"]
+                cached = server_stats[host]["cached_chars"]
+                share = cached / (prefilled + cached) if prefilled + cached else 0
+                line += f", {prefilled} chars prefilled, {cached} from cache ({share:.0%})"
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+"""
+Benchmark the prefill time of the classic and context-first prompt layouts.
+
+Runs every question-specific prompt against one PDF in both layouts and
+reports how many prompt tokens Ollama had to evaluate per question and how
+long that took. With the context first, every question after the first one
+should only prefill its instructions because the document prefix is reused
+from Ollama's prompt cache.
+"""
+import argparse
+import os
+import sys
+
+from ollama import Client
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rag.document_loader import PDFProcessor
+from rag.llm import OllamaWrapper
+from rag.prompts import PROMPT_LAYOUTS, QUESTION_INSTRUCTIONS
+
+
+def run_layout(client, llm, context, layout):
+    """
+    Send every question prompt in one layout and collect prefill statistics.
+    
+    Args:
+        client: Ollama client
+        llm: OllamaWrapper configured for the layout
+        context: Formatted document context
+        layout: Name of the layout
+        
+    Returns:
+        List of (prompt tokens evaluated, prefill seconds) per question
+    """
+    results = []
+    for question in QUESTION_INSTRUCTIONS:
+        prompt = llm.build_prompt(context, question, question)
+        response = client.generate(
+            model=llm.model_name,
+            prompt=prompt,
+            keep_alive=llm.keep_alive,
+            options={"num_ctx": llm.num_ctx, "temperature": llm.temperature, "num_predict": 1}
+        )
+        tokens = response.get("prompt_eval_count") or 0
+        seconds = (response.get("prompt_eval_duration") or 0) / 1e9
+        results.append((tokens, seconds))
+        print(f"  [{layout}] {tokens:>7} prompt tokens, {seconds:7.2f}s prefill - {question[:50]}")
+    return results
+
+
+def main():
+    """
+    Main function to run the benchmark.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark prompt layouts for prefix caching")
+    parser.add_argument("pdf", help="PDF file to use as context")
+    parser.add_argument("--llm-model", default="qwq:32b", help="Ollama model (default: qwq:32b)")
+    parser.add_argument("--num-ctx", type=int, default=98304, help="Context window size (default: 98304)")
+    parser.add_argument("--keep-alive", default="30m", help="Ollama keep_alive (default: 30m)")
+    args = parser.parse_args()
+    
+    document = PDFProcessor().load_single_document(args.pdf)
+    if not document:
+        sys.exit(f"Could not load {args.pdf}")
+    
+    client = Client()
+    summary = {}
+    for layout in PROMPT_LAYOUTS:
+        llm = OllamaWrapper(
+            model_name=args.llm_model,
+            num_ctx=args.num_ctx,
+            prompt_layout=layout,
+            keep_alive=args.keep_alive
+        )
+        context = llm.format_context([document])
+        print(f"\nLayout: {layout}")
+        results = run_layout(client, llm, context, layout)
+        
+        # The first question always prefills the whole document
+        follow_ups = results[1:] or results
+        summary[layout] = sum(seconds for _, seconds in follow_ups) / len(follow_ups)
+    
+    print("\nAverage prefill per follow-up question:")
+    for layout, seconds in summary.items():
+        print(f"  {layout:>14}: {seconds:.2f}s")
+    saved = summary["classic"] - summary["context_first"]
+    print(f"  Saved per question with context_first: {saved:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
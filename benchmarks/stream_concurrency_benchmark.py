@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+"""
+Benchmark many concurrent job streams against a running web server.
+
+Uploads one PDF, then opens the given number of concurrent streams of its
+job and reports how long clients wait for their first event and for the
+finished job. Run it once against `python web_app.py` (one thread per
+stream) and once against `python asgi_app.py` (one event loop for all
+streams) to compare both serving modes.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import httpx
+
+
+async def follow(client, url, started):
+    """
+    Read one stream until the server closes it.
+    
+    Args:
+        client: HTTP client
+        url: Stream URL
+        started: Benchmark start time
+    
+    Returns:
+        Tuple of (seconds to first event, seconds to end, number of events),
+        or None if the stream failed
+    """
+    first = None
+    events = 0
+    try:
+        async with client.stream("GET", url) as response:
+            if response.status_code != 200:
+                return None
+            async for line in response.aiter_lines():
+                # NDJSON lines or SSE data lines; heartbeats are skipped
+                if line.strip() and not line.startswith((":", "id:", "retry:", "event:")):
+                    events += 1
+                    if first is None:
+                        first = time.perf_counter() - started
+    except httpx.HTTPError:
+        return None
+    return first, time.perf_counter() - started, events
+
+
+def percentile(values, fraction):
+    """
+    Get a percentile of a list of values.
+    
+    Args:
+        values: Values
+        fraction: Percentile as a fraction (0.95 for p95)
+    
+    Returns:
+        The value at the percentile
+    """
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+async def run(args):
+    """
+    Upload the PDF and follow its job with concurrent streams.
+    
+    Args:
+        args: Parsed command line arguments
+    """
+    limits = httpx.Limits(max_connections=args.streams + 1)
+    async with httpx.AsyncClient(base_url=args.url, timeout=None, limits=limits) as client:
+        with open(args.pdf, "rb") as f:
+            response = await client.post("/upload", files={"pdf": (os.path.basename(args.pdf), f, "application/pdf")})
+        response.raise_for_status()
+        job_id = response.json()["job_id"]
+        print(f"Job {job_id}: opening {args.streams} concurrent {args.endpoint} streams")
+        
+        started = time.perf_counter()
+        results = await asyncio.gather(*[
+            follow(client, f"/{args.endpoint}/{job_id}", started) for _ in range(args.streams)
+        ])
+    
+    finished = [result for result in results if result and result[0] is not None]
+    print(f"Streams completed: {len(finished)} of {args.streams}")
+    if not finished:
+        return
+    
+    first_events = [result[0] for result in finished]
+    ends = [result[1] for result in finished]
+    print(f"First event: median {statistics.median(first_events):.2f}s, p95 {percentile(first_events, 0.95):.2f}s")
+    print(f"Job end:     median {statistics.median(ends):.2f}s, p95 {percentile(ends, 0.95):.2f}s")
+    print(f"Events per stream: {finished[0][2]}")
+
+
+def main():
+    """
+    Main function to run the benchmark.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark concurrent job streams")
+    parser.add_argument("pdf", help="PDF file to upload")
+    parser.add_argument("--url", default="http://localhost:5001", help="Server URL (default: http://localhost:5001)")
+    parser.add_argument("--streams", type=int, default=200, help="Number of concurrent streams (default: 200)")
+    parser.add_argument(
+        "--endpoint",
+        choices=["process", "events"],
+        default="process",
+        help="NDJSON (process) or SSE (events, ASGI server only) streams (default: process)"
+    )
+    args = parser.parse_args()
+    
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
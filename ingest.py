@@ -3,10 +3,12 @@
 Script to ingest PDF documents into the vector store.
 """
 import os
+import sys
 import argparse
 from dotenv import load_dotenv
 
 from rag.pipeline import RAGPipeline
+from rag.ollama_pool import OllamaPool, parse_hosts
 
 
 def main():
@@ -33,6 +35,40 @@ def main():
         default="jina/jina-embeddings-v2-base-de",
         help="Name of the embedding model to use (default: jina/jina-embeddings-v2-base-de)"
     )
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="Re-ingest all PDFs instead of only new or changed ones"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes for parsing PDFs, 0 uses all CPU cores (default: 1)"
+    )
+    parser.add_argument(
+        "--embed-batch-size",
+        type=int,
+        default=64,
+        help="Number of chunks embedded per Ollama request (default: 64)"
+    )
+    parser.add_argument(
+        "--embed-requests",
+        type=int,
+        default=2,
+        help="Maximum number of concurrent embedding requests (default: 2)"
+    )
+    parser.add_argument(
+        "--sharded",
+        action="store_true",
+        help="Store each Akte in its own Chroma collection (must match between ingest and query)"
+    )
+    parser.add_argument(
+        "--embedding-hosts",
+        default=os.getenv("OLLAMA_EMBEDDING_HOSTS", ""),
+        help="Comma-separated Ollama URLs the embedding requests are spread over "
+             "(default: OLLAMA_EMBEDDING_HOSTS, else OLLAMA_HOST)"
+    )
     args = parser.parse_args()
     
     # Check if PDF directory exists
@@ -44,11 +80,22 @@ def main():
     pipeline = RAGPipeline(
         pdf_directory=args.pdf_dir,
         vector_store_dir=args.vector_store_dir,
-        embedding_model=args.embedding_model
+        embedding_model=args.embedding_model,
+        embed_batch_size=args.embed_batch_size,
+        max_embed_requests=args.embed_requests,
+        sharded=args.sharded,
+        embedding_pool=OllamaPool(parse_hosts(args.embedding_hosts))
     )
     
     # Ingest documents
-    pipeline.ingest_documents()
+    errors = pipeline.ingest_documents(rebuild=args.rebuild, workers=args.workers)
+    
+    # Report files that could not be ingested and signal failure to the caller
+    if errors:
+        print("\nThe following PDF files could not be ingested:")
+        for pdf_path, error in errors.items():
+            print(f"  {pdf_path}: {error}")
+        sys.exit(1)
 
 
 if __name__ == "__main__":
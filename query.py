@@ -6,6 +6,7 @@ import argparse
 from dotenv import load_dotenv
 
 from rag.pipeline import RAGPipeline
+from rag.warmup import ModelWarmup
 
 
 def main():
@@ -45,22 +46,62 @@ def main():
     parser.add_argument(
         "--doc-name",
         type=str,
-        help="Name of the document to use (only with --use-full-doc)"
+        help="Name of the document to use with --use-full-doc, or to restrict retrieval to"
+    )
+    parser.add_argument(
+        "--retrieval-mode",
+        choices=["vector", "hybrid", "mmr"],
+        default="vector",
+        help="Retrieval mode: vector search, hybrid vector and BM25 search, or vector search "
+             "without near-duplicate chunks (mmr) (default: vector)"
+    )
+    parser.add_argument(
+        "--k",
+        type=int,
+        default=8,
+        help="Number of chunks retrieved per query (default: 8)"
+    )
+    parser.add_argument(
+        "--sharded",
+        action="store_true",
+        help="Store each Akte in its own Chroma collection (must match between ingest and query)"
     )
     parser.add_argument(
         "--stream",
         action="store_true",
         help="Stream the answer in real-time"
     )
+    parser.add_argument(
+        "--warmup-num-ctx",
+        type=int,
+        default=0,
+        help="Context window the LLM is loaded with at startup (default: the one of a --k chunk query)"
+    )
+    parser.add_argument(
+        "--no-warmup",
+        action="store_true",
+        help="Do not load the models in the background at startup"
+    )
     args = parser.parse_args()
     
     # Initialize the pipeline
     pipeline = RAGPipeline(
         vector_store_dir=args.vector_store_dir,
         embedding_model=args.embedding_model,
-        llm_model=args.llm_model
+        llm_model=args.llm_model,
+        retrieval_mode=args.retrieval_mode,
+        retrieval_k=args.k,
+        sharded=args.sharded
     )
     
+    # Load the models in the background while the query is read and retrieved
+    if not args.no_warmup:
+        ModelWarmup(
+            pipeline.ollama_llm,
+            pipeline.vector_store,
+            num_ctx=args.warmup_num_ctx or pipeline.retrieval_num_ctx()
+        ).start()
+    
     # Get the query
     if args.query:
         query = args.query
@@ -72,16 +113,7 @@ def main():
         print("Using full document for querying...")
         answer = pipeline.query_with_full_document(query, args.doc_name, stream=args.stream)
     else:
-        # Check if the non-full-doc query method supports streaming
-        try:
-            if args.stream:
-                answer = pipeline.query(query, stream=args.stream)
-            else:
-                answer = pipeline.query(query)
-        except TypeError:
-            if args.stream:
-                print("Warning: Streaming is only supported with --use-full-doc. Using non-streaming query.")
-            answer = pipeline.query(query)
+        answer = pipeline.query(query, source=args.doc_name, stream=args.stream)
     
     # Print the answer if not already streamed
     if not args.stream:
@@ -0,0 +1,105 @@
+"""
+Answer cache module for replaying answers to repeated questions.
+"""
+from typing import Optional
+import json
+import os
+import sqlite3
+import time
+
+from rag.hashing import text_sha256
+
+
+class AnswerCache:
+    """
+    Persistent cache of generated answers, backed by SQLite.
+    
+    An answer is keyed by everything that determines it: the content hash of
+    the PDF, the question, the prompt template, the model, its sampling
+    temperature and the context window the answer was generated with.
+    """
+    
+    def __init__(self, db_path: str = "data/cache/answers.sqlite3"):
+        """
+        Initialize the answer cache, creating the database if needed.
+        
+        Args:
+            db_path: Path of the SQLite database file
+        """
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                "key TEXT PRIMARY KEY, answer TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+    
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Open a connection to the cache database.
+        
+        Returns:
+            SQLite connection (usable as a transaction context manager)
+        """
+        return sqlite3.connect(self.db_path, timeout=30)
+    
+    @staticmethod
+    def make_key(
+        content_hash: str,
+        question: str,
+        prompt_template: str,
+        model: str,
+        temperature: float,
+        num_ctx: int
+    ) -> str:
+        """
+        Build the cache key for an answer.
+        
+        Args:
+            content_hash: SHA-256 of the PDF content
+            question: Question that was asked
+            prompt_template: Template text the prompt was built from
+            model: Name of the LLM
+            temperature: Sampling temperature
+            num_ctx: Context window the answer was generated with
+            
+        Returns:
+            Hex digest identifying the answer
+        """
+        return text_sha256(json.dumps([
+            content_hash,
+            question,
+            text_sha256(prompt_template),
+            model,
+            temperature,
+            num_ctx
+        ]))
+    
+    def get(self, key: str) -> Optional[str]:
+        """
+        Get a cached answer.
+        
+        Args:
+            key: Cache key from make_key
+            
+        Returns:
+            Cached answer, or None on a miss
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT answer FROM answers WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+    
+    def put(self, key: str, answer: str) -> None:
+        """
+        Store an answer.
+        
+        Args:
+            key: Cache key from make_key
+            answer: Generated answer
+        """
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO answers (key, answer, created_at) VALUES (?, ?, ?)",
+                (key, answer, time.time())
+            )
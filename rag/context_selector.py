@@ -0,0 +1,96 @@
+"""
+Context selector module for choosing the pages sent with a question.
+"""
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+
+from rag.vector_store import ChromaVectorStore
+
+
+# Context strategies
+FULL_CONTEXT = "full"
+RETRIEVED_CONTEXT = "retrieve"
+KEYWORD_CONTEXT = "keywords"
+CONTEXT_STRATEGIES = (FULL_CONTEXT, RETRIEVED_CONTEXT, KEYWORD_CONTEXT)
+
+class ContextSelector:
+    """
+    Selects the pages of a document that are sent with a question.
+    
+    "full" sends every page, "retrieve" the pages most similar to the question
+    and "keywords" the pages the document's term index lists for the
+    question's term groups. Page embeddings come from the vector store's
+    embedding function, so pages of an Akte that was uploaded before are not
+    embedded again.
+    """
+    
+    def __init__(self, vector_store: ChromaVectorStore, top_k: int = 6):
+        """
+        Initialize the context selector.
+        
+        Args:
+            vector_store: Vector store whose embedding function embeds pages and questions
+            top_k: Number of pages selected by the "retrieve" strategy
+        """
+        self.vector_store = vector_store
+        self.top_k = top_k
+    
+    def select(
+        self,
+        pages: List[Document],
+        question: str,
+        strategy: str = FULL_CONTEXT,
+        term_pages: Optional[List[int]] = None
+    ) -> List[Document]:
+        """
+        Select the pages to send with a question.
+        
+        Args:
+            pages: Page documents in page order
+            question: The question
+            strategy: "full", "retrieve" or "keywords"
+            term_pages: Indexes of the pages matching the question's term
+                groups, for the "keywords" strategy
+        
+        Returns:
+            Selected pages in page order
+        """
+        if strategy not in CONTEXT_STRATEGIES:
+            raise ValueError(f"Unknown context strategy '{strategy}', expected one of {CONTEXT_STRATEGIES}")
+        
+        if strategy == KEYWORD_CONTEXT:
+            # Fall back to retrieval if no page matches a term
+            if term_pages:
+                return [pages[i] for i in term_pages]
+            strategy = RETRIEVED_CONTEXT
+        
+        if strategy == RETRIEVED_CONTEXT and len(pages) > self.top_k:
+            return self.retrieve(pages, question)
+        
+        return pages
+    
+    def retrieve(self, pages: List[Document], question: str) -> List[Document]:
+        """
+        Select the pages most similar to a question.
+        
+        Args:
+            pages: Page documents in page order
+            question: The question
+        
+        Returns:
+            Top-k pages in page order
+        """
+        page_vectors = np.array(
+            self.vector_store.embedding_function.embed_documents([page.page_content for page in pages]),
+            dtype=np.float32
+        )
+        query_vector = np.array(self.vector_store.embed_query(question), dtype=np.float32)
+        
+        # Cosine similarity of every page to the question
+        norms = np.linalg.norm(page_vectors, axis=1) * np.linalg.norm(query_vector)
+        scores = page_vectors @ query_vector / np.where(norms == 0, 1, norms)
+        
+        top = np.argsort(-scores)[:self.top_k]
+        return [pages[i] for i in sorted(top)]
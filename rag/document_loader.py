@@ -1,7 +1,8 @@
 """
 Document loader module for processing PDF files.
 """
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
 import os
 from pathlib import Path
 
@@ -9,6 +10,11 @@ from langchain_community.document_loaders import PyPDFLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
 
+from rag.hashing import file_sha256
+from rag.lru import LRUCache
+from rag.page_cache import PageCache
+from rag.term_index import TermIndex
+
 
 class PDFProcessor:
     """
@@ -18,7 +24,9 @@ class PDFProcessor:
     def __init__(
         self, 
         chunk_size: int = 1500, 
-        chunk_overlap: int = 300
+        chunk_overlap: int = 300,
+        cache_dir: Optional[str] = None,
+        term_groups: Optional[Dict[str, List[str]]] = None
     ):
         """
         Initialize the PDF processor.
@@ -26,9 +34,17 @@ class PDFProcessor:
         Args:
             chunk_size: Size of text chunks
             chunk_overlap: Overlap between chunks
+            cache_dir: Directory for the on-disk page cache (memory only if None)
+            term_groups: Screening term groups indexed per page at parse time
+                (defaults if None)
         """
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        self.cache_dir = cache_dir
+        self.page_cache = PageCache(cache_dir)
+        self.term_groups = term_groups
+        self.term_index = TermIndex(term_groups)
+        self._hash_by_stat = LRUCache(1024)
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=chunk_size,
             chunk_overlap=chunk_overlap
@@ -45,22 +61,91 @@ class PDFProcessor:
             List of document chunks with metadata
         """
         try:
-            loader = PyPDFLoader(pdf_path)
-            documents = loader.load()
-            
-            # Add source metadata
-            file_name = os.path.basename(pdf_path)
-            for doc in documents:
-                doc.metadata["source"] = file_name
-                
-            # Split documents
-            split_docs = self.text_splitter.split_documents(documents)
-            
-            return split_docs
+            return self._split_pdf(pdf_path)
         except Exception as e:
             print(f"Error processing {pdf_path}: {str(e)}")
             return []
     
+    def _split_pdf(self, pdf_path: str) -> List[Document]:
+        """
+        Load a PDF file and split it into chunks, raising on errors.
+        
+        Args:
+            pdf_path: Path to the PDF file
+            
+        Returns:
+            List of document chunks with metadata
+        """
+        documents = self._load_pages(pdf_path)
+        
+        # Split documents
+        return self.text_splitter.split_documents(documents)
+    
+    def content_hash(self, pdf_path: str) -> str:
+        """
+        Get the content hash of a PDF file.
+        
+        The hash is remembered per (path, mtime, size) for the most recently
+        used files so that unchanged files are not read again.
+        
+        Args:
+            pdf_path: Path to the PDF file
+            
+        Returns:
+            SHA-256 of the file content
+        """
+        stat = os.stat(pdf_path)
+        stat_key = (os.path.abspath(pdf_path), stat.st_mtime, stat.st_size)
+        content_hash = self._hash_by_stat.get(stat_key)
+        if content_hash is None:
+            content_hash = file_sha256(pdf_path)
+            self._hash_by_stat.put(stat_key, content_hash)
+        return content_hash
+    
+    def _load_pages(self, pdf_path: str) -> List[Document]:
+        """
+        Load the pages of a PDF file, parsing it only if it is not cached.
+        
+        Args:
+            pdf_path: Path to the PDF file
+            
+        Returns:
+            List of fresh page documents with source metadata
+        """
+        content_hash = self.content_hash(pdf_path)
+        pages = self.page_cache.get(content_hash)
+        if pages is None:
+            pages = PyPDFLoader(pdf_path).load()
+            self.page_cache.put(content_hash, pages)
+            self.page_cache.put_terms(content_hash, self.term_index.version, self.term_index.build(pages))
+        
+        # Return copies so callers can modify them without touching the cache
+        file_name = os.path.basename(pdf_path)
+        return [
+            Document(page_content=page.page_content, metadata={**page.metadata, "source": file_name})
+            for page in pages
+        ]
+    
+    def page_terms(self, pdf_path: str) -> Dict[str, List[int]]:
+        """
+        Get the pages of a PDF file that match each screening term group.
+        
+        The index is built when the file is parsed; it is only rebuilt here
+        if the term groups changed since.
+        
+        Args:
+            pdf_path: Path to the PDF file
+            
+        Returns:
+            Dictionary mapping term groups to indexes into load_full_document()
+        """
+        content_hash = self.content_hash(pdf_path)
+        page_terms = self.page_cache.get_terms(content_hash, self.term_index.version)
+        if page_terms is None:
+            page_terms = self.term_index.build(self._load_pages(pdf_path))
+            self.page_cache.put_terms(content_hash, self.term_index.version, page_terms)
+        return page_terms
+    
     def format_document_with_page_numbers(self, doc: Document) -> str:
         """
         Format a document with page numbers in a structured way.
@@ -84,27 +169,109 @@ PAGE END
 """
         return formatted_text
     
-    def process_directory(self, directory_path: str) -> List[Document]:
+    def process_directory(self, directory_path: str, workers: int = 1) -> List[Document]:
         """
         Process all PDF files in a directory.
         
         Args:
             directory_path: Path to directory containing PDFs
+            workers: Number of parser processes (0 uses all CPU cores)
             
         Returns:
             List of all document chunks
         """
-        all_docs = []
-        pdf_files = Path(directory_path).glob("**/*.pdf")
+        pdf_files = sorted(str(pdf_path) for pdf_path in Path(directory_path).glob("**/*.pdf"))
+        docs_by_file, errors = self.process_files(pdf_files, workers=workers)
         
-        for pdf_path in pdf_files:
-            print(f"Processing {pdf_path}")
-            docs = self.load_and_split(str(pdf_path))
+        all_docs = []
+        for docs in docs_by_file.values():
             all_docs.extend(docs)
             
         print(f"Processed {len(all_docs)} document chunks from PDF files")
         return all_docs
     
+    def process_files(
+        self,
+        pdf_paths: List[str],
+        workers: int = 1
+    ) -> Tuple[Dict[str, List[Document]], Dict[str, str]]:
+        """
+        Process the given PDF files, optionally in parallel worker processes.
+        
+        Results are collected in the order of pdf_paths. A file that fails to
+        parse does not abort the others; its error is returned instead.
+        
+        Args:
+            pdf_paths: Paths of the PDF files to process
+            workers: Number of parser processes (1 parses in this process,
+                0 uses all CPU cores)
+            
+        Returns:
+            Tuple of (docs_by_file, errors): document chunks per successfully
+            processed path, and an error message per failed path
+        """
+        if workers <= 0:
+            workers = os.cpu_count() or 1
+        workers = min(workers, len(pdf_paths)) or 1
+        
+        if workers == 1:
+            results = map(self._process_file, pdf_paths)
+            return self._collect_results(pdf_paths, results)
+        
+        print(f"Parsing {len(pdf_paths)} PDF files with {workers} worker processes")
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(
+                _process_file_in_worker,
+                pdf_paths,
+                [self.chunk_size] * len(pdf_paths),
+                [self.chunk_overlap] * len(pdf_paths),
+                [self.cache_dir] * len(pdf_paths),
+                [self.term_groups] * len(pdf_paths)
+            )
+            return self._collect_results(pdf_paths, results)
+    
+    def _process_file(self, pdf_path: str) -> Tuple[List[Document], Optional[str]]:
+        """
+        Process a single PDF file and capture its error instead of raising.
+        
+        Args:
+            pdf_path: Path to the PDF file
+            
+        Returns:
+            Tuple of (document chunks, error message or None)
+        """
+        try:
+            return self._split_pdf(pdf_path), None
+        except Exception as e:
+            return [], f"{type(e).__name__}: {str(e)}"
+    
+    def _collect_results(self, pdf_paths, results) -> Tuple[Dict[str, List[Document]], Dict[str, str]]:
+        """
+        Gather per-file results in input order and report failures.
+        
+        Args:
+            pdf_paths: Paths of the processed PDF files
+            results: Iterable of (document chunks, error) in the same order
+            
+        Returns:
+            Tuple of (docs_by_file, errors)
+        """
+        docs_by_file = {}
+        errors = {}
+        
+        for pdf_path, (docs, error) in zip(pdf_paths, results):
+            if error:
+                print(f"Failed {pdf_path}: {error}")
+                errors[pdf_path] = error
+            else:
+                print(f"Processed {pdf_path} ({len(docs)} chunks)")
+                docs_by_file[pdf_path] = docs
+        
+        if errors:
+            print(f"{len(errors)} of {len(pdf_paths)} PDF files could not be processed")
+            
+        return docs_by_file, errors
+    
     def load_full_document(self, pdf_path: str) -> List[Document]:
         """
         Load a PDF file without splitting it into chunks.
@@ -116,15 +283,7 @@ PAGE END
             List of documents (one per page)
         """
         try:
-            loader = PyPDFLoader(pdf_path)
-            documents = loader.load()
-            
-            # Add source metadata
-            file_name = os.path.basename(pdf_path)
-            for doc in documents:
-                doc.metadata["source"] = file_name
-                
-            return documents
+            return self._load_pages(pdf_path)
         except Exception as e:
             print(f"Error processing {pdf_path}: {str(e)}")
             return []
@@ -140,8 +299,7 @@ PAGE END
             Single document with all content
         """
         try:
-            loader = PyPDFLoader(pdf_path)
-            documents = loader.load()
+            documents = self._load_pages(pdf_path)
             
             if not documents:
                 return None
@@ -149,25 +307,42 @@ PAGE END
             # Combine all pages with page number formatting
             combined_text = ""
             for doc in documents:
-                page_number = doc.metadata.get("page", 1)
-                page_text = f"""
-=========
-PAGE NUMBER {page_number}
-=========
-{doc.page_content}
-=========
-PAGE END
-=========
-"""
-                combined_text += page_text + "\n"
+                combined_text += self.format_document_with_page_numbers(doc) + "\n"
             
             # Use metadata from the first page
             metadata = documents[0].metadata.copy()
-            metadata["source"] = os.path.basename(pdf_path)
             metadata["is_full_document"] = True
             
             # Create a single document
             return Document(page_content=combined_text, metadata=metadata)
         except Exception as e:
             print(f"Error processing {pdf_path}: {str(e)}")
-            return None 
\ No newline at end of file
+            return None
+
+def _process_file_in_worker(
+    pdf_path: str,
+    chunk_size: int,
+    chunk_overlap: int,
+    cache_dir: Optional[str],
+    term_groups: Optional[Dict[str, List[str]]] = None
+) -> Tuple[List[Document], Optional[str]]:
+    """
+    Process a single PDF file inside a worker process.
+    
+    Args:
+        pdf_path: Path to the PDF file
+        chunk_size: Size of text chunks
+        chunk_overlap: Overlap between chunks
+        cache_dir: Directory of the on-disk page cache
+        term_groups: Screening term groups indexed per page
+        
+    Returns:
+        Tuple of (document chunks, error message or None)
+    """
+    processor = PDFProcessor(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        cache_dir=cache_dir,
+        term_groups=term_groups
+    )
+    return processor._process_file(pdf_path)
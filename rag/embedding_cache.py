@@ -0,0 +1,220 @@
+"""
+Embedding cache module for reusing embeddings across ingests.
+"""
+from typing import List, Dict, Any
+from array import array
+import os
+import sqlite3
+import threading
+import time
+
+from langchain_core.embeddings import Embeddings
+
+from rag.hashing import text_sha256
+
+
+# Keys looked up per query, below SQLite's limit of bound parameters
+BATCH_SIZE = 500
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Disk-backed, content-addressed cache in front of an embedding model.
+    
+    Vectors are stored as float32 blobs in SQLite, keyed by (model, text
+    hash), with their last use. SQLite serializes the writes of all
+    processes sharing the cache (ingest.py and the web apps), so each one
+    always reads the current vectors. When the vectors grow beyond
+    max_bytes the least recently used vectors are evicted.
+    """
+    
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        model_name: str,
+        cache_dir: str = "data/cache/embeddings",
+        max_bytes: int = 1024 * 1024 * 1024
+    ):
+        """
+        Initialize the embedding cache, creating the database if needed.
+        
+        Args:
+            embeddings: Embedding model used for cache misses
+            model_name: Name of the embedding model (part of the cache key)
+            cache_dir: Directory holding the cache database
+            max_bytes: Maximum size of the stored vectors before eviction
+        """
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.db_path = os.path.join(cache_dir, "embeddings.sqlite3")
+        
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        
+        os.makedirs(cache_dir, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+            # Total size of the stored vectors, updated in the same transactions
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            self._conn.execute("INSERT OR IGNORE INTO meta (name, value) VALUES ('vector_bytes', 0)")
+    
+    def _key(self, text: str) -> str:
+        """
+        Build the cache key for a text.
+        
+        Args:
+            text: Text to embed
+        
+        Returns:
+            Cache key combining model name and text hash
+        """
+        return f"{self.model_name}|{text_sha256(text)}"
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed documents, computing only the ones not yet in the cache.
+        
+        Args:
+            texts: Texts to embed
+        
+        Returns:
+            List of embeddings in the order of texts
+        """
+        keys = [self._key(text) for text in texts]
+        results: Dict[str, List[float]] = {}
+        
+        unique_keys = list(dict.fromkeys(keys))
+        with self._lock, self._conn:
+            for i in range(0, len(unique_keys), BATCH_SIZE):
+                batch = unique_keys[i:i + BATCH_SIZE]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})",
+                    batch
+                ).fetchall()
+                for key, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    results[key] = vector.tolist()
+            if results:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in results]
+                )
+        
+        # Embed each missing text once, even if it occurs several times
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in results and key not in missing:
+                missing[key] = text
+        
+        miss_count = sum(1 for key in keys if key in missing)
+        with self._lock:
+            self.hits += len(keys) - miss_count
+            self.misses += miss_count
+        
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            with self._lock:
+                self._store(dict(zip(missing.keys(), vectors)))
+            results.update(zip(missing.keys(), vectors))
+        
+        return [results[key] for key in keys]
+    
+    def embed_query(self, text: str) -> List[float]:
+        """
+        Embed a query through the cache.
+        
+        Args:
+            text: Query text
+        
+        Returns:
+            Query embedding
+        """
+        return self.embed_documents([text])[0]
+    
+    def _store(self, vectors: Dict[str, List[float]]) -> None:
+        """
+        Store new vectors, evicting old ones if the cache is full.
+        
+        Args:
+            vectors: Embeddings by cache key
+        """
+        now = time.time()
+        with self._conn:
+            added = 0
+            for key, vector in vectors.items():
+                blob = array("f", vector).tobytes()
+                # Another process may have stored the same text meanwhile
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                    (key, blob, now)
+                )
+                added += len(blob) * cursor.rowcount
+            self._add_size(added)
+            if self._size() > self.max_bytes:
+                self._evict()
+    
+    def _size(self) -> int:
+        """
+        Get the total size of the stored vectors.
+        
+        Returns:
+            Size in bytes
+        """
+        return self._conn.execute("SELECT value FROM meta WHERE name = 'vector_bytes'").fetchone()[0]
+    
+    def _add_size(self, delta: int) -> None:
+        """
+        Change the total size of the stored vectors.
+        
+        Args:
+            delta: Bytes added (negative when removed)
+        """
+        self._conn.execute("UPDATE meta SET value = value + ? WHERE name = 'vector_bytes'", (delta,))
+    
+    def _evict(self) -> None:
+        """
+        Drop the least recently used vectors.
+        
+        Eviction frees space down to 80% of max_bytes so that it does not
+        run again on the very next write. SQLite reuses the freed pages.
+        """
+        excess = self._size() - int(self.max_bytes * 0.8)
+        rows = self._conn.execute("SELECT key, LENGTH(vector) FROM embeddings ORDER BY last_used")
+        evicted = []
+        freed = 0
+        for key, length in rows:
+            if freed >= excess:
+                break
+            evicted.append((key,))
+            freed += length
+        self._conn.executemany("DELETE FROM embeddings WHERE key = ?", evicted)
+        self._add_size(-freed)
+        self.evictions += len(evicted)
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics.
+        
+        Returns:
+            Dictionary with hits, misses, evictions, entries and size in bytes
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0],
+                "size_bytes": self._size()
+            }
@@ -0,0 +1,140 @@
+"""
+Full document store module for persisting formatted full-document text.
+"""
+from typing import Dict, Any, Iterator, Optional
+from collections.abc import Mapping
+import json
+import os
+import sqlite3
+import threading
+import zlib
+
+from langchain_core.documents import Document
+
+from rag.lru import LRUCache
+
+
+class FullDocumentStore(Mapping):
+    """
+    Compressed on-disk store of full documents, loaded on demand.
+    
+    Documents are stored as zlib-compressed JSON blobs in SQLite together
+    with the fingerprint of their source file, so ingest.py and the web
+    apps can share the store while running. Documents are decompressed
+    when accessed and kept in a small LRU, keyed by name and fingerprint so
+    a document replaced by another process is read again.
+    """
+    
+    def __init__(self, store_dir: str, max_cached: int = 4):
+        """
+        Initialize the store, creating the database if needed.
+        
+        Args:
+            store_dir: Directory holding the database
+            max_cached: Number of decompressed documents kept in memory
+        """
+        self.store_dir = store_dir
+        self.db_path = os.path.join(store_dir, "documents.sqlite3")
+        self.cache = LRUCache(max_cached)
+        self._lock = threading.Lock()
+        
+        os.makedirs(store_dir, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                "name TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, data BLOB NOT NULL)"
+            )
+    
+    def __getitem__(self, name: str) -> Document:
+        with self._lock:
+            row = self._conn.execute("SELECT fingerprint FROM documents WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            raise KeyError(name)
+        
+        document = self.cache.get((name, row[0]))
+        if document is not None:
+            return document
+        
+        with self._lock:
+            row = self._conn.execute("SELECT fingerprint, data FROM documents WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            raise KeyError(name)
+        record = json.loads(zlib.decompress(row[1]).decode("utf-8"))
+        
+        document = Document(page_content=record["page_content"], metadata=record["metadata"])
+        self.cache.put((name, row[0]), document)
+        return document
+    
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            return iter([row[0] for row in self._conn.execute("SELECT name FROM documents ORDER BY name")])
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+    
+    def __contains__(self, name: object) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM documents WHERE name = ?", (name,)).fetchone() is not None
+    
+    def entry(self, name: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the stored details of a document.
+        
+        Args:
+            name: Document name
+        
+        Returns:
+            File fingerprint and compressed length, or None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fingerprint, LENGTH(data) FROM documents WHERE name = ?",
+                (name,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {**json.loads(row[0]), "length": row[1]}
+    
+    def put(self, name: str, document: Document, fingerprint: Dict[str, Any]) -> None:
+        """
+        Add or replace a document.
+        
+        Args:
+            name: Document name
+            document: Full document to store
+            fingerprint: Source file details (content hash, mtime, size) used
+                to detect when the document must be rebuilt
+        """
+        record = zlib.compress(
+            json.dumps(
+                {"page_content": document.page_content, "metadata": document.metadata},
+                ensure_ascii=False
+            ).encode("utf-8")
+        )
+        
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO documents (name, fingerprint, data) VALUES (?, ?, ?)",
+                (name, json.dumps(fingerprint, sort_keys=True), record)
+            )
+    
+    def remove(self, name: str) -> None:
+        """
+        Remove a document.
+        
+        Args:
+            name: Document name
+        """
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM documents WHERE name = ?", (name,))
+    
+    def clear(self) -> None:
+        """
+        Remove all documents.
+        """
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM documents")
+        self.cache.clear()
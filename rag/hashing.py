@@ -0,0 +1,35 @@
+"""
+Hashing helpers for content-addressed bookkeeping.
+"""
+import hashlib
+
+
+def file_sha256(path: str, block_size: int = 1024 * 1024) -> str:
+    """
+    Compute the SHA-256 hex digest of a file's content.
+    
+    Args:
+        path: Path to the file
+        block_size: Number of bytes read per iteration
+    
+    Returns:
+        Hex digest of the file content
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def text_sha256(text: str) -> str:
+    """
+    Compute the SHA-256 hex digest of a string.
+    
+    Args:
+        text: Text to hash
+    
+    Returns:
+        Hex digest of the UTF-8 encoded text
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
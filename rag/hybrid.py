@@ -0,0 +1,29 @@
+"""
+Rank fusion module for hybrid vector and lexical search.
+"""
+from typing import Dict, List
+
+# Rank offset of reciprocal rank fusion; damps the influence of the top ranks
+RRF_K = 60
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = RRF_K) -> List[str]:
+    """
+    Merge rankings of chunk ids by reciprocal rank fusion.
+    
+    Every ranking adds 1 / (k + rank) to the score of each id it contains,
+    so ids ranked high by several rankings come first, and an id found by
+    only one ranking can still beat ids found low in all of them.
+    
+    Args:
+        rankings: Chunk ids of each ranking, best first
+        k: Rank offset; larger values flatten the score differences
+        
+    Returns:
+        All ids of the rankings, highest fused score first
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=lambda chunk_id: scores[chunk_id], reverse=True)
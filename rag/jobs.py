@@ -0,0 +1,522 @@
+"""
+Job module for running document analyses in the background.
+"""
+from typing import Dict, List, Any, AsyncIterator, Callable, Iterator, Optional, Set, Tuple
+import asyncio
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+
+# Job statuses
+QUEUED = "queued"
+PROCESSING = "processing"
+COMPLETED = "completed"
+FAILED = "failed"
+FINISHED_STATUSES = (COMPLETED, FAILED)
+
+
+class JobStore:
+    """
+    Persistent job and event store backed by SQLite.
+    
+    Every job keeps its input, status and results in the jobs table and the
+    full sequence of progress events it emitted in the events table, so a
+    client can replay a job's stream from any offset, also after a restart.
+    """
+    
+    def __init__(self, db_path: str = "data/jobs.sqlite3"):
+        """
+        Initialize the store, creating the database if needed.
+        
+        Args:
+            db_path: Path of the SQLite database file
+        """
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, status TEXT NOT NULL, data TEXT NOT NULL, "
+                "created_at REAL NOT NULL, updated_at REAL NOT NULL, last_accessed REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS events ("
+                "job_id TEXT NOT NULL, seq INTEGER NOT NULL, payload TEXT NOT NULL, "
+                "PRIMARY KEY (job_id, seq))"
+            )
+    
+    def create(self, job_id: str, data: Dict[str, Any]) -> None:
+        """
+        Create a queued job.
+        
+        Args:
+            job_id: Unique job id
+            data: Job input and result fields
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, data, created_at, updated_at, last_accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, QUEUED, json.dumps(data), now, now, now)
+            )
+    
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a job.
+        
+        Args:
+            job_id: Job id
+        
+        Returns:
+            Job fields including id and status, or None if it does not exist
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_job(row) if row else None
+    
+    def list(self, statuses: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        List jobs, oldest first.
+        
+        Args:
+            statuses: Only return jobs with one of these statuses
+        
+        Returns:
+            List of jobs
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM jobs ORDER BY created_at").fetchall()
+        jobs = [self._to_job(row) for row in rows]
+        if statuses:
+            jobs = [job for job in jobs if job["status"] in statuses]
+        return jobs
+    
+    def update(self, job_id: str, status: Optional[str] = None, **fields) -> None:
+        """
+        Update a job's status and data fields.
+        
+        Args:
+            job_id: Job id
+            status: New status (unchanged if None)
+            **fields: Data fields to set
+        """
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if not row:
+                return
+            data = json.loads(row["data"])
+            data.update(fields)
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, data = ?, updated_at = ? WHERE id = ?",
+                (status or row["status"], json.dumps(data), time.time(), job_id)
+            )
+    
+    def touch(self, job_id: str) -> None:
+        """
+        Record that a job was accessed by a client.
+        
+        Args:
+            job_id: Job id
+        """
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE jobs SET last_accessed = ? WHERE id = ?", (time.time(), job_id))
+    
+    def delete(self, job_id: str) -> None:
+        """
+        Delete a job and its events.
+        
+        Args:
+            job_id: Job id
+        """
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM events WHERE job_id = ?", (job_id,))
+            self._conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+    
+    def append_event(self, job_id: str, event: Dict[str, Any]) -> int:
+        """
+        Append an event to a job's stream.
+        
+        Args:
+            job_id: Job id
+            event: Event payload
+        
+        Returns:
+            Sequence number of the event
+        """
+        return self.append_events(job_id, [event])
+    
+    def append_events(self, job_id: str, events: List[Dict[str, Any]], replace: bool = False) -> int:
+        """
+        Append events to a job's stream in one transaction.
+        
+        Args:
+            job_id: Job id
+            events: Event payloads in order
+            replace: Whether to delete the job's earlier events first; the
+                new events still continue their numbering, so clients
+                following the job by offset do not skip them
+        
+        Returns:
+            Sequence number of the last event
+        """
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT COALESCE(MAX(seq) + 1, 0) FROM events WHERE job_id = ?", (job_id,)
+            ).fetchone()
+            seq = row[0]
+            if replace:
+                self._conn.execute("DELETE FROM events WHERE job_id = ?", (job_id,))
+            self._conn.executemany(
+                "INSERT INTO events (job_id, seq, payload) VALUES (?, ?, ?)",
+                [
+                    (job_id, seq + i, json.dumps({**event, "event_id": seq + i}))
+                    for i, event in enumerate(events)
+                ]
+            )
+        return seq + len(events) - 1
+    
+    def events(self, job_id: str, offset: int = 0, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Get a job's events starting at an offset.
+        
+        Args:
+            job_id: Job id
+            offset: Sequence number of the first event to return
+            limit: Maximum number of events to return (all if None)
+        
+        Returns:
+            List of events in order, each with its event_id
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT payload FROM events WHERE job_id = ? AND seq >= ? ORDER BY seq LIMIT ?",
+                (job_id, offset, -1 if limit is None else limit)
+            ).fetchall()
+        return [json.loads(row["payload"]) for row in rows]
+    
+    @staticmethod
+    def _to_job(row: sqlite3.Row) -> Dict[str, Any]:
+        """
+        Convert a database row into a job dictionary.
+        
+        Args:
+            row: Row of the jobs table
+        
+        Returns:
+            Job fields merged with id, status and timestamps
+        """
+        return {
+            **json.loads(row["data"]),
+            "id": row["id"],
+            "status": row["status"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+            "last_accessed": row["last_accessed"]
+        }
+
+
+class JobManager:
+    """
+    Runs jobs on a pool of background worker threads.
+    
+    Workers generate independently of any client: a job's events are written
+    to the JobStore as they are produced, and clients follow them through
+    stream() (one thread per client) or astream() (a coroutine on an event
+    loop), which replay stored events from an offset and then wait for new
+    ones. Answer chunks are buffered briefly and written together. Jobs
+    that were queued or running when the server stopped are picked up
+    again on start; the events of an interrupted run are dropped, so a
+    replay shows only the run that completes.
+    """
+    
+    def __init__(
+        self,
+        store: JobStore,
+        handler: Callable[[Dict[str, Any], Callable[[Dict[str, Any]], None]], Dict[str, Any]],
+        workers: int = 1,
+        flush_interval: float = 0.1,
+        max_buffered: int = 64
+    ):
+        """
+        Initialize the job manager.
+        
+        Args:
+            store: Persistent job store
+            handler: Function processing a job; it receives the job and an
+                emit function for progress events and returns the result
+                fields to store on the job
+            workers: Number of jobs processed at the same time
+            flush_interval: Seconds an answer chunk event may be buffered
+                before it is written
+            max_buffered: Number of buffered events that forces a write
+        """
+        self.store = store
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.flush_interval = flush_interval
+        self.max_buffered = max_buffered
+        self._queue = queue.Queue()
+        self._new_events = threading.Condition()
+        self._threads = []
+        
+        # Event loop waiters of astream() per job, woken from the worker threads
+        self._async_waiters: Dict[str, Set[Tuple[asyncio.AbstractEventLoop, asyncio.Event]]] = {}
+        self._waiters_lock = threading.Lock()
+        
+        # Events not yet written per job, with the time the first was buffered;
+        # the flusher thread waits on _buffer_changed for buffers to expire
+        self._buffered: Dict[str, Tuple[float, List[Dict[str, Any]]]] = {}
+        self._buffer_lock = threading.Lock()
+        self._buffer_changed = threading.Condition(self._buffer_lock)
+        
+        # Held from taking a buffer until it is written, so events keep their order
+        self._write_lock = threading.Lock()
+    
+    def start(self) -> None:
+        """
+        Start the worker threads and resume unfinished jobs.
+        """
+        if self._threads:
+            return
+        
+        for job in self.store.list(statuses=[QUEUED, PROCESSING]):
+            if job["status"] == PROCESSING:
+                # The job runs again from the start; drop the partial answers of the interrupted run
+                self.store.append_events(
+                    job["id"],
+                    [{"status": "resumed", "message": "Resuming after restart..."}],
+                    replace=True
+                )
+            self._queue.put(job["id"])
+        
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        
+        thread = threading.Thread(target=self._flush_expired, name="job-event-flusher", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+    
+    def submit(self, job_id: str, data: Dict[str, Any]) -> None:
+        """
+        Create a job and queue it for processing.
+        
+        Args:
+            job_id: Unique job id
+            data: Job input fields
+        """
+        self.store.create(job_id, data)
+        self._queue.put(job_id)
+    
+    def _work(self) -> None:
+        """
+        Process queued jobs until the process exits.
+        """
+        while True:
+            job_id = self._queue.get()
+            job = self.store.get(job_id)
+            if not job or job["status"] in FINISHED_STATUSES:
+                continue
+            
+            self.store.update(job_id, status=PROCESSING)
+            try:
+                result = self.handler(job, lambda event: self._emit(job_id, event)) or {}
+                self._flush(job_id)
+                self.store.update(job_id, status=result.pop("status", COMPLETED), **result)
+            except Exception as e:
+                print(f"Job {job_id} failed: {str(e)}")
+                self._emit(job_id, {"error": f"Unexpected error: {str(e)}"})
+                self.store.update(job_id, status=FAILED, error=str(e))
+            finally:
+                self._notify(job_id)
+    
+    def _emit(self, job_id: str, event: Dict[str, Any]) -> None:
+        """
+        Store a job event and wake up waiting streams.
+        
+        Answer chunks are buffered until flush_interval has passed since the
+        first buffered one (also when no further event arrives), max_buffered
+        events are waiting or another event arrives, so a streamed answer
+        takes a few transactions instead of one per token.
+        
+        Args:
+            job_id: Job id
+            event: Event payload
+        """
+        with self._buffer_lock:
+            since, events = self._buffered.setdefault(job_id, (time.monotonic(), []))
+            events.append(event)
+            if len(events) == 1:
+                self._buffer_changed.notify()
+            if (
+                "chunk" in event
+                and len(events) < self.max_buffered
+                and time.monotonic() - since < self.flush_interval
+            ):
+                return
+        self._flush(job_id)
+    
+    def _flush(self, job_id: str) -> None:
+        """
+        Write the buffered events of a job and wake up waiting streams.
+        
+        Args:
+            job_id: Job id
+        """
+        with self._write_lock:
+            with self._buffer_lock:
+                _, events = self._buffered.pop(job_id, (None, []))
+            if events:
+                self.store.append_events(job_id, events)
+        if events:
+            self._notify(job_id)
+    
+    def _flush_expired(self) -> None:
+        """
+        Write buffered events once they have waited flush_interval, until the process exits.
+        
+        Covers answers that stall after a chunk, e.g. while the next
+        question's prompt is evaluated, so their clients still receive the
+        chunk in time and it is persisted.
+        """
+        while True:
+            with self._buffer_lock:
+                if not self._buffered:
+                    self._buffer_changed.wait()
+                    continue
+                now = time.monotonic()
+                deadline = min(since for since, _ in self._buffered.values()) + self.flush_interval
+                if deadline > now:
+                    self._buffer_changed.wait(deadline - now)
+                    continue
+                expired = [
+                    job_id for job_id, (since, _) in self._buffered.items()
+                    if since + self.flush_interval <= now
+                ]
+            for job_id in expired:
+                self._flush(job_id)
+    
+    def _notify(self, job_id: str) -> None:
+        """
+        Wake up all streams waiting for events.
+        
+        Args:
+            job_id: Job that emitted an event or changed status
+        """
+        with self._new_events:
+            self._new_events.notify_all()
+        
+        with self._waiters_lock:
+            waiters = list(self._async_waiters.get(job_id, ()))
+        for loop, wakeup in waiters:
+            loop.call_soon_threadsafe(wakeup.set)
+    
+    def wait_for_events(self, timeout: float) -> None:
+        """
+        Block until any job emits an event or the timeout expires.
+        
+        Args:
+            timeout: Maximum number of seconds to wait
+        """
+        with self._new_events:
+            self._new_events.wait(timeout)
+    
+    def stream(self, job_id: str, offset: int = 0, poll_interval: float = 1.0) -> Iterator[Dict[str, Any]]:
+        """
+        Follow a job's events from an offset until the job has finished.
+        
+        Args:
+            job_id: Job id
+            offset: Sequence number of the first event to return
+            poll_interval: Seconds between checks when no event arrives
+        
+        Returns:
+            Iterator over events
+        """
+        while True:
+            # Read the status before the events so no final event is missed
+            job = self.store.get(job_id)
+            if not job:
+                return
+            
+            for event in self.store.events(job_id, offset):
+                offset = event["event_id"] + 1
+                yield event
+            
+            if job["status"] in FINISHED_STATUSES:
+                return
+            
+            self.wait_for_events(poll_interval)
+    
+    async def astream(
+        self,
+        job_id: str,
+        offset: int = 0,
+        idle_timeout: float = 15.0,
+        batch_size: int = 100
+    ) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """
+        Follow a job's events from an offset until the job has finished,
+        without blocking the event loop.
+        
+        Events are read from the store at most batch_size at a time, and the
+        next batch only once the consumer has taken the previous one, so a
+        slow client holds back its own stream instead of buffering events.
+        
+        Args:
+            job_id: Job id
+            offset: Sequence number of the first event to return
+            idle_timeout: Seconds without events after which None is yielded,
+                so the caller can send a heartbeat
+            batch_size: Maximum number of events read at a time
+        
+        Returns:
+            Async iterator over events, with None for idle periods
+        """
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._waiters_lock:
+            self._async_waiters.setdefault(job_id, set()).add(waiter)
+        
+        try:
+            while True:
+                # Clear before reading, so an event emitted meanwhile wakes the wait below
+                waiter[1].clear()
+                
+                # Read the status before the events so no final event is missed
+                # (in a worker thread, since SQLite reads block)
+                job = await asyncio.to_thread(self.store.get, job_id)
+                if not job:
+                    return
+                
+                events = await asyncio.to_thread(self.store.events, job_id, offset, batch_size)
+                for event in events:
+                    offset = event["event_id"] + 1
+                    yield event
+                
+                if len(events) == batch_size:
+                    continue
+                if job["status"] in FINISHED_STATUSES:
+                    return
+                
+                try:
+                    await asyncio.wait_for(waiter[1].wait(), idle_timeout)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            with self._waiters_lock:
+                waiters = self._async_waiters.get(job_id, set())
+                waiters.discard(waiter)
+                if not waiters:
+                    self._async_waiters.pop(job_id, None)
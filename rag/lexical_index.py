@@ -0,0 +1,265 @@
+"""
+Lexical index module for BM25 keyword search over document chunks.
+"""
+from typing import Dict, List, Optional, Tuple
+from collections import Counter
+import math
+import os
+import re
+import sqlite3
+import threading
+
+
+# Identifiers that must match exactly; found in the original text (before
+# lowercasing) and normalized by removing spaces, dots and hyphens
+IDENTIFIER_PATTERNS = [
+    # Aktenzeichen such as "3 C 123/24" or "102 Js 4567/23"
+    re.compile(r"\b\d+\s?[A-Za-z]{1,4}\s?\d+/\d{2,4}\b"),
+    # Other file numbers such as "4567/23"
+    re.compile(r"\b\d+/\d{2,4}\b"),
+    # License plates such as "M-AB 1234" or "FFB XY 12E"
+    re.compile(r"\b[A-ZÄÖÜ]{1,3}[- ][A-Z]{1,2} ?\d{1,4}[EH]?\b"),
+    # Amounts such as "1.234,56" or "250,00"
+    re.compile(r"\b\d{1,3}(?:\.\d{3})+(?:,\d{1,2})?\b|\b\d+,\d{2}\b"),
+]
+
+WORD_PATTERN = re.compile(r"\w+")
+
+UMLAUTS = str.maketrans({"ä": "ae", "ö": "oe", "ü": "ue", "ß": "ss"})
+
+# Frequent German words that carry no meaning for search
+STOPWORDS = {
+    "der", "die", "das", "den", "dem", "des", "ein", "eine", "einer", "eines", "einem", "einen",
+    "und", "oder", "aber", "auch", "als", "am", "an", "auf", "aus", "bei", "bis", "durch", "fuer",
+    "im", "in", "ist", "mit", "nach", "nicht", "noch", "sich", "sie", "er", "es", "so", "um", "von",
+    "vom", "vor", "war", "wie", "wird", "wurde", "zu", "zum", "zur", "dass", "hat", "haben", "sind",
+    "wer", "was", "wo", "welche", "welcher", "bitte", "ich", "wir", "ihr", "kann", "werden"
+}
+
+# Suffixes stripped from longer words so inflected forms match
+SUFFIXES = ("ern", "en", "er", "es", "em", "e", "n", "s")
+
+# BM25 parameters
+K1 = 1.5
+B = 0.75
+
+
+def normalize_identifier(identifier: str) -> str:
+    """
+    Normalize an identifier so different spellings match.
+    
+    Args:
+        identifier: Identifier as found in the text
+    
+    Returns:
+        Lowercased identifier without spaces, dots and hyphens
+    """
+    return re.sub(r"[\s.\-]", "", identifier).lower()
+
+
+def stem(word: str) -> str:
+    """
+    Strip a common German inflection suffix.
+    
+    Args:
+        word: Lowercased word
+    
+    Returns:
+        Stemmed word
+    """
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 4:
+            return word[:-len(suffix)]
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split German text into search terms.
+    
+    Identifiers (Aktenzeichen, license plates, amounts) are kept as single
+    normalized terms in addition to their parts. Words are lowercased,
+    umlauts folded, stopwords dropped and suffixes stripped.
+    
+    Args:
+        text: Text to tokenize
+    
+    Returns:
+        List of terms
+    """
+    terms = []
+    for pattern in IDENTIFIER_PATTERNS:
+        terms.extend(f"#{normalize_identifier(match.group())}" for match in pattern.finditer(text))
+    
+    for match in WORD_PATTERN.finditer(text.lower().translate(UMLAUTS)):
+        word = match.group()
+        if word in STOPWORDS:
+            continue
+        terms.append(word if word.isdigit() else stem(word))
+    return terms
+
+
+class LexicalIndex:
+    """
+    Persistent BM25 inverted index backed by SQLite.
+    
+    Chunks are added and removed by id, so the index is updated
+    incrementally together with the vector store. Each chunk keeps the
+    source file name of its Akte, so a search can be scoped to one Akte
+    before ranking.
+    """
+    
+    def __init__(self, db_path: str):
+        """
+        Initialize the index, creating the database if needed.
+        
+        Args:
+            db_path: Path of the SQLite database file
+        """
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS chunks (id TEXT PRIMARY KEY, length INTEGER NOT NULL, source TEXT)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS postings ("
+                "term TEXT NOT NULL, chunk_id TEXT NOT NULL, tf INTEGER NOT NULL, "
+                "PRIMARY KEY (term, chunk_id))"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS postings_chunk ON postings (chunk_id)")
+            
+            # Indexes built before sources were stored are emptied, so the vector store refills them
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(chunks)")]
+            if "source" not in columns:
+                self._conn.execute("DELETE FROM postings")
+                self._conn.execute("DELETE FROM chunks")
+                self._conn.execute("ALTER TABLE chunks ADD COLUMN source TEXT")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS chunks_source ON chunks (source)")
+        self._stats: Dict[Optional[str], Tuple[int, float]] = {}
+    
+    def add(self, ids: List[str], texts: List[str], sources: Optional[List[Optional[str]]] = None) -> None:
+        """
+        Add or replace chunks.
+        
+        Args:
+            ids: Chunk ids
+            texts: Chunk texts
+            sources: Source file name of each chunk (none if None)
+        """
+        rows = []
+        chunks = []
+        for chunk_id, text, source in zip(ids, texts, sources or [None] * len(ids)):
+            terms = Counter(tokenize(text))
+            chunks.append((chunk_id, sum(terms.values()), source))
+            rows.extend((term, chunk_id, tf) for term, tf in terms.items())
+        
+        with self._lock, self._conn:
+            self._delete(ids)
+            self._conn.executemany("INSERT INTO chunks (id, length, source) VALUES (?, ?, ?)", chunks)
+            self._conn.executemany("INSERT INTO postings (term, chunk_id, tf) VALUES (?, ?, ?)", rows)
+            self._stats = {}
+    
+    def remove(self, ids: List[str]) -> None:
+        """
+        Remove chunks.
+        
+        Args:
+            ids: Chunk ids
+        """
+        with self._lock, self._conn:
+            self._delete(ids)
+            self._stats = {}
+    
+    def clear(self) -> None:
+        """
+        Remove all chunks.
+        """
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM postings")
+            self._conn.execute("DELETE FROM chunks")
+            self._stats = {}
+    
+    def count(self) -> int:
+        """
+        Get the number of indexed chunks.
+        
+        Returns:
+            Number of chunks
+        """
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+    
+    def search(self, query: str, k: int = 20, source: Optional[str] = None) -> List[Tuple[str, float]]:
+        """
+        Rank chunks by their BM25 score for a query.
+        
+        Args:
+            query: Query string
+            k: Number of results
+            source: Source file name of the Akte to search (all if None);
+                term statistics are then taken from that Akte too
+        
+        Returns:
+            List of (chunk id, score), best first
+        """
+        terms = Counter(tokenize(query))
+        if not terms:
+            return []
+        
+        with self._lock:
+            chunk_count, average_length = self._collection_stats(source)
+            placeholders = ",".join("?" * len(terms))
+            scope = "" if source is None else " AND c.source = ?"
+            rows = self._conn.execute(
+                "SELECT p.term, p.chunk_id, p.tf, c.length FROM postings p "
+                f"JOIN chunks c ON c.id = p.chunk_id WHERE p.term IN ({placeholders}){scope}",
+                list(terms) + ([] if source is None else [source])
+            ).fetchall()
+        
+        postings: Dict[str, List[Tuple[str, int, int]]] = {}
+        for term, chunk_id, tf, length in rows:
+            postings.setdefault(term, []).append((chunk_id, tf, length))
+        
+        scores: Dict[str, float] = {}
+        for term, matches in postings.items():
+            idf = math.log(1 + (chunk_count - len(matches) + 0.5) / (len(matches) + 0.5))
+            for chunk_id, tf, length in matches:
+                norm = tf * (K1 + 1) / (tf + K1 * (1 - B + B * length / average_length))
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + terms[term] * idf * norm
+        
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+    
+    def _delete(self, ids: List[str]) -> None:
+        """
+        Delete chunks; the caller holds the lock and the transaction.
+        
+        Args:
+            ids: Chunk ids
+        """
+        self._conn.executemany("DELETE FROM postings WHERE chunk_id = ?", [(chunk_id,) for chunk_id in ids])
+        self._conn.executemany("DELETE FROM chunks WHERE id = ?", [(chunk_id,) for chunk_id in ids])
+    
+    def _collection_stats(self, source: Optional[str] = None) -> Tuple[int, float]:
+        """
+        Get the number of chunks and their average length; the caller holds the lock.
+        
+        Args:
+            source: Source file name to count the chunks of (all if None)
+        
+        Returns:
+            Tuple of (chunk count, average chunk length in terms)
+        """
+        if source not in self._stats:
+            if source is None:
+                row = self._conn.execute("SELECT COUNT(*), AVG(length) FROM chunks").fetchone()
+            else:
+                row = self._conn.execute(
+                    "SELECT COUNT(*), AVG(length) FROM chunks WHERE source = ?", (source,)
+                ).fetchone()
+            self._stats[source] = (row[0], row[1] or 1.0)
+        return self._stats[source]
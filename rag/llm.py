@@ -1,14 +1,28 @@
 """
 LLM module for Ollama integration.
 """
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Iterator, AsyncIterator, Union
 
 from langchain_ollama import OllamaLLM
+from langchain_core.documents import Document
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnablePassthrough
+from langchain_core.runnables import RunnablePassthrough, RunnableLambda
 from langchain_core.retrievers import BaseRetriever
 
+from rag.ollama_pool import OllamaPool
+from rag.single_flight import SingleFlight, request_key
+from rag.prompts import (
+    RAG_INSTRUCTIONS,
+    CONTEXT_FIRST_LAYOUT,
+    build_prompt_template,
+    build_question_prompts
+)
+from rag.token_budget import DEFAULT_CONTEXT_BUCKETS, TokenCounter, select_context_size
+
+# Formatting added around each page by format_context
+PAGE_FRAME_TOKENS = 20
+
 
 class OllamaWrapper:
     """
@@ -19,7 +33,13 @@ class OllamaWrapper:
         self,
         model_name: str = "mistral-nemo:12b-instruct-2407-q8_0",
         temperature: float = 0.7,
-        num_ctx: int = 98304
+        num_ctx: int = 98304,
+        prompt_layout: str = CONTEXT_FIRST_LAYOUT,
+        keep_alive: Optional[Union[str, int]] = "30m",
+        context_buckets: Optional[List[int]] = DEFAULT_CONTEXT_BUCKETS,
+        response_tokens: int = 4096,
+        pool: Optional[OllamaPool] = None,
+        coalesce: bool = True
     ):
         """
         Initialize the Ollama LLM.
@@ -27,138 +47,333 @@ class OllamaWrapper:
         Args:
             model_name: Name of the model to use
             temperature: Sampling temperature
-            num_ctx: Context window size
+            num_ctx: Largest context window size
+            prompt_layout: "context_first" puts the document context before
+                the question-specific instructions so consecutive questions
+                about the same document share a cacheable prompt prefix,
+                "classic" puts the instructions first
+            keep_alive: How long Ollama keeps the model loaded after a
+                request (e.g. "30m", -1 for forever, None for the server default)
+            context_buckets: Context window sizes to choose from per prompt
+                (the smallest that fits is used); None always uses num_ctx
+            response_tokens: Tokens reserved for the response when sizing
+                the context window
+            pool: Ollama hosts the requests are routed over (the host from
+                OLLAMA_HOST if None)
+            coalesce: Whether identical requests running at the same time
+                share one generation
         """
         self.model_name = model_name
         self.temperature = temperature
         self.num_ctx = num_ctx
+        self.prompt_layout = prompt_layout
+        self.context_buckets = context_buckets
+        self.response_tokens = response_tokens
+        self.token_counter = TokenCounter()
+        self.pool = pool or OllamaPool()
+        self.single_flight = SingleFlight() if coalesce else None
         
-        # Initialize the LLM
-        self.llm = OllamaLLM(
-            model=model_name,
-            temperature=temperature,
-            num_ctx=num_ctx
-        )
+        # Context window of the latest request, which Ollama keeps loaded
+        self.last_num_ctx: Optional[int] = None
+        
+        # Ollama reads bare numbers as seconds, but only when sent as numbers
+        if isinstance(keep_alive, str) and keep_alive.lstrip("-").isdigit():
+            keep_alive = int(keep_alive)
+        self.keep_alive = keep_alive
+        
+        # Reuse one instance with identical options per host and context size,
+        # so Ollama keeps the loaded model and its prompt cache between questions
+        self._llms = {}
+        self.llm = self.get_llm()
+        self.streaming_llm = self.get_llm(streaming=True)
+        
+        # Define the standard RAG prompt template and question-specific prompts
+        self.rag_prompt_template = build_prompt_template(RAG_INSTRUCTIONS, prompt_layout)
+        self.question_prompts = build_question_prompts(prompt_layout)
+    
+    def get_llm(self, num_ctx: Optional[int] = None, streaming: bool = False, host: Optional[str] = None):
+        """
+        Get the LLM instance for a context window size on a host.
+        
+        Args:
+            num_ctx: Context window size (the largest if None)
+            streaming: Whether to get the streaming instance
+            host: Host URL (the pool's first host if None)
+        
+        Returns:
+            The Ollama LLM instance
+        """
+        num_ctx = num_ctx or self.num_ctx
+        host = host or self.pool.hosts[0].url
+        key = (host, num_ctx, streaming)
+        if key not in self._llms:
+            self._llms[key] = OllamaLLM(
+                model=self.model_name,
+                temperature=self.temperature,
+                num_ctx=num_ctx,
+                keep_alive=self.keep_alive,
+                streaming=streaming,
+                base_url=host
+            )
+        return self._llms[key]
+    
+    def count_context_tokens(self, docs: List[Document]) -> int:
+        """
+        Estimate the tokens of documents formatted as prompt context.
+        
+        Each page or chunk is counted once and then served from the cache.
+        
+        Args:
+            docs: Documents included in the context
+        
+        Returns:
+            Estimated token count
+        """
+        return sum(self.token_counter.count(doc.page_content) + PAGE_FRAME_TOKENS for doc in docs)
+    
+    def count_prompt_tokens(self, context_tokens: int, query: str, question=None) -> int:
+        """
+        Estimate the tokens of a full prompt from its context tokens.
+        
+        Args:
+            context_tokens: Estimated tokens of the formatted context
+            query: User query
+            question: The question to determine which prompt to use
+        
+        Returns:
+            Estimated token count
+        """
+        template = self.get_prompt_template(question).template
+        return context_tokens + self.token_counter.count(template) + self.token_counter.count(query)
+    
+    def select_num_ctx(self, prompt_tokens: int) -> int:
+        """
+        Choose the smallest context window that fits a prompt and its response.
+        
+        Args:
+            prompt_tokens: Estimated tokens of the prompt
+        
+        Returns:
+            Context window size
+        
+        Raises:
+            ContextWindowExceededError: If the prompt does not fit into num_ctx
+        """
+        return select_context_size(prompt_tokens + self.response_tokens, self.num_ctx, self.context_buckets)
+    
+    def prompt_num_ctx(self, prompt: str, num_ctx: Optional[int] = None) -> int:
+        """
+        Get the context window a prompt is sent with.
+        
+        Args:
+            prompt: Full prompt string
+            num_ctx: Context window size (chosen from the prompt length if None)
+        
+        Returns:
+            Context window size
+        """
+        if num_ctx is None:
+            num_ctx = self.select_num_ctx(self.token_counter.count(prompt))
+        return num_ctx
+    
+    def _request_num_ctx(self, prompt: str, num_ctx: Optional[int]) -> int:
+        """
+        Get the context window of a request and remember it as the latest.
         
-        # Define the standard RAG prompt template
-        self.rag_prompt_template = PromptTemplate.from_template(
-            """Bitte beantworte die folgende Frage basierend ausschließlich auf dem bereitgestellten Kontext. 
-            Wenn die Antwort nicht im Kontext zu finden ist, antworte mit "Die Antwort ist nicht im Dokument enthalten."
-            Nutze alle relevanten Informationen und sei so detailliert wie möglich.
+        Args:
+            prompt: Full prompt string
+            num_ctx: Context window size (chosen from the prompt length if None)
+        
+        Returns:
+            Context window size
+        """
+        self.last_num_ctx = self.prompt_num_ctx(prompt, num_ctx)
+        return self.last_num_ctx
+    
+    def get_prompt_template(self, question=None) -> PromptTemplate:
+        """
+        Get the prompt template for a question.
+        
+        Args:
+            question: The question to determine which prompt to use
             
-            Wichtig: 
-            1. Beziehe dich bei deinen Antworten immer auf die Seitenzahlen im Dokument (PAGE NUMBER X).
-            2. Gib für wichtige Informationen und Zitate immer die Seitenzahl an, auf der sie zu finden sind.
+        Returns:
+            The question-specific template, or the standard RAG template
+        """
+        if question and question in self.question_prompts:
+            return self.question_prompts[question]
+        return self.rag_prompt_template
+    
+    @staticmethod
+    def format_context(docs: List[Document]) -> str:
+        """
+        Format documents with page numbers as prompt context.
+        
+        Args:
+            docs: Documents to include in the context
             
-            Kontext:
-            {context}
+        Returns:
+            Formatted context string
+        """
+        formatted_docs = []
+        for doc in docs:
+            page_number = doc.metadata.get("page", 1)
+            formatted_text = f"""
+=========
+PAGE NUMBER {page_number}
+=========
+{doc.page_content}
+=========
+PAGE END
+========="""
+            formatted_docs.append(formatted_text)
+        return "\n\n".join(formatted_docs)
+    
+    def build_prompt(self, context: str, query: str, question=None) -> str:
+        """
+        Build the full prompt for a query.
+        
+        Args:
+            context: Formatted document context
+            query: User query
+            question: The question to determine which prompt to use
+            
+        Returns:
+            The prompt string sent to the LLM
+        """
+        prompt_template = self.get_prompt_template(question)
+        return prompt_template.format_prompt(context=context, query=query).to_string()
+    
+    def stream(self, prompt: str, num_ctx: Optional[int] = None) -> Iterator[str]:
+        """
+        Stream the LLM response to a prompt.
+        
+        Identical requests running at the same time share one generation;
+        each caller receives the complete stream.
+        
+        Args:
+            prompt: Full prompt string
+            num_ctx: Context window size (chosen from the prompt length if None)
             
-            Frage: {query}
+        Returns:
+            Iterator over response chunks
+        """
+        num_ctx = self._request_num_ctx(prompt, num_ctx)
+        if self.single_flight:
+            return self.single_flight.stream(
+                self.request_key(prompt, num_ctx),
+                lambda: self._generate(prompt, num_ctx)
+            )
+        return self._generate(prompt, num_ctx)
+    
+    def invoke(self, prompt: str, num_ctx: Optional[int] = None) -> str:
+        """
+        Generate the LLM response to a prompt.
+        
+        Args:
+            prompt: Full prompt string
+            num_ctx: Context window size (chosen from the prompt length if None)
             
-            Antwort:"""
+        Returns:
+            The response
+        """
+        num_ctx = self._request_num_ctx(prompt, num_ctx)
+        if self.single_flight:
+            # Join or start the shared stream, so invoke and stream requests coalesce too
+            return "".join(self.stream(prompt, num_ctx))
+        return self.pool.run(
+            lambda host: self.get_llm(num_ctx, host=host).invoke(prompt),
+            self.pool.route_key(prompt)
         )
+    
+    async def astream(self, prompt: str, num_ctx: Optional[int] = None) -> AsyncIterator[str]:
+        """
+        Stream the LLM response to a prompt without blocking the event loop.
+        
+        The generation uses the async Ollama client on the event loop;
+        identical requests running at the same time share it.
         
-        # Define question-specific prompts
-        self.question_prompts = {
-            "Bitte schreibe eine zusammenfassung der Akte in ca. 250 Wörtern": PromptTemplate.from_template(
-                """Bitte schreibe eine Zusammenfassung der folgenden Akte in GENAU 200-250 Wörtern. 
-                Die Antwort MUSS auf Deutsch sein und die Wortzahl zwischen 200 und 250 liegen. Nicht mehr und nicht weniger.
-                
-                Beziehe dich dabei auf die wichtigsten Aspekte des Falles, wie Tatbestand, beteiligte Personen, Ergebnisse, 
-                und rechtliche Einschätzungen. Nutze alle relevanten Informationen aus dem bereitgestellten Kontext.
-                
-                Wichtig: 
-                1. Beziehe dich bei deinen Antworten immer auf die Seitenzahlen im Dokument (PAGE NUMBER X).
-                2. Gib für wichtige Informationen und Zitate immer die Seitenzahl an, auf der sie zu finden sind.
-                3. Erwähne NICHT die Wortzahl in deiner Antwort. Schreibe die Zusammenfassung einfach mit der richtigen Länge.
-                
-                Kontext:
-                {context}
-                
-                Frage: {query}
-                
-                Antwort:"""
-            ),
-            "Bitte erstelle ein formatiertes Inhaltsverzeichnis mit zusammenfassenden Titeln und Seitenangaben": PromptTemplate.from_template(
-                """Erstelle ein detailliertes, formatiertes Inhaltsverzeichnis für das vorliegende Dokument. 
-                
-                Das Inhaltsverzeichnis soll:
-                - Alle wichtigen Abschnitte und Unterabschnitte des Dokuments enthalten
-                - Für jeden Eintrag einen kurzen, aussagekräftigen Titel haben, der den Inhalt zusammenfasst
-                - Bei jedem Eintrag die entsprechende Seitenzahl angeben
-                - Eine klare hierarchische Struktur aufweisen
-                
-                Bitte achte besonders auf eine übersichtliche Formatierung, die die Struktur des Dokuments deutlich macht.
-                Verwende die Seitenzahlen, die im Kontext als "PAGE NUMBER X" angegeben sind.
-                
-                Kontext:
-                {context}
-                
-                Frage: {query}
-                
-                Antwort:"""
-            ),
-            "Bitte gib mir, formatiert, eine Ausgabe über alle Beteiligte mit Kontaktangaben, außer der Kanzlei Riedl": PromptTemplate.from_template(
-                """Erstelle eine strukturierte Liste aller am Fall beteiligten Personen und Parteien mit ihren vollständigen Kontaktdaten.
-                
-                Die Liste soll:
-                - Alle Beteiligten mit vollständigem Namen auflisten
-                - Für jede Person/Partei alle verfügbaren Kontaktinformationen angeben (Adresse, Telefonnummer, E-Mail, etc.)
-                - Klar formatiert und übersichtlich sein
-                - Die Kanzlei Riedl und deren Mitarbeiter NICHT enthalten
-                - Die Rolle jeder Person im Fall angeben (z.B. Beschuldigter, Zeuge, Geschädigter, etc.)
-                
-                Bitte gib für jede Information die entsprechende Seitenzahl an, auf der sie im Dokument zu finden ist.
-                
-                Kontext:
-                {context}
-                
-                Frage: {query}
-                
-                Antwort:"""
-            ),
-            "Waren bei dem Fall Drogen, Alkohol, Medikamente oder Fahrerflucht im Spiel": PromptTemplate.from_template(
-                """Untersuche das Dokument gründlich nach Hinweisen auf:
-                1. Drogenkonsum oder -besitz
-                2. Alkoholkonsum
-                3. Einnahme von Medikamenten mit Auswirkung auf die Fahrtüchtigkeit
-                4. Fahrerflucht
-                
-                Beantworte die Frage eindeutig mit Ja oder Nein für jeden dieser Aspekte und führe die entsprechenden Belege mit Seitenzahlen an.
-                Falls zu einem Aspekt keine Informationen vorliegen, gib an, dass dazu keine Angaben im Dokument zu finden sind.
-                
-                Kontext:
-                {context}
-                
-                Frage: {query}
-                
-                Antwort:"""
-            ),
-            "Bitte beantworte kurz und knapp wer der Schuldige in dem Fall war und wie hoch der Schade ist": PromptTemplate.from_template(
-                """Beantworte präzise und kompakt folgende zwei Fragen:
-                
-                1. Wer trägt die Schuld in diesem Fall? (Nenne konkret die Person oder Partei)
-                2. Wie hoch ist der entstandene Schaden? (Gib den exakten Betrag mit Währung an)
-                
-                Die Antwort soll kurz und prägnant sein, nicht mehr als 2-3 Sätze. Beziehe dich ausschließlich auf die Fakten aus dem Dokument und gib die entsprechenden Seitenzahlen an.
-                
-                Kontext:
-                {context}
-                
-                Frage: {query}
-                
-                Antwort:"""
+        Args:
+            prompt: Full prompt string
+            num_ctx: Context window size (chosen from the prompt length if None)
+            
+        Returns:
+            Async iterator over response chunks
+        """
+        num_ctx = self._request_num_ctx(prompt, num_ctx)
+        if self.single_flight:
+            chunks = self.single_flight.astream(
+                self.request_key(prompt, num_ctx),
+                lambda: self._agenerate(prompt, num_ctx)
             )
-        }
+        else:
+            chunks = self._agenerate(prompt, num_ctx)
+        async for chunk in chunks:
+            yield chunk
     
-    def get_llm(self):
+    async def ainvoke(self, prompt: str, num_ctx: Optional[int] = None) -> str:
         """
-        Get the LLM instance.
+        Generate the LLM response to a prompt without blocking the event loop.
         
+        Args:
+            prompt: Full prompt string
+            num_ctx: Context window size (chosen from the prompt length if None)
+            
         Returns:
-            The Ollama LLM instance
+            The response
+        """
+        num_ctx = self._request_num_ctx(prompt, num_ctx)
+        if self.single_flight:
+            return "".join([chunk async for chunk in self.astream(prompt, num_ctx)])
+        return await self.pool.arun(
+            lambda host: self.get_llm(num_ctx, host=host).ainvoke(prompt),
+            self.pool.route_key(prompt)
+        )
+    
+    def request_key(self, prompt: str, num_ctx: int) -> str:
+        """
+        Get the key under which identical requests share a generation.
+        
+        Args:
+            prompt: Full prompt string
+            num_ctx: Context window size
+            
+        Returns:
+            Key of the model, the options that change the response and the prompt
+        """
+        return request_key(self.model_name, {"temperature": self.temperature, "num_ctx": num_ctx}, prompt)
+    
+    def _generate(self, prompt: str, num_ctx: int) -> Iterator[str]:
         """
-        return self.llm
+        Stream a new generation from a host of the pool.
+        
+        Args:
+            prompt: Full prompt string
+            num_ctx: Context window size
+            
+        Returns:
+            Iterator over response chunks
+        """
+        return self.pool.stream(
+            lambda host: self.get_llm(num_ctx, streaming=True, host=host).stream(prompt),
+            self.pool.route_key(prompt)
+        )
+    
+    def _agenerate(self, prompt: str, num_ctx: int) -> AsyncIterator[str]:
+        """
+        Stream a new generation from a host of the pool with the async client.
+        
+        Args:
+            prompt: Full prompt string
+            num_ctx: Context window size
+            
+        Returns:
+            Async iterator over response chunks
+        """
+        return self.pool.astream(
+            lambda host: self.get_llm(num_ctx, streaming=True, host=host).astream(prompt),
+            self.pool.route_key(prompt)
+        )
     
     def create_rag_chain(self, retriever, question=None):
         """
@@ -171,31 +386,13 @@ class OllamaWrapper:
         Returns:
             A runnable chain that can answer questions
         """
-        # Define how to format documents
-        def format_docs(docs):
-            formatted_docs = []
-            for doc in docs:
-                page_number = doc.metadata.get("page", 1)
-                formatted_text = f"""
-=========
-PAGE NUMBER {page_number}
-=========
-{doc.page_content}
-=========
-PAGE END
-========="""
-                formatted_docs.append(formatted_text)
-            return "\n\n".join(formatted_docs)
-        
         # Create a function that combines retrieval and formatting
         def retrieve_and_format(query_str):
             docs = retriever.invoke(query_str)
-            return format_docs(docs)
+            return self.format_context(docs)
         
         # Select the appropriate prompt template
-        prompt_template = self.rag_prompt_template
-        if question and question in self.question_prompts:
-            prompt_template = self.question_prompts[question]
+        prompt_template = self.get_prompt_template(question)
         
         # Create the RAG chain
         rag_chain = (
@@ -204,12 +401,83 @@ PAGE END
                 "query": RunnablePassthrough(),
             }
             | prompt_template
-            | self.llm
+            | RunnableLambda(
+                lambda prompt_value: self.invoke(prompt_value.to_string()),
+                afunc=lambda prompt_value: self.ainvoke(prompt_value.to_string())
+            )
             | StrOutputParser()
         )
         
         return rag_chain
 
+    def stream_documents_answer(
+        self,
+        query: str,
+        docs: List[Document],
+        question=None,
+        min_num_ctx: Optional[int] = None
+    ) -> Iterator[str]:
+        """
+        Stream the answer to a query about the given documents.
+        
+        Args:
+            query: User query
+            docs: Documents used as context
+            question: The question to determine which prompt to use
+            min_num_ctx: Context window used unless the prompt needs a larger
+                one, so similar queries do not make Ollama reload the model
+            
+        Returns:
+            Iterator over answer chunks
+        """
+        # Format the context with page numbers and size the context window to the prompt
+        prompt = self.build_prompt(self.format_context(docs), query, question)
+        return self.stream(prompt, self._documents_num_ctx(query, docs, question, min_num_ctx))
+    
+    def astream_documents_answer(
+        self,
+        query: str,
+        docs: List[Document],
+        question=None,
+        min_num_ctx: Optional[int] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream the answer to a query about the given documents with the async Ollama client.
+        
+        Args:
+            query: User query
+            docs: Documents used as context
+            question: The question to determine which prompt to use
+            min_num_ctx: Context window used unless the prompt needs a larger one
+            
+        Returns:
+            Async iterator over answer chunks
+        """
+        prompt = self.build_prompt(self.format_context(docs), query, question)
+        return self.astream(prompt, self._documents_num_ctx(query, docs, question, min_num_ctx))
+    
+    def _documents_num_ctx(
+        self,
+        query: str,
+        docs: List[Document],
+        question=None,
+        min_num_ctx: Optional[int] = None
+    ) -> int:
+        """
+        Choose the context window of a query about the given documents.
+        
+        Args:
+            query: User query
+            docs: Documents used as context
+            question: The question to determine which prompt to use
+            min_num_ctx: Context window used unless the prompt needs a larger one
+            
+        Returns:
+            Context window size
+        """
+        num_ctx = self.select_num_ctx(self.count_prompt_tokens(self.count_context_tokens(docs), query, question))
+        return max(num_ctx, min_num_ctx or 0)
+    
     def stream_answer(self, query: str, retriever, question=None) -> str:
         """
         Stream the answer in real-time to the console.
@@ -225,51 +493,13 @@ PAGE END
         # Get context from retriever
         docs = retriever.invoke(query)
         
-        # Format documents with page numbers
-        formatted_docs = []
-        for doc in docs:
-            page_number = doc.metadata.get("page", 1)
-            formatted_text = f"""
-=========
-PAGE NUMBER {page_number}
-=========
-{doc.page_content}
-=========
-PAGE END
-========="""
-            formatted_docs.append(formatted_text)
-        
-        context = "\n\n".join(formatted_docs)
-        
-        # Select the appropriate prompt template
-        prompt_template = self.rag_prompt_template
-        if question and question in self.question_prompts:
-            prompt_template = self.question_prompts[question]
-        
-        # Prepare inputs
-        inputs = {
-            "context": context,
-            "query": query
-        }
-        
-        # Get prepared prompt
-        prompt = prompt_template.format_prompt(**inputs).to_string()
-        
-        # Set streaming=True parameter
-        streaming_llm = OllamaLLM(
-            model=self.model_name,
-            temperature=self.temperature,
-            num_ctx=self.num_ctx,
-            streaming=True
-        )
-        
         # Stream the response
         response = ""
         print("\nAntwort: ", end="", flush=True)
-        for chunk in streaming_llm.stream(prompt):
+        for chunk in self.stream_documents_answer(query, docs, question):
             print(chunk, end="", flush=True)
             response += chunk
             
         print("\n")  # Add a newline at the end
         
-        return response 
\ No newline at end of file
+        return response
\ No newline at end of file
@@ -0,0 +1,83 @@
+"""
+Thread-safe in-memory LRU cache.
+"""
+from typing import Any, Hashable
+from collections import OrderedDict
+import threading
+
+
+class LRUCache:
+    """
+    Bounded mapping that evicts the least recently used entry.
+    """
+    
+    def __init__(self, max_entries: int = 128):
+        """
+        Initialize the cache.
+        
+        Args:
+            max_entries: Maximum number of entries kept in memory
+        """
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Get an entry and mark it as recently used.
+        
+        Args:
+            key: Cache key
+            default: Value returned if the key is missing
+            
+        Returns:
+            Cached value or default
+        """
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            return self._entries[key]
+    
+    def put(self, key: Hashable, value: Any) -> None:
+        """
+        Store an entry, evicting the least recently used one if full.
+        
+        Args:
+            key: Cache key
+            value: Value to store
+        """
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Remove an entry.
+        
+        Args:
+            key: Cache key
+            default: Value returned if the key is missing
+            
+        Returns:
+            Removed value or default
+        """
+        with self._lock:
+            return self._entries.pop(key, default)
+    
+    def clear(self) -> None:
+        """
+        Remove all entries.
+        """
+        with self._lock:
+            self._entries.clear()
+    
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._entries
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
@@ -0,0 +1,175 @@
+"""
+Ingest manifest module for tracking which PDFs are already in the vector store.
+"""
+from typing import Dict, List, Any, Tuple
+import json
+import os
+
+from rag.hashing import file_sha256
+
+
+class IngestManifest:
+    """
+    Persistent record of ingested PDF files.
+    
+    For every file the manifest stores its content hash, mtime, size and the
+    ids of the chunks it produced, together with the settings (chunking
+    parameters, embedding model) the chunks were created with. This lets an
+    ingest run parse and embed only new or changed files.
+    """
+    
+    VERSION = 1
+    
+    def __init__(self, manifest_path: str):
+        """
+        Initialize the manifest, loading it from disk if it exists.
+        
+        Args:
+            manifest_path: Path of the JSON manifest file
+        """
+        self.manifest_path = manifest_path
+        self.settings: Dict[str, Any] = {}
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.exists = os.path.exists(manifest_path)
+        
+        if self.exists:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == self.VERSION:
+                self.settings = data.get("settings", {})
+                self.files = data.get("files", {})
+    
+    def settings_match(self, settings: Dict[str, Any]) -> bool:
+        """
+        Check whether the stored chunks were created with the given settings.
+        
+        Args:
+            settings: Current chunking and embedding settings
+        
+        Returns:
+            True if the settings are identical
+        """
+        return self.settings == settings
+    
+    def reset(self, settings: Dict[str, Any]) -> List[str]:
+        """
+        Forget all files and start over with new settings.
+        
+        Args:
+            settings: Settings for the chunks that will be recorded next
+        
+        Returns:
+            Chunk ids of all previously recorded files
+        """
+        chunk_ids = [
+            chunk_id
+            for entry in self.files.values()
+            for chunk_id in entry.get("chunk_ids", [])
+        ]
+        self.settings = dict(settings)
+        self.files = {}
+        return chunk_ids
+    
+    def diff(
+        self,
+        pdf_paths: List[str],
+        base_directory: str
+    ) -> Tuple[List[Tuple[str, str, str]], List[str]]:
+        """
+        Compare the PDFs on disk with the manifest.
+        
+        Files whose mtime and size are unchanged are assumed unchanged without
+        hashing them. Files that were touched but have identical content only
+        get their mtime refreshed.
+        
+        Args:
+            pdf_paths: Paths of the PDF files currently on disk
+            base_directory: Directory the manifest keys are relative to
+        
+        Returns:
+            Tuple of (changed, removed): changed is a list of
+            (path, key, content hash) for new or modified files, removed is a
+            list of manifest keys whose file no longer exists
+        """
+        changed = []
+        seen = set()
+        
+        for pdf_path in pdf_paths:
+            key = os.path.relpath(pdf_path, base_directory)
+            seen.add(key)
+            stat = os.stat(pdf_path)
+            entry = self.files.get(key)
+            
+            if entry and entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size:
+                continue
+            
+            content_hash = file_sha256(pdf_path)
+            if entry and entry["sha256"] == content_hash:
+                entry["mtime"] = stat.st_mtime
+                entry["size"] = stat.st_size
+                continue
+            
+            changed.append((pdf_path, key, content_hash))
+        
+        removed = [key for key in self.files if key not in seen]
+        return changed, removed
+    
+    def chunk_ids(self, key: str) -> List[str]:
+        """
+        Get the chunk ids recorded for a file.
+        
+        Args:
+            key: Manifest key of the file
+        
+        Returns:
+            List of chunk ids (empty if the file is unknown)
+        """
+        entry = self.files.get(key)
+        return list(entry.get("chunk_ids", [])) if entry else []
+    
+    def record(self, pdf_path: str, key: str, content_hash: str, chunk_ids: List[str]) -> None:
+        """
+        Record a successfully ingested file.
+        
+        Args:
+            pdf_path: Path to the PDF file
+            key: Manifest key of the file
+            content_hash: SHA-256 of the file content
+            chunk_ids: Ids of the chunks stored for this file
+        """
+        stat = os.stat(pdf_path)
+        self.files[key] = {
+            "sha256": content_hash,
+            "mtime": stat.st_mtime,
+            "size": stat.st_size,
+            "chunk_ids": list(chunk_ids)
+        }
+    
+    def forget(self, key: str) -> List[str]:
+        """
+        Remove a file from the manifest.
+        
+        Args:
+            key: Manifest key of the file
+        
+        Returns:
+            Chunk ids that were recorded for the file
+        """
+        entry = self.files.pop(key, None)
+        return list(entry.get("chunk_ids", [])) if entry else []
+    
+    def save(self) -> None:
+        """
+        Write the manifest to disk atomically.
+        """
+        os.makedirs(os.path.dirname(self.manifest_path) or ".", exist_ok=True)
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"version": self.VERSION, "settings": self.settings, "files": self.files},
+                f,
+                ensure_ascii=False,
+                indent=2
+            )
+        os.replace(tmp_path, self.manifest_path)
+        self.exists = True
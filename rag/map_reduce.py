@@ -0,0 +1,221 @@
+"""
+Map-reduce module for answering questions about documents that exceed the
+context window.
+"""
+from typing import List, Callable, Optional
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+from langchain_core.documents import Document
+
+from rag.llm import OllamaWrapper
+from rag.answer_cache import AnswerCache
+from rag.hashing import text_sha256
+from rag.prompts import build_map_prompt_template
+from rag.token_budget import ContextWindowExceededError
+
+# Maximum number of times notes are condensed again when they still do not fit
+MAX_LEVELS = 3
+
+
+class MapReducer:
+    """
+    Condenses a document that does not fit into the context window into notes
+    that do.
+    
+    The map step splits the pages into windows that fit the context window
+    and turns each window into question-independent notes, several windows
+    at a time. The notes replace the document as context, so the reduce step
+    is the normal question prompt and all questions about a document share
+    one set of notes. Notes are cached per document, page window, model and
+    map prompt.
+    """
+    
+    def __init__(
+        self,
+        llm: OllamaWrapper,
+        notes_cache: Optional[AnswerCache] = None,
+        concurrency: int = 1,
+        window_tokens: int = 24576
+    ):
+        """
+        Initialize the map-reducer.
+        
+        Args:
+            llm: LLM wrapper used for the map step
+            notes_cache: Cache for the notes of each page window (no caching if None)
+            concurrency: Maximum number of windows condensed at the same time
+            window_tokens: Maximum tokens of pages condensed in one map prompt;
+                smaller windows give more detailed notes
+        """
+        self.llm = llm
+        self.notes_cache = notes_cache
+        self.concurrency = max(1, concurrency)
+        self.window_tokens = window_tokens
+        self.map_prompt_template = build_map_prompt_template()
+    
+    def fits(self, context_tokens: int, questions: List[str]) -> bool:
+        """
+        Check whether a context fits into the context window for all questions.
+        
+        Args:
+            context_tokens: Estimated tokens of the context
+            questions: Questions that will be asked
+        
+        Returns:
+            True if no question needs the map-reduce mode
+        """
+        try:
+            for question in questions:
+                self.llm.select_num_ctx(self.llm.count_prompt_tokens(context_tokens, question, question))
+        except ContextWindowExceededError:
+            return False
+        return True
+    
+    def condense(
+        self,
+        pages: List[Document],
+        content_hash: str,
+        questions: List[str],
+        progress: Optional[Callable[[str], None]] = None
+    ) -> List[Document]:
+        """
+        Condense pages into notes that fit into the context window.
+        
+        Args:
+            pages: Page documents with page metadata
+            content_hash: SHA-256 of the source PDF (part of the cache key)
+            questions: Questions the notes must leave room for
+            progress: Function receiving progress messages
+        
+        Returns:
+            One note document per page window, with the page range as page
+        """
+        documents = pages
+        for level in range(MAX_LEVELS):
+            documents = self._map(documents, content_hash, level, progress)
+            if self.fits(self.llm.count_context_tokens(documents), questions):
+                return documents
+            
+            # Condense the notes again; their cache key is their own content
+            content_hash = text_sha256("".join(doc.page_content for doc in documents))
+        
+        raise ContextWindowExceededError(self.llm.count_context_tokens(documents), self.llm.num_ctx)
+    
+    def _map(
+        self,
+        documents: List[Document],
+        content_hash: str,
+        level: int,
+        progress: Optional[Callable[[str], None]] = None
+    ) -> List[Document]:
+        """
+        Condense each window of documents into notes.
+        
+        Args:
+            documents: Pages or notes to condense
+            content_hash: Hash identifying the documents
+            level: Number of times the document was condensed before
+            progress: Function receiving progress messages
+        
+        Returns:
+            Note documents in window order
+        """
+        windows = self._split_windows(documents)
+        done = [0]
+        lock = threading.Lock()
+        
+        def condense_window(window):
+            notes = self._condense_window(window, content_hash, level)
+            with lock:
+                done[0] += 1
+                message = f"Condensed pages {window_pages(window)} ({done[0]}/{len(windows)})"
+            if progress:
+                progress(message)
+            return Document(
+                page_content=notes,
+                metadata={**window[0].metadata, "page": window_pages(window), "is_notes": True}
+            )
+        
+        if progress:
+            progress(f"Document exceeds the context window, condensing {len(windows)} page windows...")
+        
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            return list(executor.map(condense_window, windows))
+    
+    def _condense_window(self, window: List[Document], content_hash: str, level: int) -> str:
+        """
+        Condense one window of documents into notes, using the cache.
+        
+        Args:
+            window: Documents of the window
+            content_hash: Hash identifying the whole document
+            level: Number of times the document was condensed before
+        
+        Returns:
+            Notes for the window
+        """
+        prompt = self.map_prompt_template.format(context=self.llm.format_context(window))
+        num_ctx = self.llm.prompt_num_ctx(prompt)
+        cache_key = AnswerCache.make_key(
+            content_hash,
+            f"map:{level}:{window_pages(window)}",
+            self.map_prompt_template.template,
+            self.llm.model_name,
+            self.llm.temperature,
+            num_ctx
+        )
+        
+        notes = self.notes_cache.get(cache_key) if self.notes_cache else None
+        if notes is None:
+            notes = self.llm.invoke(prompt, num_ctx)
+            if self.notes_cache:
+                self.notes_cache.put(cache_key, notes)
+        return notes
+    
+    def _split_windows(self, documents: List[Document]) -> List[List[Document]]:
+        """
+        Split documents into consecutive windows that fit the map prompt.
+        
+        Args:
+            documents: Pages or notes to split
+        
+        Returns:
+            List of windows
+        """
+        budget = min(
+            self.window_tokens,
+            self.llm.num_ctx
+            - self.llm.response_tokens
+            - self.llm.token_counter.count(self.map_prompt_template.template)
+        )
+        
+        windows = []
+        window = []
+        window_tokens = 0
+        for doc in documents:
+            tokens = self.llm.count_context_tokens([doc])
+            if window and window_tokens + tokens > budget:
+                windows.append(window)
+                window = []
+                window_tokens = 0
+            window.append(doc)
+            window_tokens += tokens
+        if window:
+            windows.append(window)
+        return windows
+
+
+def window_pages(window: List[Document]) -> str:
+    """
+    Get the page range covered by a window.
+    
+    Args:
+        window: Documents of the window
+    
+    Returns:
+        Page range such as "3-7", or a single page number
+    """
+    first = str(window[0].metadata.get("page", 1)).split("-")[0]
+    last = str(window[-1].metadata.get("page", 1)).split("-")[-1]
+    return first if first == last else f"{first}-{last}"
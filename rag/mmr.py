@@ -0,0 +1,50 @@
+"""
+Maximal marginal relevance module for selecting diverse search results.
+"""
+from typing import List
+
+import numpy as np
+
+
+def maximal_marginal_relevance(
+    query_embedding: List[float],
+    candidate_embeddings: List[List[float]],
+    k: int,
+    lambda_mult: float = 0.5
+) -> List[int]:
+    """
+    Select diverse candidates by maximal marginal relevance.
+    
+    Similarities between all candidates are computed in one matrix product,
+    and each step updates every candidate's redundancy with one vector
+    maximum, so the selection costs O(k * n) after the product.
+    
+    Args:
+        query_embedding: Query embedding
+        candidate_embeddings: Candidate embeddings, most similar first
+        k: Number of candidates to select
+        lambda_mult: Weight of relevance against diversity
+        
+    Returns:
+        Indexes of the selected candidates in selection order
+    """
+    candidates = np.asarray(candidate_embeddings, dtype=np.float32)
+    if k <= 0 or len(candidates) == 0:
+        return []
+    
+    # Normalize once so all cosine similarities are dot products
+    candidates = candidates / np.maximum(np.linalg.norm(candidates, axis=1, keepdims=True), 1e-12)
+    query = np.asarray(query_embedding, dtype=np.float32)
+    query = query / max(float(np.linalg.norm(query)), 1e-12)
+    relevance = candidates @ query
+    similarity = candidates @ candidates.T
+    
+    selected = [int(np.argmax(relevance))]
+    redundancy = similarity[selected[0]].copy()
+    while len(selected) < min(k, len(candidates)):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[selected] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        redundancy = np.maximum(redundancy, similarity[best])
+    return selected
@@ -0,0 +1,483 @@
+"""
+Ollama pool module for spreading requests over several Ollama hosts.
+"""
+from typing import Dict, List, Any, AsyncIterator, Awaitable, Callable, Iterator, Optional, TypeVar
+import hashlib
+import threading
+import time
+
+import httpx
+from langchain_core.embeddings import Embeddings
+from langchain_ollama import OllamaEmbeddings
+from ollama import Client, ResponseError
+
+T = TypeVar("T")
+
+# Prompt characters that identify a request's prompt cache prefix
+ROUTE_PREFIX_CHARS = 2048
+
+
+def parse_hosts(value: Optional[str]) -> List[Optional[str]]:
+    """
+    Parse a comma-separated list of Ollama host URLs.
+    
+    Args:
+        value: Host URLs such as "http://gpu1:11434,http://gpu2:11434"
+    
+    Returns:
+        Host URLs, or [None] (the host from OLLAMA_HOST) if the value is empty
+    """
+    hosts = [host.strip() for host in (value or "").split(",") if host.strip()]
+    return hosts or [None]
+
+
+def is_host_error(error: Exception) -> bool:
+    """
+    Check whether an error means the host failed, so another host may succeed.
+    
+    Args:
+        error: Error raised by an Ollama request
+    
+    Returns:
+        True for connection and transport errors and server errors
+    """
+    if isinstance(error, (ConnectionError, httpx.TransportError)):
+        return True
+    return isinstance(error, ResponseError) and error.status_code >= 500
+
+
+class OllamaHost:
+    """
+    Request counters and health of one Ollama host.
+    """
+    
+    def __init__(self, url: Optional[str]):
+        """
+        Initialize the host.
+        
+        Args:
+            url: Host URL (None for the host from OLLAMA_HOST)
+        """
+        self.url = url
+        self.name = url or "default"
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.healthy = True
+        self.down_until = 0.0
+        self.last_error = None
+    
+    def available(self, now: float) -> bool:
+        """
+        Check whether the host takes requests.
+        
+        Args:
+            now: Current time
+        
+        Returns:
+            Whether the host is healthy or its cooldown after a failure has passed
+        """
+        return self.healthy or now >= self.down_until
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get the counters of the host.
+        
+        Returns:
+            Dictionary with healthy, outstanding, requests, failures and last_error
+        """
+        return {
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "failures": self.failures,
+            "last_error": self.last_error
+        }
+
+
+class OllamaPool:
+    """
+    Routes requests over several Ollama hosts serving the same models.
+    
+    Each request goes to the available host with the fewest outstanding
+    requests. Requests with a routing key (the prompt prefix for LLM
+    requests) prefer the host that rendezvous hashing assigns to the key, so
+    questions about the same Akte reach the host that already holds its
+    prompt in the cache; they only move to a less loaded host when the
+    preferred one has more than `sticky_slack` requests more outstanding.
+    A host whose request fails with a connection or server error is taken
+    out for `cooldown_seconds` and the request is retried on the next host.
+    Streams fail over only until their first chunk was received. Optional
+    background health checks take hosts out and back in proactively.
+    """
+    
+    def __init__(
+        self,
+        hosts: Optional[List[Optional[str]]] = None,
+        sticky_slack: Optional[int] = 1,
+        cooldown_seconds: float = 30,
+        health_interval_seconds: float = 15
+    ):
+        """
+        Initialize the pool.
+        
+        Args:
+            hosts: Host URLs ([None], the host from OLLAMA_HOST, if empty)
+            sticky_slack: Extra outstanding requests accepted on a key's
+                preferred host before routing to the least loaded host
+                (None ignores routing keys and routes by load only)
+            cooldown_seconds: Time a failed host is skipped unless no other
+                host is available
+            health_interval_seconds: Time between two health checks of
+                every host (started with start())
+        """
+        self.hosts = [OllamaHost(url) for url in (hosts or [None])]
+        self.sticky_slack = sticky_slack
+        self.cooldown_seconds = cooldown_seconds
+        self.health_interval_seconds = health_interval_seconds
+        
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._failovers = 0
+    
+    @staticmethod
+    def route_key(prompt: str) -> str:
+        """
+        Get the routing key of a prompt.
+        
+        Prompts with the same beginning share Ollama's prompt cache, so the
+        key is derived from the first ROUTE_PREFIX_CHARS characters; with the
+        context_first layout these are the beginning of the Akte.
+        
+        Args:
+            prompt: Full prompt string
+        
+        Returns:
+            Routing key
+        """
+        return hashlib.sha256(prompt[:ROUTE_PREFIX_CHARS].encode("utf-8")).hexdigest()
+    
+    def start(self) -> None:
+        """
+        Start checking the health of every host in a background thread.
+        """
+        if self._thread or len(self.hosts) < 2:
+            return
+        self._thread = threading.Thread(target=self._run, name="ollama-health", daemon=True)
+        self._thread.start()
+    
+    def stop(self) -> None:
+        """
+        Stop the background thread.
+        """
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+    
+    def _run(self) -> None:
+        """
+        Check the hosts until stopped.
+        """
+        while not self._stop.is_set():
+            self.check_health()
+            self._stop.wait(self.health_interval_seconds)
+    
+    def check_health(self) -> None:
+        """
+        Check every host by listing its models and update its health.
+        """
+        for host in self.hosts:
+            try:
+                Client(host=host.url, timeout=5).list()
+            except Exception as e:
+                self._mark_failed(host, e)
+            else:
+                with self._lock:
+                    if not host.healthy:
+                        print(f"Ollama host {host.name} is back")
+                    host.healthy = True
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get the counters of the pool.
+        
+        Returns:
+            Dictionary with the failovers and the counters of every host
+        """
+        with self._lock:
+            return {
+                "failovers": self._failovers,
+                "hosts": {host.name: host.stats() for host in self.hosts}
+            }
+    
+    def _acquire(self, key: Optional[str], tried: List[OllamaHost]) -> OllamaHost:
+        """
+        Choose a host for a request and count the request as outstanding.
+        
+        Args:
+            key: Routing key (None routes by load only)
+            tried: Hosts that already failed this request (at least one host is left)
+        
+        Returns:
+            The host
+        """
+        now = time.time()
+        with self._lock:
+            candidates = [host for host in self.hosts if host not in tried]
+            # Fall back to hosts in cooldown rather than failing without a try
+            candidates = [host for host in candidates if host.available(now)] or candidates
+            
+            host = min(candidates, key=lambda candidate: candidate.outstanding)
+            if key is not None and self.sticky_slack is not None and len(candidates) > 1:
+                preferred = max(
+                    candidates,
+                    key=lambda candidate: hashlib.sha256(f"{key}|{candidate.name}".encode("utf-8")).digest()
+                )
+                if preferred.outstanding <= host.outstanding + self.sticky_slack:
+                    host = preferred
+            
+            host.outstanding += 1
+            host.requests += 1
+            if tried:
+                self._failovers += 1
+            return host
+    
+    def _release(self, host: OllamaHost) -> None:
+        """
+        Count a request of a host as finished.
+        
+        Args:
+            host: Host that served the request
+        """
+        with self._lock:
+            host.outstanding -= 1
+    
+    def _mark_failed(self, host: OllamaHost, error: Exception) -> None:
+        """
+        Take a host out for the cooldown after a failure.
+        
+        Args:
+            host: Host that failed
+            error: The error
+        """
+        with self._lock:
+            if host.healthy:
+                print(f"Ollama host {host.name} failed, skipping it for {self.cooldown_seconds:.0f}s: {str(error)}")
+            host.healthy = False
+            host.failures += 1
+            host.down_until = time.time() + self.cooldown_seconds
+            host.last_error = str(error)
+    
+    def _mark_succeeded(self, host: OllamaHost) -> None:
+        """
+        Take a host back in after a successful request.
+        
+        Args:
+            host: Host that served the request
+        """
+        if not host.healthy:
+            with self._lock:
+                host.healthy = True
+    
+    def run(self, call: Callable[[Optional[str]], T], key: Optional[str] = None) -> T:
+        """
+        Run a request on a host of the pool, failing over to the others.
+        
+        Args:
+            call: Function sending the request to the given host URL
+            key: Routing key (None routes by load only)
+        
+        Returns:
+            The result of the call
+        """
+        tried = []
+        while True:
+            host = self._acquire(key, tried)
+            try:
+                result = call(host.url)
+            except Exception as e:
+                if not is_host_error(e):
+                    raise
+                self._mark_failed(host, e)
+                tried.append(host)
+                if len(tried) == len(self.hosts):
+                    raise
+                continue
+            finally:
+                self._release(host)
+            self._mark_succeeded(host)
+            return result
+    
+    def stream(self, call: Callable[[Optional[str]], Iterator[T]], key: Optional[str] = None) -> Iterator[T]:
+        """
+        Stream a response from a host of the pool, failing over to the
+        others until the first chunk was received.
+        
+        Args:
+            call: Function starting the stream on the given host URL
+            key: Routing key (None routes by load only)
+        
+        Returns:
+            Iterator over the response chunks
+        """
+        tried = []
+        while True:
+            host = self._acquire(key, tried)
+            started = False
+            try:
+                for chunk in call(host.url):
+                    started = True
+                    yield chunk
+            except Exception as e:
+                if started or not is_host_error(e):
+                    raise
+                self._mark_failed(host, e)
+                tried.append(host)
+                if len(tried) == len(self.hosts):
+                    raise
+                continue
+            finally:
+                self._release(host)
+            self._mark_succeeded(host)
+            return
+    
+    async def arun(self, call: Callable[[Optional[str]], Awaitable[T]], key: Optional[str] = None) -> T:
+        """
+        Run an async request on a host of the pool, failing over to the others.
+        
+        Args:
+            call: Function returning the request to the given host URL as awaitable
+            key: Routing key (None routes by load only)
+        
+        Returns:
+            The result of the call
+        """
+        tried = []
+        while True:
+            host = self._acquire(key, tried)
+            try:
+                result = await call(host.url)
+            except Exception as e:
+                if not is_host_error(e):
+                    raise
+                self._mark_failed(host, e)
+                tried.append(host)
+                if len(tried) == len(self.hosts):
+                    raise
+                continue
+            finally:
+                self._release(host)
+            self._mark_succeeded(host)
+            return result
+    
+    async def astream(
+        self,
+        call: Callable[[Optional[str]], AsyncIterator[T]],
+        key: Optional[str] = None
+    ) -> AsyncIterator[T]:
+        """
+        Stream an async response from a host of the pool, failing over to
+        the others until the first chunk was received.
+        
+        Args:
+            call: Function starting the async stream on the given host URL
+            key: Routing key (None routes by load only)
+        
+        Returns:
+            Async iterator over the response chunks
+        """
+        tried = []
+        while True:
+            host = self._acquire(key, tried)
+            started = False
+            try:
+                async for chunk in call(host.url):
+                    started = True
+                    yield chunk
+            except Exception as e:
+                if started or not is_host_error(e):
+                    raise
+                self._mark_failed(host, e)
+                tried.append(host)
+                if len(tried) == len(self.hosts):
+                    raise
+                continue
+            finally:
+                self._release(host)
+            self._mark_succeeded(host)
+            return
+
+
+class PooledEmbeddings(Embeddings):
+    """
+    Ollama embeddings computed on the hosts of a pool.
+    
+    Batches go to the least loaded host, so the parallel embedding requests
+    of an ingestion are spread over all hosts.
+    """
+    
+    def __init__(self, model: str, pool: OllamaPool, keep_alive: Optional[int] = None):
+        """
+        Initialize the embeddings.
+        
+        Args:
+            model: Name of the embedding model
+            pool: Pool of the hosts serving the model
+            keep_alive: Seconds Ollama keeps the model loaded after a request
+        """
+        self.model = model
+        self.pool = pool
+        self._embeddings = {
+            host.url: OllamaEmbeddings(model=model, base_url=host.url, keep_alive=keep_alive)
+            for host in pool.hosts
+        }
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed documents.
+        
+        Args:
+            texts: Texts to embed
+        
+        Returns:
+            Embedding vectors
+        """
+        return self.pool.run(lambda url: self._embeddings[url].embed_documents(texts))
+    
+    def embed_query(self, text: str) -> List[float]:
+        """
+        Embed a query.
+        
+        Args:
+            text: Query text
+        
+        Returns:
+            Embedding vector
+        """
+        return self.pool.run(lambda url: self._embeddings[url].embed_query(text))
+    
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed documents with the async Ollama client.
+        
+        Args:
+            texts: Texts to embed
+        
+        Returns:
+            Embedding vectors
+        """
+        return await self.pool.arun(lambda url: self._embeddings[url].aembed_documents(texts))
+    
+    async def aembed_query(self, text: str) -> List[float]:
+        """
+        Embed a query with the async Ollama client.
+        
+        Args:
+            text: Query text
+        
+        Returns:
+            Embedding vector
+        """
+        return await self.pool.arun(lambda url: self._embeddings[url].aembed_query(text))
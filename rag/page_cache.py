@@ -0,0 +1,200 @@
+"""
+Page cache module so each PDF version is parsed only once.
+"""
+from typing import Dict, List, Optional
+import gzip
+import json
+import os
+
+from langchain_core.documents import Document
+
+from rag.lru import LRUCache
+
+
+class PageCache:
+    """
+    Caches the parsed pages of PDF files by content hash.
+    
+    Pages are kept in an in-memory LRU and, if a cache directory is given,
+    as gzipped JSON files on disk so that they survive restarts and can be
+    shared between parser processes. When the files grow beyond max_bytes
+    the least recently used ones are deleted.
+    """
+    
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        max_entries: int = 32,
+        max_bytes: int = 512 * 1024 * 1024
+    ):
+        """
+        Initialize the page cache.
+        
+        Args:
+            cache_dir: Directory for the on-disk cache (memory only if None)
+            max_entries: Number of parsed files kept in memory
+            max_bytes: Maximum size of the on-disk cache before eviction
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.memory = LRUCache(max_entries)
+        
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+    
+    def _path(self, content_hash: str) -> str:
+        """
+        Get the on-disk location of a cache entry.
+        
+        Args:
+            content_hash: SHA-256 of the PDF content
+            
+        Returns:
+            Path of the gzipped JSON file
+        """
+        return os.path.join(self.cache_dir, f"{content_hash}.json.gz")
+    
+    def get(self, content_hash: str) -> Optional[List[Document]]:
+        """
+        Get the parsed pages of a file.
+        
+        Args:
+            content_hash: SHA-256 of the PDF content
+            
+        Returns:
+            List of page documents, or None if the file was not parsed yet
+        """
+        pages = self.memory.get(content_hash)
+        if pages is not None or not self.cache_dir:
+            return pages
+        
+        path = self._path(content_hash)
+        if not os.path.exists(path):
+            return None
+        
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable page cache entry {path}: {str(e)}")
+            return None
+        
+        self._touch(path)
+        pages = [Document(page_content=item["page_content"], metadata=item["metadata"]) for item in data]
+        self.memory.put(content_hash, pages)
+        return pages
+    
+    def put(self, content_hash: str, pages: List[Document]) -> None:
+        """
+        Store the parsed pages of a file.
+        
+        Args:
+            content_hash: SHA-256 of the PDF content
+            pages: Page documents produced by the PDF loader
+        """
+        self.memory.put(content_hash, pages)
+        if not self.cache_dir:
+            return
+        
+        path = self._path(content_hash)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(
+                [{"page_content": page.page_content, "metadata": page.metadata} for page in pages],
+                f,
+                ensure_ascii=False
+            )
+        os.replace(tmp_path, path)
+        self._evict()
+    
+    def get_terms(self, content_hash: str, version: str) -> Optional[Dict[str, List[int]]]:
+        """
+        Get the term index of a file.
+        
+        Args:
+            content_hash: SHA-256 of the PDF content
+            version: Version of the term group configuration
+            
+        Returns:
+            Dictionary mapping term groups to page indexes, or None if not cached
+        """
+        key = f"{content_hash}.terms-{version}"
+        page_terms = self.memory.get(key)
+        if page_terms is not None or not self.cache_dir:
+            return page_terms
+        
+        path = os.path.join(self.cache_dir, f"{key}.json")
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                page_terms = json.load(f)
+        except (OSError, ValueError):
+            return None
+        
+        self._touch(path)
+        self.memory.put(key, page_terms)
+        return page_terms
+    
+    def put_terms(self, content_hash: str, version: str, page_terms: Dict[str, List[int]]) -> None:
+        """
+        Store the term index of a file.
+        
+        Args:
+            content_hash: SHA-256 of the PDF content
+            version: Version of the term group configuration
+            page_terms: Dictionary mapping term groups to page indexes
+        """
+        key = f"{content_hash}.terms-{version}"
+        self.memory.put(key, page_terms)
+        if not self.cache_dir:
+            return
+        
+        path = os.path.join(self.cache_dir, f"{key}.json")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(page_terms, f)
+        os.replace(tmp_path, path)
+    
+    @staticmethod
+    def _touch(path: str) -> None:
+        """
+        Mark an on-disk entry as recently used.
+        
+        Args:
+            path: Path of the entry
+        """
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+    
+    def _evict(self) -> None:
+        """
+        Delete the least recently used files once the cache exceeds max_bytes.
+        
+        Eviction frees space down to 80% of max_bytes so that it does not
+        run again on the very next write. Other processes sharing the
+        directory may delete the same files; those are skipped.
+        """
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".tmp"):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        
+        size = sum(entry[1] for entry in entries)
+        if size <= self.max_bytes:
+            return
+        
+        budget = int(self.max_bytes * 0.8)
+        for _, file_size, path in sorted(entries):
+            if size <= budget:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            size -= file_size
@@ -1,26 +1,26 @@
 """
 Pipeline module for orchestrating the RAG workflow using LangGraph.
 """
-from typing import Dict, List, Any, TypedDict, Annotated
+from typing import Dict, List, Any, Iterator, AsyncIterator, Optional, Tuple, Annotated, Union
+import asyncio
 import json
 import os
 from pathlib import Path
 
-from langgraph.graph import StateGraph
 from langchain_core.documents import Document
 
 from rag.document_loader import PDFProcessor
-from rag.vector_store import ChromaVectorStore
-from rag.llm import OllamaWrapper
-
-
-class RAGState(TypedDict):
-    """
-    State definition for the RAG pipeline.
-    """
-    query: str
-    documents: List[Document]
-    answer: str
+from rag.vector_store import ChromaVectorStore, VECTOR_RETRIEVAL
+from rag.llm import OllamaWrapper, PAGE_FRAME_TOKENS
+from rag.prompts import CONTEXT_FIRST_LAYOUT
+from rag.token_budget import DEFAULT_CONTEXT_BUCKETS, ContextWindowExceededError
+from rag.manifest import IngestManifest
+from rag.full_document_store import FullDocumentStore
+from rag.answer_cache import AnswerCache
+from rag.map_reduce import MapReducer
+from rag.ollama_pool import OllamaPool
+from rag.warmup import keep_alive_seconds
+from rag.query_graph import QueryGraph, FAILED_ANSWER, echo_event, generation_error
 
 
 class RAGPipeline:
@@ -33,7 +33,23 @@ class RAGPipeline:
         pdf_directory: str = "data/pdfs",
         vector_store_dir: str = "data/chroma",
         embedding_model: str = "jina/jina-embeddings-v2-base-de",
-        llm_model: str = "mistral-nemo:12b-instruct-2407-q8_0"
+        llm_model: str = "mistral-nemo:12b-instruct-2407-q8_0",
+        embed_batch_size: int = 64,
+        max_embed_requests: int = 2,
+        cache_dir: str = "data/cache",
+        prompt_layout: str = CONTEXT_FIRST_LAYOUT,
+        keep_alive: Optional[Union[str, int]] = "30m",
+        embedding_keep_alive: Optional[Union[str, int]] = "30m",
+        num_ctx: int = 98304,
+        context_buckets: Optional[List[int]] = DEFAULT_CONTEXT_BUCKETS,
+        map_concurrency: int = 1,
+        retrieval_mode: str = VECTOR_RETRIEVAL,
+        retrieval_k: int = 8,
+        term_groups: Optional[Dict[str, List[str]]] = None,
+        sharded: bool = False,
+        llm_pool: Optional[OllamaPool] = None,
+        embedding_pool: Optional[OllamaPool] = None,
+        coalesce_llm_requests: bool = True
     ):
         """
         Initialize the RAG pipeline.
@@ -43,53 +59,218 @@ class RAGPipeline:
             vector_store_dir: Directory to store vector embeddings
             embedding_model: Name of the embedding model
             llm_model: Name of the LLM model
+            embed_batch_size: Number of chunks embedded per Ollama request
+            max_embed_requests: Maximum number of embedding requests in flight
+            cache_dir: Directory for persistent caches
+            prompt_layout: Prompt layout ("context_first" or "classic")
+            keep_alive: How long Ollama keeps the LLM loaded between requests
+            embedding_keep_alive: How long Ollama keeps the embedding model
+                loaded between requests
+            num_ctx: Largest context window of the LLM
+            context_buckets: Context window sizes chosen from per prompt
+                (None always uses num_ctx)
+            map_concurrency: Number of page windows condensed at the same time
+                for documents that exceed the context window
+            retrieval_mode: "vector" for similarity search, "hybrid" to fuse
+                it with BM25 keyword search, "mmr" to drop near-duplicate chunks
+            retrieval_k: Number of chunks retrieved per query
+            term_groups: Screening term patterns indexed per page at parse
+                time (DEFAULT_TERM_GROUPS if None)
+            sharded: Whether to store each Akte in its own Chroma collection
+            llm_pool: Ollama hosts the LLM requests are routed over (the
+                host from OLLAMA_HOST if None)
+            embedding_pool: Ollama hosts the embedding requests are routed
+                over (the host from OLLAMA_HOST if None)
+            coalesce_llm_requests: Whether identical LLM requests running at
+                the same time share one generation
         """
         self.pdf_directory = pdf_directory
         self.vector_store_dir = vector_store_dir
+        self.embedding_model = embedding_model
+        self.cache_dir = cache_dir
+        self.retrieval_mode = retrieval_mode
+        self.retrieval_k = retrieval_k
         
         # Initialize components
-        self.pdf_processor = PDFProcessor()
+        self.pdf_processor = PDFProcessor(
+            cache_dir=os.path.join(cache_dir, "pages"),
+            term_groups=term_groups
+        )
         self.vector_store = ChromaVectorStore(
             persist_directory=vector_store_dir,
-            embedding_model=embedding_model
+            embedding_model=embedding_model,
+            embed_batch_size=embed_batch_size,
+            max_embed_requests=max_embed_requests,
+            embedding_cache_dir=os.path.join(cache_dir, "embeddings"),
+            sharded=sharded,
+            embedding_keep_alive=keep_alive_seconds(embedding_keep_alive),
+            embedding_pool=embedding_pool
+        )
+        self.ollama_llm = OllamaWrapper(
+            model_name=llm_model,
+            prompt_layout=prompt_layout,
+            keep_alive=keep_alive,
+            num_ctx=num_ctx,
+            context_buckets=context_buckets,
+            pool=llm_pool,
+            coalesce=coalesce_llm_requests
+        )
+        
+        # Condenses documents that exceed the context window into cached notes
+        self.map_reducer = MapReducer(
+            self.ollama_llm,
+            notes_cache=AnswerCache(os.path.join(cache_dir, "map_notes.sqlite3")),
+            concurrency=map_concurrency
         )
-        self.ollama_llm = OllamaWrapper(model_name=llm_model)
         
-        # Store full documents for direct access
-        self.full_documents = {}
+        # Full documents for direct access, loaded from disk on demand
+        self.full_documents = FullDocumentStore(os.path.join(vector_store_dir, "full_documents"))
         
-        # Initialize LangGraph
-        self.graph = self._build_graph()
+        # Initialize LangGraph (the async graph serves aquery and astream_query)
+        self.query_graph = QueryGraph(self._retrieve, self.ollama_llm, self.retrieval_num_ctx)
     
-    def ingest_documents(self, store_full_docs: bool = True) -> None:
+    def ingest_documents(
+        self,
+        store_full_docs: bool = True,
+        rebuild: bool = False,
+        workers: int = 1
+    ) -> Dict[str, str]:
         """
         Ingest PDF documents into the vector store.
         
+        Only new or changed PDFs are parsed and embedded. Chunks of deleted or
+        replaced PDFs are removed. Changing the chunking parameters or the
+        embedding model triggers a full rebuild.
+        
         Args:
             store_full_docs: Whether to also store full documents for direct access
+            rebuild: Whether to discard the manifest and re-ingest every PDF
+            workers: Number of PDF parser processes (0 uses all CPU cores)
+            
+        Returns:
+            Error message per PDF that could not be processed
         """
-        # Process PDFs for vector store
-        documents = self.pdf_processor.process_directory(self.pdf_directory)
+        manifest = IngestManifest(os.path.join(self.vector_store_dir, "ingest_manifest.json"))
+        settings = {
+            "chunk_size": self.pdf_processor.chunk_size,
+            "chunk_overlap": self.pdf_processor.chunk_overlap,
+            "embedding_model": self.embedding_model
+        }
+        if self.vector_store.sharded:
+            # Switching to sharded collections needs a rebuild
+            settings["sharded"] = True
+        
+        if rebuild or not manifest.exists or not manifest.settings_match(settings):
+            # Chunks from an untracked or outdated ingest cannot be matched to files
+            print("Rebuilding vector store from scratch...")
+            manifest.reset(settings)
+            self.vector_store.clear()
+            self.full_documents.clear()
         
-        # Add to vector store
-        self.vector_store.add_documents(documents)
+        # Index chunks of earlier ingests that are missing from the lexical index
+        self.vector_store.sync_lexical_index()
+        
+        pdf_files = sorted(str(pdf_path) for pdf_path in Path(self.pdf_directory).glob("**/*.pdf"))
+        changed, removed = manifest.diff(pdf_files, self.pdf_directory)
+        print(f"Found {len(pdf_files)} PDF files: {len(changed)} new or changed, {len(removed)} removed")
+        
+        # Drop chunks of deleted files
+        for key in removed:
+            self.vector_store.delete_documents(manifest.forget(key), source=os.path.basename(key))
+        
+        # Parse and embed new or changed files
+        docs_by_file, errors = self.pdf_processor.process_files(
+            [path for path, _, _ in changed],
+            workers=workers
+        )
+        for pdf_path, key, content_hash in changed:
+            if pdf_path not in docs_by_file:
+                # Failed files stay out of the manifest and are retried next run
+                continue
+            documents = docs_by_file[pdf_path]
+            
+            # Replace the chunks of the previous version of this file, also when
+            # the new version has no text left to chunk
+            self.vector_store.delete_documents(manifest.chunk_ids(key), source=os.path.basename(key))
+            chunk_ids = [f"{key}:{content_hash[:16]}:{i}" for i in range(len(documents))]
+            if documents:
+                self.vector_store.add_documents(documents, ids=chunk_ids)
+            manifest.record(pdf_path, key, content_hash, chunk_ids)
+            
+            # Persist after every file so an interrupted run keeps its progress
+            manifest.save()
+        
+        manifest.save()
+        
+        cache_stats = self.vector_store.embedding_cache_stats()
+        if cache_stats:
+            print(
+                f"Embedding cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+                f"{cache_stats['evictions']} evictions, {cache_stats['entries']} entries"
+            )
         
         # Load and store full documents if requested
         if store_full_docs:
             self._load_full_documents()
+        
+        return errors
+    
+    async def aingest_documents(
+        self,
+        store_full_docs: bool = True,
+        rebuild: bool = False,
+        workers: int = 1
+    ) -> Dict[str, str]:
+        """
+        Ingest PDF documents without blocking the event loop.
+        
+        Parsing runs in worker processes and Chroma has no async API, so the
+        ingestion runs on one background thread while the loop keeps serving.
+        
+        Args:
+            store_full_docs: Whether to also store full documents for direct access
+            rebuild: Whether to discard the manifest and re-ingest every PDF
+            workers: Number of PDF parser processes (0 uses all CPU cores)
+            
+        Returns:
+            Error message per PDF that could not be processed
+        """
+        return await asyncio.to_thread(self.ingest_documents, store_full_docs, rebuild, workers)
     
     def _load_full_documents(self) -> None:
         """
-        Load and store full documents for direct access.
+        Bring the full document store in line with the PDF directory.
+        
+        New or changed PDFs are formatted and written to the store, documents
+        whose PDF was deleted are removed. Unchanged PDFs are skipped based on
+        their mtime and size.
         """
-        pdf_files = Path(self.pdf_directory).glob("**/*.pdf")
-        for pdf_path in pdf_files:
-            str_path = str(pdf_path)
+        pdf_files = sorted(str(pdf_path) for pdf_path in Path(self.pdf_directory).glob("**/*.pdf"))
+        file_names = set()
+        
+        for str_path in pdf_files:
             file_name = os.path.basename(str_path)
+            file_names.add(file_name)
+            
+            stat = os.stat(str_path)
+            entry = self.full_documents.entry(file_name)
+            if entry and entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size:
+                continue
+            
+            content_hash = self.pdf_processor.content_hash(str_path)
+            if entry and entry["sha256"] == content_hash:
+                continue
+            
             doc = self.pdf_processor.load_single_document(str_path)
             if doc:
-                self.full_documents[file_name] = doc
+                fingerprint = {"sha256": content_hash, "mtime": stat.st_mtime, "size": stat.st_size}
+                self.full_documents.put(file_name, doc, fingerprint)
                 print(f"Stored full document: {file_name}")
+        
+        for file_name in list(self.full_documents):
+            if file_name not in file_names:
+                self.full_documents.remove(file_name)
+                print(f"Removed full document: {file_name}")
     
     def query_with_full_document(self, query: str, doc_name: str = None, stream: bool = False) -> str:
         """
@@ -103,32 +284,20 @@ class RAGPipeline:
         Returns:
             Generated answer
         """
-        if not self.full_documents:
-            self._load_full_documents()
-            
-        if not self.full_documents:
-            return "No documents available for query."
-        
-        # Select the document
-        if doc_name and doc_name in self.full_documents:
-            document = self.full_documents[doc_name]
-        else:
-            # Use the first available document
-            doc_name = next(iter(self.full_documents))
-            document = self.full_documents[doc_name]
-            
-        print(f"Using full document: {doc_name}")
+        docs, message = self._full_document_context(query, doc_name)
+        if docs is None:
+            return message
         
         # Create a retriever that returns the full document
         class FullDocRetriever:
-            def __init__(self, doc):
-                self.doc = doc
+            def __init__(self, docs):
+                self.docs = docs
                 
             def invoke(self, _query):
                 # Ignore the query, just return the pre-retrieved docs
-                return [self.doc]
+                return self.docs
         
-        retriever = FullDocRetriever(document)
+        retriever = FullDocRetriever(docs)
         
         if stream:
             # Stream the answer in real-time
@@ -142,96 +311,211 @@ class RAGPipeline:
                 answer = rag_chain.invoke(query)
                 return answer
             except Exception as e:
-                print(f"Error generating answer: {str(e)}")
-                return "Sorry, I couldn't generate an answer due to an error."
+                generation_error(e)
+                return FAILED_ANSWER
     
-    def _retrieval_node(self, state: RAGState) -> RAGState:
+    async def aquery_with_full_document(self, query: str, doc_name: str = None, stream: bool = False) -> str:
         """
-        Process the user query and retrieve relevant documents.
+        Query using a full document instead of vector search, with the async Ollama client.
         
         Args:
-            state: Current state
+            query: User query
+            doc_name: Name of the document to use (if None, uses the first available)
+            stream: Whether to stream the output to the console
+            
+        Returns:
+            Generated answer
+        """
+        answer = ""
+        if stream:
+            print("\nAntwort: ", end="", flush=True)
+        async for event in self.astream_full_document(query, doc_name):
+            answer = echo_event(event, stream) or answer
+        if stream:
+            print("\n")
+        return answer
+    
+    async def astream_full_document(self, query: str, doc_name: str = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Query using a full document and yield the answer while it is generated.
         
+        Args:
+            query: User query
+            doc_name: Name of the document to use (if None, uses the first available)
+            
         Returns:
-            Updated state with retrieved documents
+            Async iterator over the events of astream_query()
         """
-        query = state["query"]
-        documents = self.vector_store.similarity_search(query)
+        # Loading from disk (and condensing oversized documents) blocks, so it runs on a thread
+        docs, message = await asyncio.to_thread(self._full_document_context, query, doc_name)
+        if docs is None:
+            yield {"status": "completed", "answer": message}
+            return
         
-        return {"query": query, "documents": documents, "answer": ""}
+        yield {"status": "retrieved", "documents": docs}
+        answer = ""
+        try:
+            async for chunk in self.ollama_llm.astream_documents_answer(query, docs):
+                answer += chunk
+                yield {"status": "streaming", "chunk": chunk}
+        except Exception as e:
+            yield generation_error(e)
+            answer = FAILED_ANSWER
+        yield {"status": "completed", "answer": answer}
     
-    def _generate_answer_node(self, state: RAGState) -> RAGState:
+    def _full_document_context(self, query: str, doc_name: str = None) -> Tuple[Optional[List[Document]], str]:
         """
-        Generate an answer using the LLM.
+        Get the context for a full-document query.
         
         Args:
-            state: Current state
-        
+            query: User query
+            doc_name: Name of the document to use (if None, uses the first available)
+            
         Returns:
-            Updated state with answer
+            Tuple of (the document, or notes for documents exceeding the
+            context window, and the document name), or (None, message to
+            return instead of an answer)
         """
-        query = state["query"]
-        documents = state["documents"]
+        if not self.full_documents:
+            self._load_full_documents()
+            
+        if not self.full_documents:
+            return None, "No documents available for query."
         
-        # Create a retriever that returns the already retrieved documents
-        class PreretrievedRetriever:
-            def __init__(self, docs):
-                self.docs = docs
-                
-            def invoke(self, _query):
-                # Ignore the query, just return the pre-retrieved docs
-                return self.docs
+        # Select the document
+        if doc_name and doc_name in self.full_documents:
+            document = self.full_documents[doc_name]
+        else:
+            # Use the first available document
+            doc_name = next(iter(self.full_documents))
+            document = self.full_documents[doc_name]
+            
+        print(f"Using full document: {doc_name}")
         
-        retriever = PreretrievedRetriever(documents)
+        # Documents larger than the context window are answered from notes
+        context_tokens = self.ollama_llm.count_context_tokens([document])
+        if not self.map_reducer.fits(context_tokens, [query]):
+            pdf_path = next(Path(self.pdf_directory).glob(f"**/{doc_name}"), None)
+            if pdf_path is None:
+                return None, f"{doc_name} exceeds the context window and its PDF is no longer available."
+            notes = self.map_reducer.condense(
+                self.pdf_processor.load_full_document(str(pdf_path)),
+                self.pdf_processor.content_hash(str(pdf_path)),
+                [query],
+                progress=print
+            )
+            return notes, doc_name
         
-        # Create the RAG chain
-        rag_chain = self.ollama_llm.create_rag_chain(retriever)
+        return [document], doc_name
+    
+    def retrieval_num_ctx(self) -> int:
+        """
+        Get the context window of the answers to vector-search queries.
         
-        # Generate the answer
+        It fits retrieval_k chunks of the full chunk size, so all queries use
+        the same window and the warm-up can load the model with it.
+        
+        Returns:
+            Context window size
+        """
+        # Running German text has about 3.4 characters per estimated token
+        chunk_tokens = -(-self.pdf_processor.chunk_size // 3) + PAGE_FRAME_TOKENS
         try:
-            answer = rag_chain.invoke(query)
-        except Exception as e:
-            print(f"Error generating answer: {str(e)}")
-            answer = "Sorry, I couldn't generate an answer due to an error."
+            return self.ollama_llm.select_num_ctx(
+                self.ollama_llm.count_prompt_tokens(self.retrieval_k * chunk_tokens, "")
+            )
+        except ContextWindowExceededError:
+            return self.ollama_llm.num_ctx
+    
+    def _retrieve(self, query: str, source: Optional[str] = None) -> List[Document]:
+        """
+        Retrieve the chunks for a query with the configured retrieval mode.
         
-        return {"query": query, "documents": documents, "answer": answer}
+        Args:
+            query: User query
+            source: File name of the Akte to retrieve from (all Akten if None)
+        
+        Returns:
+            Relevant chunks
+        """
+        return self.vector_store.search(query, self.retrieval_mode, self.retrieval_k, source=source)
     
-    def _build_graph(self) -> StateGraph:
+    def query(self, query: str, source: Optional[str] = None, stream: bool = False) -> str:
         """
-        Build the LangGraph workflow.
+        Query the RAG pipeline.
         
+        Args:
+            query: User query
+            source: File name of the Akte to retrieve from (all Akten if None)
+            stream: Whether to stream the answer to the console
+            
         Returns:
-            StateGraph instance
+            Generated answer
         """
-        # Create the graph
-        builder = StateGraph(RAGState)
+        if stream:
+            answer = ""
+            print("\nAntwort: ", end="", flush=True)
+            for event in self.stream_query(query, source):
+                answer = echo_event(event) or answer
+            print("\n")
+            return answer
         
-        # Add nodes
-        builder.add_node("retrieval", self._retrieval_node)
-        builder.add_node("generate_answer", self._generate_answer_node)
+        return self.query_graph.invoke(query, source)
+    
+    def stream_query(self, query: str, source: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Query the RAG pipeline and yield the answer while it is generated.
         
-        # Connect nodes
-        builder.add_edge("retrieval", "generate_answer")
-        builder.set_entry_point("retrieval")
-        builder.set_finish_point("generate_answer")
+        Runs the LangGraph workflow in streaming mode: once the retrieval node
+        is done, its documents are yielded, followed by the chunks of the
+        generate node as the LLM produces them.
         
-        # Compile the graph
-        return builder.compile()
+        Args:
+            query: User query
+            source: File name of the Akte to retrieve from (all Akten if None)
+            
+        Returns:
+            Iterator over events: {"status": "retrieved", "documents": [...]},
+            then {"status": "streaming", "chunk": ...} per chunk (or
+            {"status": "error", "error": ...}), and finally
+            {"status": "completed", "answer": ...}
+        """
+        return self.query_graph.stream(query, source)
     
-    def query(self, query: str) -> str:
+    async def aquery(self, query: str, source: Optional[str] = None, stream: bool = False) -> str:
         """
-        Query the RAG pipeline.
+        Query the RAG pipeline with the async LangGraph workflow.
         
         Args:
             query: User query
+            source: File name of the Akte to retrieve from (all Akten if None)
+            stream: Whether to stream the answer to the console
             
         Returns:
             Generated answer
         """
-        # Initialize state
-        state = {"query": query, "documents": [], "answer": ""}
+        if stream:
+            answer = ""
+            print("\nAntwort: ", end="", flush=True)
+            async for event in self.astream_query(query, source):
+                answer = echo_event(event) or answer
+            print("\n")
+            return answer
+        
+        return await self.query_graph.ainvoke(query, source)
+    
+    def astream_query(self, query: str, source: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Query the RAG pipeline and yield the answer while it is generated.
         
-        # Run the graph
-        result = self.graph.invoke(state)
+        The async counterpart of stream_query(): many queries can be served
+        from one event loop, each waiting on its own Ollama stream.
         
-        return result["answer"] 
\ No newline at end of file
+        Args:
+            query: User query
+            source: File name of the Akte to retrieve from (all Akten if None)
+            
+        Returns:
+            Async iterator over the events of stream_query()
+        """
+        return self.query_graph.astream(query, source)
@@ -0,0 +1,138 @@
+"""
+Prompt templates for the Ollama LLM.
+
+Each prompt consists of question-specific instructions and the shared
+document context. The layout decides their order: with the context first,
+all questions about the same document share a long identical prompt prefix
+that Ollama can reuse from its KV cache instead of prefilling it again.
+"""
+from typing import Dict
+
+from langchain_core.prompts import PromptTemplate
+
+
+# Instructions of the standard RAG prompt
+RAG_INSTRUCTIONS = """Bitte beantworte die folgende Frage basierend ausschließlich auf dem bereitgestellten Kontext.
+Wenn die Antwort nicht im Kontext zu finden ist, antworte mit "Die Antwort ist nicht im Dokument enthalten."
+Nutze alle relevanten Informationen und sei so detailliert wie möglich.
+
+Wichtig:
+1. Beziehe dich bei deinen Antworten immer auf die Seitenzahlen im Dokument (PAGE NUMBER X).
+2. Gib für wichtige Informationen und Zitate immer die Seitenzahl an, auf der sie zu finden sind."""
+
+# Instructions of the question-specific prompts
+QUESTION_INSTRUCTIONS = {
+    "Bitte schreibe eine zusammenfassung der Akte in ca. 250 Wörtern": """Bitte schreibe eine Zusammenfassung der folgenden Akte in GENAU 200-250 Wörtern.
+Die Antwort MUSS auf Deutsch sein und die Wortzahl zwischen 200 und 250 liegen. Nicht mehr und nicht weniger.
+
+Beziehe dich dabei auf die wichtigsten Aspekte des Falles, wie Tatbestand, beteiligte Personen, Ergebnisse,
+und rechtliche Einschätzungen. Nutze alle relevanten Informationen aus dem bereitgestellten Kontext.
+
+Wichtig:
+1. Beziehe dich bei deinen Antworten immer auf die Seitenzahlen im Dokument (PAGE NUMBER X).
+2. Gib für wichtige Informationen und Zitate immer die Seitenzahl an, auf der sie zu finden sind.
+3. Erwähne NICHT die Wortzahl in deiner Antwort. Schreibe die Zusammenfassung einfach mit der richtigen Länge.""",
+    "Bitte erstelle ein formatiertes Inhaltsverzeichnis mit zusammenfassenden Titeln und Seitenangaben": """Erstelle ein detailliertes, formatiertes Inhaltsverzeichnis für das vorliegende Dokument.
+
+Das Inhaltsverzeichnis soll:
+- Alle wichtigen Abschnitte und Unterabschnitte des Dokuments enthalten
+- Für jeden Eintrag einen kurzen, aussagekräftigen Titel haben, der den Inhalt zusammenfasst
+- Bei jedem Eintrag die entsprechende Seitenzahl angeben
+- Eine klare hierarchische Struktur aufweisen
+
+Bitte achte besonders auf eine übersichtliche Formatierung, die die Struktur des Dokuments deutlich macht.
+Verwende die Seitenzahlen, die im Kontext als "PAGE NUMBER X" angegeben sind.""",
+    "Bitte gib mir, formatiert, eine Ausgabe über alle Beteiligte mit Kontaktangaben, außer der Kanzlei Riedl": """Erstelle eine strukturierte Liste aller am Fall beteiligten Personen und Parteien mit ihren vollständigen Kontaktdaten.
+
+Die Liste soll:
+- Alle Beteiligten mit vollständigem Namen auflisten
+- Für jede Person/Partei alle verfügbaren Kontaktinformationen angeben (Adresse, Telefonnummer, E-Mail, etc.)
+- Klar formatiert und übersichtlich sein
+- Die Kanzlei Riedl und deren Mitarbeiter NICHT enthalten
+- Die Rolle jeder Person im Fall angeben (z.B. Beschuldigter, Zeuge, Geschädigter, etc.)
+
+Bitte gib für jede Information die entsprechende Seitenzahl an, auf der sie im Dokument zu finden ist.""",
+    "Waren bei dem Fall Drogen, Alkohol, Medikamente oder Fahrerflucht im Spiel": """Untersuche das Dokument gründlich nach Hinweisen auf:
+1. Drogenkonsum oder -besitz
+2. Alkoholkonsum
+3. Einnahme von Medikamenten mit Auswirkung auf die Fahrtüchtigkeit
+4. Fahrerflucht
+
+Beantworte die Frage eindeutig mit Ja oder Nein für jeden dieser Aspekte und führe die entsprechenden Belege mit Seitenzahlen an.
+Falls zu einem Aspekt keine Informationen vorliegen, gib an, dass dazu keine Angaben im Dokument zu finden sind.""",
+    "Bitte beantworte kurz und knapp wer der Schuldige in dem Fall war und wie hoch der Schade ist": """Beantworte präzise und kompakt folgende zwei Fragen:
+
+1. Wer trägt die Schuld in diesem Fall? (Nenne konkret die Person oder Partei)
+2. Wie hoch ist der entstandene Schaden? (Gib den exakten Betrag mit Währung an)
+
+Die Antwort soll kurz und prägnant sein, nicht mehr als 2-3 Sätze. Beziehe dich ausschließlich auf die Fakten aus dem Dokument und gib die entsprechenden Seitenzahlen an."""
+}
+
+# Instructions of the question-independent map step used for documents that
+# exceed the context window: each page window is condensed into notes that
+# keep every fact the questions may ask about
+MAP_INSTRUCTIONS = """Fasse den obigen Ausschnitt einer Akte in stichpunktartigen Notizen zusammen.
+
+Die Notizen sollen alle Fakten enthalten, die für spätere Fragen zur Akte wichtig sein können:
+- Tatbestand, Ablauf und Ergebnisse
+- Alle beteiligten Personen und Parteien mit Rolle und vollständigen Kontaktdaten
+- Hinweise auf Drogen, Alkohol, Medikamente oder Fahrerflucht
+- Angaben zur Schuld und zur Höhe des Schadens (mit Beträgen)
+- Die Gliederung des Ausschnitts mit kurzen Titeln der Abschnitte
+
+Wichtig:
+1. Gib bei jeder Notiz die Seitenzahl an (PAGE NUMBER X).
+2. Lass nichts weg, was eine der genannten Angaben betrifft, und erfinde nichts hinzu."""
+
+# Supported prompt layouts
+CLASSIC_LAYOUT = "classic"
+CONTEXT_FIRST_LAYOUT = "context_first"
+PROMPT_LAYOUTS = (CLASSIC_LAYOUT, CONTEXT_FIRST_LAYOUT)
+
+
+def build_prompt_template(instructions: str, layout: str = CONTEXT_FIRST_LAYOUT) -> PromptTemplate:
+    """
+    Build a prompt template from instructions in the given layout.
+    
+    Args:
+        instructions: Question-specific instructions
+        layout: "classic" puts the instructions before the context,
+            "context_first" puts the shared context first
+            
+    Returns:
+        Prompt template with {context} and {query} variables
+    """
+    if layout == CLASSIC_LAYOUT:
+        template = f"{instructions}\n\nKontext:\n{{context}}\n\nFrage: {{query}}\n\nAntwort:"
+    elif layout == CONTEXT_FIRST_LAYOUT:
+        template = f"Kontext:\n{{context}}\n\n{instructions}\n\nFrage: {{query}}\n\nAntwort:"
+    else:
+        raise ValueError(f"Unknown prompt layout '{layout}', expected one of {PROMPT_LAYOUTS}")
+    
+    return PromptTemplate.from_template(template)
+
+
+def build_question_prompts(layout: str = CONTEXT_FIRST_LAYOUT) -> Dict[str, PromptTemplate]:
+    """
+    Build the question-specific prompt templates in the given layout.
+    
+    Args:
+        layout: Prompt layout
+        
+    Returns:
+        Dictionary mapping each question to its prompt template
+    """
+    return {
+        question: build_prompt_template(instructions, layout)
+        for question, instructions in QUESTION_INSTRUCTIONS.items()
+    }
+
+
+def build_map_prompt_template() -> PromptTemplate:
+    """
+    Build the prompt template of the map step.
+    
+    Returns:
+        Prompt template with a {context} variable
+    """
+    return PromptTemplate.from_template(f"Kontext:\n{{context}}\n\n{MAP_INSTRUCTIONS}\n\nNotizen:")
@@ -0,0 +1,281 @@
+"""
+Query graph module: the LangGraph workflow answering a query from retrieved chunks.
+"""
+from typing import Dict, List, Any, Callable, Iterator, AsyncIterator, Optional, TypedDict
+import asyncio
+
+from langgraph.config import get_stream_writer
+from langgraph.graph import StateGraph
+from langgraph.types import StreamWriter
+from langchain_core.documents import Document
+
+from rag.llm import OllamaWrapper
+
+# Answer returned when the LLM fails
+FAILED_ANSWER = "Sorry, I couldn't generate an answer due to an error."
+
+# Graph streams the query events are built from
+STREAM_MODES = ["updates", "custom"]
+
+
+class RAGState(TypedDict):
+    """
+    State definition for the RAG pipeline.
+    """
+    query: str
+    documents: List[Document]
+    answer: str
+    source: Optional[str]
+
+
+class QueryGraph:
+    """
+    Retrieval followed by answer generation, as a sync and an async LangGraph.
+    
+    Both graphs share the state and the event format; the sync one runs on
+    the caller's thread with the sync Ollama client, the async one on the
+    event loop with the async client.
+    """
+    
+    def __init__(
+        self,
+        retrieve: Callable[[str, Optional[str]], List[Document]],
+        llm: OllamaWrapper,
+        num_ctx: Callable[[], int]
+    ):
+        """
+        Initialize the query graphs.
+        
+        Args:
+            retrieve: Function returning the chunks for a query and an
+                optional source file name
+            llm: LLM wrapper generating the answers
+            num_ctx: Function returning the smallest context window of the answers
+        """
+        self.retrieve = retrieve
+        self.llm = llm
+        self.num_ctx = num_ctx
+        self.graph = self._build(self._retrieval_node, self._generate_answer_node)
+        self.async_graph = self._build(self._aretrieval_node, self._agenerate_answer_node)
+    
+    def invoke(self, query: str, source: Optional[str] = None) -> str:
+        """
+        Answer a query.
+        
+        Args:
+            query: User query
+            source: File name of the Akte to retrieve from (all Akten if None)
+        
+        Returns:
+            Generated answer
+        """
+        return self.graph.invoke(initial_state(query, source))["answer"]
+    
+    async def ainvoke(self, query: str, source: Optional[str] = None) -> str:
+        """
+        Answer a query on the event loop.
+        
+        Args:
+            query: User query
+            source: File name of the Akte to retrieve from (all Akten if None)
+        
+        Returns:
+            Generated answer
+        """
+        return (await self.async_graph.ainvoke(initial_state(query, source)))["answer"]
+    
+    def stream(self, query: str, source: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Answer a query and yield the answer while it is generated.
+        
+        Args:
+            query: User query
+            source: File name of the Akte to retrieve from (all Akten if None)
+        
+        Returns:
+            Iterator over the query events (see graph_event())
+        """
+        for mode, data in self.graph.stream(initial_state(query, source), stream_mode=STREAM_MODES):
+            event = graph_event(mode, data)
+            if event is not None:
+                yield event
+    
+    async def astream(self, query: str, source: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Answer a query on the event loop and yield the answer while it is generated.
+        
+        Args:
+            query: User query
+            source: File name of the Akte to retrieve from (all Akten if None)
+        
+        Returns:
+            Async iterator over the query events (see graph_event())
+        """
+        async for mode, data in self.async_graph.astream(initial_state(query, source), stream_mode=STREAM_MODES):
+            event = graph_event(mode, data)
+            if event is not None:
+                yield event
+    
+    def _retrieval_node(self, state: RAGState) -> RAGState:
+        """
+        Retrieve the chunks for the query.
+        
+        Args:
+            state: Current state
+        
+        Returns:
+            Updated state with retrieved documents
+        """
+        return {**state, "documents": self.retrieve(state["query"], state.get("source")), "answer": ""}
+    
+    async def _aretrieval_node(self, state: RAGState) -> RAGState:
+        """
+        Retrieve the chunks without blocking the event loop.
+        
+        Chroma has no async API, so the (short, cached) search runs on a thread.
+        
+        Args:
+            state: Current state
+        
+        Returns:
+            Updated state with retrieved documents
+        """
+        return await asyncio.to_thread(self._retrieval_node, state)
+    
+    def _generate_answer_node(self, state: RAGState) -> RAGState:
+        """
+        Generate an answer using the LLM.
+        
+        Answer chunks are written to the graph's custom stream as they are
+        generated, so stream() can pass them on; invoke() ignores them.
+        
+        Args:
+            state: Current state
+        
+        Returns:
+            Updated state with answer
+        """
+        writer = get_stream_writer()
+        answer = ""
+        try:
+            for chunk in self.llm.stream_documents_answer(
+                state["query"], state["documents"], min_num_ctx=self.num_ctx()
+            ):
+                answer += chunk
+                writer({"status": "streaming", "chunk": chunk})
+        except Exception as e:
+            writer(generation_error(e))
+            answer = FAILED_ANSWER
+        return {**state, "answer": answer}
+    
+    async def _agenerate_answer_node(self, state: RAGState, writer: StreamWriter) -> RAGState:
+        """
+        Generate an answer with the async Ollama client.
+        
+        Args:
+            state: Current state
+            writer: LangGraph stream writer receiving the answer chunks
+        
+        Returns:
+            Updated state with answer
+        """
+        answer = ""
+        try:
+            async for chunk in self.llm.astream_documents_answer(
+                state["query"], state["documents"], min_num_ctx=self.num_ctx()
+            ):
+                answer += chunk
+                writer({"status": "streaming", "chunk": chunk})
+        except Exception as e:
+            writer(generation_error(e))
+            answer = FAILED_ANSWER
+        return {**state, "answer": answer}
+    
+    @staticmethod
+    def _build(retrieval_node: Callable, generate_node: Callable):
+        """
+        Build and compile the workflow from its two nodes.
+        
+        Args:
+            retrieval_node: Node retrieving the documents
+            generate_node: Node generating the answer
+        
+        Returns:
+            Compiled graph
+        """
+        builder = StateGraph(RAGState)
+        builder.add_node("retrieval", retrieval_node)
+        builder.add_node("generate_answer", generate_node)
+        builder.add_edge("retrieval", "generate_answer")
+        builder.set_entry_point("retrieval")
+        builder.set_finish_point("generate_answer")
+        return builder.compile()
+
+
+def initial_state(query: str, source: Optional[str] = None) -> RAGState:
+    """
+    Build the state a query enters the graph with.
+    
+    Args:
+        query: User query
+        source: File name of the Akte to retrieve from (all Akten if None)
+    
+    Returns:
+        Initial state
+    """
+    return {"query": query, "documents": [], "answer": "", "source": source}
+
+
+def graph_event(mode: str, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Translate an item of the graph's update and custom streams into a query event.
+    
+    Args:
+        mode: Stream mode of the item
+        data: Node update or custom stream data
+    
+    Returns:
+        {"status": "retrieved", "documents": [...]} after the retrieval,
+        {"status": "streaming", "chunk": ...} per chunk (or {"status":
+        "error", "error": ...}), {"status": "completed", "answer": ...}
+        after the generation, or None for other items
+    """
+    if mode == "custom":
+        return data
+    if "retrieval" in data:
+        return {"status": "retrieved", "documents": data["retrieval"]["documents"]}
+    if "generate_answer" in data:
+        return {"status": "completed", "answer": data["generate_answer"]["answer"]}
+    return None
+
+
+def generation_error(error: Exception) -> Dict[str, Any]:
+    """
+    Log a failed generation and build its error event.
+    
+    Args:
+        error: Exception raised by the LLM
+    
+    Returns:
+        Error event
+    """
+    print(f"Error generating answer: {str(error)}")
+    return {"status": "error", "error": str(error)}
+
+
+def echo_event(event: Dict[str, Any], stream: bool = True) -> Optional[str]:
+    """
+    Print the chunk of a streaming event to the console.
+    
+    Args:
+        event: Query event
+        stream: Whether to print chunks
+    
+    Returns:
+        The answer of a "completed" event, otherwise None
+    """
+    if event["status"] == "streaming" and stream:
+        print(event["chunk"], end="", flush=True)
+    elif event["status"] == "completed":
+        return event["answer"]
+    return None
@@ -0,0 +1,307 @@
+"""
+Question runner module for answering a fixed list of questions about a document.
+"""
+from typing import Dict, List, Any, Iterator, Optional
+from concurrent.futures import ThreadPoolExecutor
+import queue
+
+from rag.llm import OllamaWrapper
+from rag.answer_cache import AnswerCache
+from rag.hashing import text_sha256
+from rag.token_budget import ContextWindowExceededError
+
+
+class QuestionRunner:
+    """
+    Answers a list of questions about one document and reports progress as
+    a stream of events.
+    
+    Each event is a dictionary in the web app's NDJSON format ("started",
+    "streaming", "completed", "error" and "preparing_next" statuses, tagged
+    with question_index). Questions can be answered concurrently; their events
+    are then interleaved, but the events of a single question always keep
+    their order.
+    """
+    
+    def __init__(
+        self,
+        llm: OllamaWrapper,
+        answer_cache: Optional[AnswerCache] = None,
+        concurrency: int = 1
+    ):
+        """
+        Initialize the question runner.
+        
+        Args:
+            llm: LLM wrapper used to generate answers
+            answer_cache: Cache to replay and store answers (no caching if None)
+            concurrency: Maximum number of questions answered at the same time
+        """
+        self.llm = llm
+        self.answer_cache = answer_cache
+        self.concurrency = max(1, concurrency)
+    
+    def run(
+        self,
+        context: str,
+        content_hash: str,
+        questions: List[str],
+        answers: Dict[str, Dict[str, str]],
+        context_tokens: Optional[int] = None,
+        question_contexts: Optional[Dict[str, Dict[str, Any]]] = None,
+        num_ctx: Optional[int] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Answer all questions and yield progress events.
+        
+        All questions run with the same context window, so Ollama keeps the
+        model and its prompt cache loaded from one question to the next.
+        
+        Args:
+            context: Formatted document context
+            content_hash: SHA-256 of the source PDF (part of the cache key)
+            questions: Questions to answer
+            answers: Dictionary that receives "question_<n>" entries in
+                question order once all questions are done
+            context_tokens: Estimated tokens of the context, used to size the
+                context window (estimated from each prompt if None)
+            question_contexts: Per question that does not use the shared
+                context: its own "context" and "context_tokens", or a fixed
+                "answer" given without calling the LLM
+            num_ctx: Context window of all questions (the largest any of
+                their prompts needs if None)
+        
+        Returns:
+            Iterator over progress events
+        """
+        results = {}
+        if num_ctx is None and context_tokens is not None:
+            num_ctx = self.select_num_ctx(questions, context_tokens, question_contexts)
+        
+        if self.concurrency == 1 or len(questions) <= 1:
+            for i, question in enumerate(questions):
+                yield from self._answer_events(
+                    i, question, context, content_hash, results, context_tokens, question_contexts, num_ctx
+                )
+                
+                # If not the last question, notify the user that we're preparing the next one
+                if i < len(questions) - 1:
+                    yield {
+                        "status": "preparing_next",
+                        "message": "Preparing next question..."
+                    }
+        else:
+            yield from self._run_concurrently(
+                context, content_hash, questions, results, context_tokens, question_contexts, num_ctx
+            )
+        
+        # Fill the answers in question order so exports stay deterministic
+        for i in sorted(results):
+            answers[f"question_{i+1}"] = results[i]
+    
+    def select_num_ctx(
+        self,
+        questions: List[str],
+        context_tokens: int,
+        question_contexts: Optional[Dict[str, Dict[str, Any]]] = None
+    ) -> Optional[int]:
+        """
+        Choose one context window for all questions about a document.
+        
+        Ollama reloads the model whenever num_ctx changes, so questions with
+        a small context of their own use the window of the largest prompt.
+        Prompts that do not fit at all are left out; their questions fail on
+        their own.
+        
+        Args:
+            questions: Questions to answer
+            context_tokens: Estimated tokens of the shared context
+            question_contexts: Own context or fixed answer per question
+        
+        Returns:
+            Context window size, or None if no question needs the LLM
+        """
+        sizes = []
+        for question in questions:
+            own_context = (question_contexts or {}).get(question)
+            if own_context and "answer" in own_context:
+                continue
+            tokens = own_context["context_tokens"] if own_context else context_tokens
+            try:
+                sizes.append(self.llm.select_num_ctx(self.llm.count_prompt_tokens(tokens, question, question)))
+            except ContextWindowExceededError:
+                continue
+        return max(sizes, default=None)
+    
+    def _run_concurrently(
+        self,
+        context: str,
+        content_hash: str,
+        questions: List[str],
+        results: Dict[int, Dict[str, str]],
+        context_tokens: Optional[int] = None,
+        question_contexts: Optional[Dict[str, Dict[str, Any]]] = None,
+        num_ctx: Optional[int] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Answer questions in worker threads and merge their event streams.
+        
+        Args:
+            context: Formatted document context
+            content_hash: SHA-256 of the source PDF
+            questions: Questions to answer
+            results: Dictionary receiving the answer per question index
+            context_tokens: Estimated tokens of the context
+            question_contexts: Own context or fixed answer per question
+            num_ctx: Context window of all questions
+        
+        Returns:
+            Iterator over interleaved progress events
+        """
+        events = queue.Queue()
+        done = object()
+        
+        def worker(i, question):
+            try:
+                for event in self._answer_events(
+                    i, question, context, content_hash, results, context_tokens, question_contexts, num_ctx
+                ):
+                    events.put(event)
+            finally:
+                events.put(done)
+        
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for i, question in enumerate(questions):
+                executor.submit(worker, i, question)
+            
+            remaining = len(questions)
+            while remaining:
+                event = events.get()
+                if event is done:
+                    remaining -= 1
+                else:
+                    yield event
+    
+    def _answer_events(
+        self,
+        i: int,
+        question: str,
+        context: str,
+        content_hash: str,
+        results: Dict[int, Dict[str, str]],
+        context_tokens: Optional[int] = None,
+        question_contexts: Optional[Dict[str, Dict[str, Any]]] = None,
+        num_ctx: Optional[int] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Answer one question and yield its progress events.
+        
+        Args:
+            i: Index of the question
+            question: Question to answer
+            context: Formatted document context
+            content_hash: SHA-256 of the source PDF
+            results: Dictionary receiving the answer under index i
+            context_tokens: Estimated tokens of the context
+            question_contexts: Own context or fixed answer per question
+            num_ctx: Context window of all questions
+        
+        Returns:
+            Iterator over the question's progress events
+        """
+        own_context = (question_contexts or {}).get(question)
+        
+        try:
+            # Signal the start of this question processing
+            yield {
+                "question_index": i,
+                "question": question,
+                "status": "started"
+            }
+            
+            # Questions decided without the LLM (e.g. screening without any hit)
+            if own_context and "answer" in own_context:
+                results[i] = {"question": question, "answer": own_context["answer"]}
+                yield {
+                    "question_index": i,
+                    "question": question,
+                    "answer": own_context["answer"],
+                    "status": "completed",
+                    "screened": True
+                }
+                return
+            
+            # Questions with their own context are cached under that context
+            if own_context:
+                context = own_context["context"]
+                context_tokens = own_context["context_tokens"]
+                content_hash = f"{content_hash}:{text_sha256(context)}"
+            
+            # Format prompt with template (shared document context first by default,
+            # so the model reuses the cached prefix across questions)
+            prompt = self.llm.build_prompt(context, question, question)
+            
+            # Use the shared context window unless this prompt does not fit into it
+            if context_tokens is not None:
+                num_ctx = max(
+                    num_ctx or 0,
+                    self.llm.select_num_ctx(self.llm.count_prompt_tokens(context_tokens, question, question))
+                )
+            num_ctx = self.llm.prompt_num_ctx(prompt, num_ctx)
+            
+            # Replay the answer if this exact question was answered for this PDF before
+            cache_key = AnswerCache.make_key(
+                content_hash,
+                question,
+                self.llm.get_prompt_template(question).template,
+                self.llm.model_name,
+                self.llm.temperature,
+                num_ctx
+            )
+            cached_answer = self.answer_cache.get(cache_key) if self.answer_cache else None
+            if cached_answer is not None:
+                results[i] = {"question": question, "answer": cached_answer}
+                yield {
+                    "question_index": i,
+                    "question": question,
+                    "answer": cached_answer,
+                    "status": "completed",
+                    "cached": True
+                }
+                return
+            
+            # Stream the response
+            answer = ""
+            for chunk in self.llm.stream(prompt, num_ctx):
+                answer += chunk
+                yield {
+                    "question_index": i,
+                    "question": question,
+                    "chunk": chunk,
+                    "status": "streaming"
+                }
+            
+            # Save the answer and signal completion of this question
+            results[i] = {"question": question, "answer": answer}
+            if self.answer_cache:
+                self.answer_cache.put(cache_key, answer)
+            
+            yield {
+                "question_index": i,
+                "question": question,
+                "answer": answer,
+                "status": "completed"
+            }
+        
+        except Exception as e:
+            print(f"Error processing question {i}: {str(e)}")
+            results[i] = {
+                "question": question,
+                "answer": f"Error generating answer: {str(e)}"
+            }
+            yield {
+                "question_index": i,
+                "question": question,
+                "error": str(e),
+                "status": "error"
+            }
@@ -0,0 +1,247 @@
+"""
+Retention module for removing old uploads, exports and jobs.
+"""
+from typing import Dict, List, Any
+import os
+import threading
+import time
+
+from rag.jobs import JobStore, FINISHED_STATUSES
+
+
+class RetentionSweeper:
+    """
+    Periodically removes finished jobs together with their uploaded PDF and
+    exported files.
+    
+    A job expires once it has not been accessed for longer than the TTL. If
+    the upload directory still exceeds its size limit afterwards, finished
+    jobs are removed in least-recently-used order until it fits. Files in the
+    upload directory that no job refers to are removed once they are older
+    than the TTL. Queued and running jobs are never touched.
+    """
+    
+    def __init__(
+        self,
+        upload_dir: str,
+        job_store: JobStore,
+        ttl_seconds: float = 7 * 24 * 3600,
+        max_bytes: int = 2 * 1024 ** 3,
+        interval_seconds: float = 600
+    ):
+        """
+        Initialize the sweeper.
+        
+        Args:
+            upload_dir: Directory holding uploaded PDFs and exported files
+            job_store: Store of the jobs that own these files
+            ttl_seconds: Time since the last access after which a job expires
+                (0 disables expiry)
+            max_bytes: Maximum total size of the upload directory (0 disables
+                the limit)
+            interval_seconds: Time between two sweeps
+        """
+        self.upload_dir = upload_dir
+        self.job_store = job_store
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.interval_seconds = interval_seconds
+        
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._stats = {
+            "sweeps": 0,
+            "jobs_removed": 0,
+            "files_removed": 0,
+            "bytes_reclaimed": 0,
+            "last_sweep": None
+        }
+    
+    def start(self) -> None:
+        """
+        Start sweeping in a background thread.
+        """
+        if self._thread:
+            return
+        self._thread = threading.Thread(target=self._run, name="retention-sweeper", daemon=True)
+        self._thread.start()
+    
+    def stop(self) -> None:
+        """
+        Stop the background thread.
+        """
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+    
+    def _run(self) -> None:
+        """
+        Sweep until stopped.
+        """
+        while not self._stop.is_set():
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"Error during retention sweep: {str(e)}")
+            self._stop.wait(self.interval_seconds)
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get the totals reclaimed so far.
+        
+        Returns:
+            Dictionary with sweeps, jobs_removed, files_removed,
+            bytes_reclaimed and the time of the last sweep
+        """
+        with self._lock:
+            return dict(self._stats)
+    
+    def sweep(self) -> Dict[str, int]:
+        """
+        Run one sweep.
+        
+        Returns:
+            Number of jobs and files removed and bytes reclaimed by this sweep
+        """
+        now = time.time()
+        result = {"jobs_removed": 0, "files_removed": 0, "bytes_reclaimed": 0}
+        
+        jobs = self.job_store.list()
+        owned = set()
+        for job in jobs:
+            owned.update(self._job_files(job))
+        
+        # Least recently used first
+        finished = sorted(
+            (job for job in jobs if job["status"] in FINISHED_STATUSES),
+            key=self._last_access
+        )
+        
+        # Expire jobs that were not accessed within the TTL
+        kept = []
+        for job in finished:
+            if self.ttl_seconds and now - self._last_access(job) > self.ttl_seconds:
+                self._remove_job(job, result)
+            else:
+                kept.append(job)
+        
+        # Remove files no job refers to (e.g. from before jobs were persisted)
+        for name in self._list_files():
+            path = os.path.join(self.upload_dir, name)
+            if name in owned:
+                continue
+            try:
+                if self.ttl_seconds and now - os.path.getmtime(path) > self.ttl_seconds:
+                    self._remove_file(path, result)
+            except OSError:
+                continue
+        
+        # Evict least recently used jobs until the directory fits its limit
+        if self.max_bytes:
+            total = self._directory_size()
+            for job in kept:
+                if total <= self.max_bytes:
+                    break
+                before = result["bytes_reclaimed"]
+                self._remove_job(job, result)
+                total -= result["bytes_reclaimed"] - before
+        
+        with self._lock:
+            self._stats["sweeps"] += 1
+            self._stats["last_sweep"] = now
+            for key, value in result.items():
+                self._stats[key] += value
+        
+        if result["jobs_removed"] or result["files_removed"]:
+            print(f"Retention sweep removed {result['jobs_removed']} jobs and "
+                  f"{result['files_removed']} files ({result['bytes_reclaimed'] / 1024 ** 2:.1f} MB)")
+        return result
+    
+    def _job_files(self, job: Dict[str, Any]) -> List[str]:
+        """
+        Get the names of the files a job owns in the upload directory.
+        
+        Args:
+            job: Job fields
+        
+        Returns:
+            File names of the upload and its exports
+        """
+        base_filename = job["unique_filename"].rsplit(".", 1)[0]
+        return [job["unique_filename"], f"{base_filename}.md", f"{base_filename}.txt"]
+    
+    def _last_access(self, job: Dict[str, Any]) -> float:
+        """
+        Get the last time a job or one of its files was accessed.
+        
+        Args:
+            job: Job fields
+        
+        Returns:
+            Timestamp of the last access
+        """
+        last_access = job["last_accessed"]
+        for name in self._job_files(job):
+            try:
+                last_access = max(last_access, os.path.getmtime(os.path.join(self.upload_dir, name)))
+            except OSError:
+                continue
+        return last_access
+    
+    def _remove_job(self, job: Dict[str, Any], result: Dict[str, int]) -> None:
+        """
+        Remove a job and its files.
+        
+        Args:
+            job: Job fields
+            result: Sweep counters to update
+        """
+        for name in self._job_files(job):
+            self._remove_file(os.path.join(self.upload_dir, name), result)
+        self.job_store.delete(job["id"])
+        result["jobs_removed"] += 1
+    
+    def _remove_file(self, path: str, result: Dict[str, int]) -> None:
+        """
+        Remove a file if it exists.
+        
+        Args:
+            path: Path of the file
+            result: Sweep counters to update
+        """
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return
+        result["files_removed"] += 1
+        result["bytes_reclaimed"] += size
+    
+    def _list_files(self) -> List[str]:
+        """
+        List the files in the upload directory.
+        
+        Returns:
+            File names
+        """
+        try:
+            return [entry.name for entry in os.scandir(self.upload_dir) if entry.is_file()]
+        except OSError:
+            return []
+    
+    def _directory_size(self) -> int:
+        """
+        Get the total size of the files in the upload directory.
+        
+        Returns:
+            Size in bytes
+        """
+        total = 0
+        for name in self._list_files():
+            try:
+                total += os.path.getsize(os.path.join(self.upload_dir, name))
+            except OSError:
+                continue
+        return total
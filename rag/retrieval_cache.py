@@ -0,0 +1,145 @@
+"""
+Retrieval cache module for repeated similarity searches.
+"""
+from typing import List, Optional, Dict, Any, Callable, Hashable
+import json
+import os
+import threading
+
+from langchain_core.documents import Document
+
+from rag.lru import LRUCache
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize a query so trivially different spellings share cache entries.
+    
+    Args:
+        query: Query string
+        
+    Returns:
+        Query with surrounding and repeated whitespace removed
+    """
+    return " ".join(query.split())
+
+
+class RetrievalCache:
+    """
+    Two-level cache for similarity searches.
+    
+    The first level maps (embedding model, normalized query) to the query
+    embedding so repeated questions skip the embedding call. The second
+    level maps (normalized query, k, filters, collection version) to the
+    search results. The collection version is stored in a small file next to
+    the collection, so writes from other processes (e.g. ingest.py) also
+    invalidate the results cached here.
+    """
+    
+    def __init__(
+        self,
+        version_path: str,
+        max_embeddings: int = 1024,
+        max_results: int = 256
+    ):
+        """
+        Initialize the retrieval cache.
+        
+        Args:
+            version_path: File holding the collection version
+            max_embeddings: Number of query embeddings kept in memory
+            max_results: Number of search results kept in memory
+        """
+        self.version_path = version_path
+        self.embeddings = LRUCache(max_embeddings)
+        self.results = LRUCache(max_results)
+        self._lock = threading.Lock()
+    
+    @property
+    def collection_version(self) -> int:
+        """
+        Get the current collection version.
+        
+        Returns:
+            Version number (0 if the collection was never written)
+        """
+        try:
+            with open(self.version_path, "r", encoding="utf-8") as f:
+                return int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+    
+    def bump_version(self) -> None:
+        """
+        Mark the collection as changed, invalidating all cached results.
+        """
+        with self._lock:
+            version = self.collection_version + 1
+            tmp_path = f"{self.version_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(str(version))
+            os.replace(tmp_path, self.version_path)
+            self.results.clear()
+    
+    def embed_query(self, model: str, query: str, embed: Callable[[str], List[float]]) -> List[float]:
+        """
+        Get a query embedding, computing it only on a cache miss.
+        
+        Args:
+            model: Name of the embedding model
+            query: Query string
+            embed: Function embedding a query
+            
+        Returns:
+            Query embedding
+        """
+        key = (model, normalize_query(query))
+        embedding = self.embeddings.get(key)
+        if embedding is None:
+            embedding = embed(query)
+            self.embeddings.put(key, embedding)
+        return embedding
+    
+    def result_key(self, query: str, k: int, filters: Optional[Dict[str, Any]] = None, **options) -> Hashable:
+        """
+        Build the result cache key for a search.
+        
+        Args:
+            query: Query string
+            k: Number of results
+            filters: Metadata filters of the search
+            **options: Further search options that influence the results
+            
+        Returns:
+            Hashable cache key including the collection version
+        """
+        return (
+            normalize_query(query),
+            k,
+            json.dumps(filters, sort_keys=True, default=str) if filters else None,
+            json.dumps(options, sort_keys=True, default=str) if options else None,
+            self.collection_version
+        )
+    
+    def get_results(self, key: Hashable) -> Optional[List[Document]]:
+        """
+        Get cached search results.
+        
+        Args:
+            key: Result cache key
+            
+        Returns:
+            Copy of the cached document list, or None on a miss
+        """
+        documents = self.results.get(key)
+        return list(documents) if documents is not None else None
+    
+    def put_results(self, key: Hashable, documents: List[Document]) -> None:
+        """
+        Cache search results.
+        
+        Args:
+            key: Result cache key
+            documents: Documents returned by the search
+        """
+        self.results.put(key, list(documents))
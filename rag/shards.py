@@ -0,0 +1,250 @@
+"""
+Collection routing module for unsharded and per-Akte sharded Chroma stores.
+"""
+from typing import List, Optional, Dict, Any, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+from chromadb.errors import ChromaError
+from langchain_chroma import Chroma
+
+from rag.hashing import text_sha256
+
+
+class ShardedCollections:
+    """
+    Routes reads and writes to the Chroma collections holding the chunks.
+    
+    Unsharded, everything goes to the single collection of the vector store.
+    Sharded, every source file (Akte) gets its own collection, opened on first
+    use, so a scoped search only touches the chunks of that Akte; unscoped
+    searches query all shards in parallel and merge the results by distance.
+    """
+    
+    def __init__(
+        self,
+        vectorstore: Chroma,
+        collection_name: str,
+        sharded: bool = False,
+        max_shard_queries: int = 8
+    ):
+        """
+        Initialize the collection routing.
+        
+        Args:
+            vectorstore: Chroma vector store of the unsharded collection
+            collection_name: Name of the collection, also the prefix of the shards
+            sharded: Whether to store each source file in its own collection
+            max_shard_queries: Maximum number of shards searched at the same time
+        """
+        self.vectorstore = vectorstore
+        self.collection_name = collection_name
+        self.sharded = sharded
+        
+        # Shard collections by source file name, opened on first use
+        self._shards: Dict[str, Any] = {}
+        self._shard_lock = threading.Lock()
+        self._shard_executor = ThreadPoolExecutor(max_workers=max(1, max_shard_queries)) if sharded else None
+    
+    def for_write(self, source: str):
+        """
+        Get the collection new chunks of a source file are written to.
+        
+        Args:
+            source: Source file name
+        
+        Returns:
+            Chroma collection, created if needed
+        """
+        if self.sharded:
+            return self._shard(source, create=True)
+        return self.vectorstore._collection
+    
+    def in_scope(self, source: Optional[str] = None) -> List[Any]:
+        """
+        Get the Chroma collections that hold the chunks in scope.
+        
+        Args:
+            source: Source file name (all collections if None)
+        
+        Returns:
+            The shard collections in scope if sharded, otherwise the single collection
+        """
+        if self.sharded:
+            return [collection for _, collection in self._shards_for(source)]
+        return [self.vectorstore._collection]
+    
+    def scope_filter(
+        self,
+        filter: Optional[Dict[str, Any]],
+        source: Optional[str]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Add the source scope to a metadata filter.
+        
+        Args:
+            filter: Chroma metadata filter
+            source: Source file name of the Akte to search (all if None)
+        
+        Returns:
+            Chroma where filter; shards only hold one source, so the scope is
+            only added when not sharded
+        """
+        if source is None or self.sharded:
+            return filter
+        if not filter:
+            return {"source": source}
+        return {"$and": [{"source": source}, filter]}
+    
+    def query(
+        self,
+        embedding: List[float],
+        n_results: int,
+        filter: Optional[Dict[str, Any]],
+        source: Optional[str],
+        include: List[str]
+    ) -> List[Dict[str, Any]]:
+        """
+        Find the chunks nearest to an embedding in the collections in scope.
+        
+        Args:
+            embedding: Query embedding
+            n_results: Number of results
+            filter: Chroma metadata filter
+            source: Source file name of the Akte to search (all if None)
+            include: Fields to return besides ids and distances
+        
+        Returns:
+            List of hits with "id", "distance" and the included fields, nearest first
+        """
+        where = self.scope_filter(filter, source)
+        
+        def query(collection):
+            return collection.query(
+                query_embeddings=[embedding],
+                n_results=n_results,
+                where=where,
+                include=include + ["distances"]
+            )
+        
+        collections = self.in_scope(source)
+        if len(collections) > 1:
+            results = list(self._shard_executor.map(query, collections))
+        else:
+            results = [query(collection) for collection in collections]
+        
+        hits = []
+        for result in results:
+            for i, chunk_id in enumerate(result["ids"][0]):
+                hit = {"id": chunk_id, "distance": result["distances"][0][i]}
+                hit.update((field, result[field][0][i]) for field in include)
+                hits.append(hit)
+        hits.sort(key=lambda hit: hit["distance"])
+        return hits[:n_results]
+    
+    def delete(self, ids: List[str], source: Optional[str] = None) -> None:
+        """
+        Delete chunks from the collections in scope.
+        
+        Args:
+            ids: Ids of the chunks to delete
+            source: Source file name of the chunks (all shards if None)
+        """
+        if not self.sharded:
+            self.vectorstore.delete(ids=ids)
+            return
+        
+        for shard_source, collection in self._shards_for(source):
+            collection.delete(ids=ids)
+            
+            # Drop the collections of removed Akten
+            if collection.count() == 0:
+                self._drop_shard(shard_source)
+    
+    def drop_shards(self) -> None:
+        """
+        Delete all shard collections, also those left behind when sharding
+        was switched off.
+        """
+        for source, _ in self._shards_for():
+            self._drop_shard(source)
+    
+    def _shard_name(self, source: str) -> str:
+        """
+        Get the collection name of a shard.
+        
+        Args:
+            source: Source file name
+        
+        Returns:
+            Collection name that is valid for any file name
+        """
+        return f"{self.collection_name}__{text_sha256(source)[:16]}"
+    
+    def _shard(self, source: str, create: bool = False):
+        """
+        Open the collection of one source file.
+        
+        Args:
+            source: Source file name
+            create: Whether to create the collection if it does not exist
+        
+        Returns:
+            Chroma collection, or None if it does not exist and create is False
+        """
+        with self._shard_lock:
+            collection = self._shards.get(source)
+            if collection is not None:
+                return collection
+            
+            client = self.vectorstore._client
+            if create:
+                collection = client.get_or_create_collection(self._shard_name(source), metadata={"source": source})
+            else:
+                try:
+                    collection = client.get_collection(self._shard_name(source))
+                except (ValueError, ChromaError):
+                    return None
+            self._shards[source] = collection
+            return collection
+    
+    def _shards_for(self, source: Optional[str] = None) -> List[Tuple[str, Any]]:
+        """
+        Get the shard collections in scope, opening them as needed.
+        
+        Args:
+            source: Source file name (all shards if None)
+        
+        Returns:
+            List of (source, collection)
+        """
+        if source is not None:
+            collection = self._shard(source)
+            return [(source, collection)] if collection is not None else []
+        
+        prefix = f"{self.collection_name}__"
+        with self._shard_lock:
+            client = self.vectorstore._client
+            for collection in client.list_collections():
+                # chromadb 0.6 lists collection names only
+                if isinstance(collection, str):
+                    if not collection.startswith(prefix):
+                        continue
+                    collection = client.get_collection(collection)
+                if collection.name.startswith(prefix) and collection.metadata:
+                    self._shards.setdefault(collection.metadata["source"], collection)
+            return list(self._shards.items())
+    
+    def _drop_shard(self, source: str) -> None:
+        """
+        Delete the collection of one source file.
+        
+        Args:
+            source: Source file name
+        """
+        with self._shard_lock:
+            self._shards.pop(source, None)
+            try:
+                self.vectorstore._client.delete_collection(self._shard_name(source))
+            except (ValueError, ChromaError):
+                pass
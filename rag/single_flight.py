@@ -0,0 +1,308 @@
+"""
+Single-flight module for sharing identical LLM generations that run at the same time.
+"""
+from typing import Dict, Any, AsyncIterator, Callable, Iterator, List, Optional, Set, Tuple
+import asyncio
+import json
+import threading
+
+from rag.hashing import text_sha256
+
+
+def request_key(model: str, options: Dict[str, Any], prompt: str) -> str:
+    """
+    Get the key identifying an LLM request.
+    
+    Args:
+        model: Model name
+        options: Options that change the response (temperature, num_ctx)
+        prompt: Full prompt string
+    
+    Returns:
+        Hex digest of the model, options and prompt hash
+    """
+    return text_sha256(json.dumps({"model": model, "options": options, "prompt": text_sha256(prompt)}, sort_keys=True))
+
+
+class Flight:
+    """
+    One running generation and the chunks it produced so far.
+    """
+    
+    def __init__(self):
+        """
+        Initialize the flight.
+        """
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[Exception] = None
+        self.subscribers = 0
+        self.condition = threading.Condition()
+        self.async_waiters: Set[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = set()
+        self.producer: Any = None
+
+
+class SingleFlight:
+    """
+    Shares one generation between identical requests that run at the same time.
+    
+    The first request for a key starts the generation, which appends every
+    chunk to a buffer shared by all subscribers: a sync request runs it on a
+    worker thread, an async request as a task on its event loop, so async
+    requests need no thread. Further requests for the same key while it
+    runs subscribe to that buffer instead of starting another generation;
+    they first receive the chunks produced so far and then follow live, so
+    every subscriber gets the same complete token stream. Sync subscribers
+    wait on a condition, async subscribers on an asyncio event that is set
+    thread-safely, so both kinds can share either kind of generation. A
+    generation whose subscribers all left is stopped after its next chunk.
+    Finished generations are forgotten; repeated requests later are served
+    by the answer caches.
+    """
+    
+    def __init__(self):
+        """
+        Initialize the single-flight layer.
+        """
+        self._flights: Dict[str, Flight] = {}
+        self._lock = threading.Lock()
+        self._stats = {"generations": 0, "coalesced": 0}
+    
+    def stats(self) -> Dict[str, int]:
+        """
+        Get the counters of the layer.
+        
+        Returns:
+            Dictionary with the generations started, the requests that joined
+            a running one and the generations running now
+        """
+        with self._lock:
+            return dict(self._stats, in_flight=len(self._flights))
+    
+    def stream(self, key: str, generate: Callable[[], Iterator[str]]) -> Iterator[str]:
+        """
+        Stream the response for a key, sharing a running generation.
+        
+        Args:
+            key: Request key (see request_key)
+            generate: Function starting the generation if none is running
+        
+        Returns:
+            Iterator over response chunks
+        """
+        def start(flight):
+            thread = threading.Thread(
+                target=self._generate,
+                args=(key, flight, generate),
+                name="llm-generation",
+                daemon=True
+            )
+            thread.start()
+            return thread
+        
+        flight = self._join(key, start)
+        index = 0
+        try:
+            while True:
+                with flight.condition:
+                    while index >= len(flight.chunks) and not flight.done:
+                        flight.condition.wait()
+                    chunks = flight.chunks[index:]
+                    done = flight.done
+                index += len(chunks)
+                yield from chunks
+                if done:
+                    break
+        finally:
+            self._leave(flight)
+        
+        if flight.error is not None:
+            raise flight.error
+    
+    async def astream(self, key: str, agenerate: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+        """
+        Stream the response for a key without blocking the event loop,
+        sharing a running generation.
+        
+        Args:
+            key: Request key (see request_key)
+            agenerate: Function starting the async generation if none is
+                running; it runs as a task on the current event loop
+        
+        Returns:
+            Async iterator over response chunks
+        """
+        loop = asyncio.get_running_loop()
+        waiter = (loop, asyncio.Event())
+        flight = self._join(key, lambda flight: loop.create_task(self._agenerate(key, flight, agenerate)), waiter)
+        index = 0
+        try:
+            while True:
+                # Clear before reading, so a chunk appended meanwhile wakes the wait below
+                waiter[1].clear()
+                with flight.condition:
+                    chunks = flight.chunks[index:]
+                    done = flight.done
+                index += len(chunks)
+                for chunk in chunks:
+                    yield chunk
+                if done:
+                    break
+                if not chunks:
+                    await waiter[1].wait()
+        finally:
+            with flight.condition:
+                flight.async_waiters.discard(waiter)
+            self._leave(flight)
+        
+        if flight.error is not None:
+            raise flight.error
+    
+    def _join(
+        self,
+        key: str,
+        start: Callable[[Flight], Any],
+        waiter: Optional[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = None
+    ) -> Flight:
+        """
+        Subscribe to the running generation of a key, or start it.
+        
+        Args:
+            key: Request key
+            start: Function starting the producer of a new flight; its
+                result (thread or task) is kept on the flight
+            waiter: Event loop and event of an async subscriber
+        
+        Returns:
+            The flight
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            started = flight is None
+            if started:
+                flight = Flight()
+                self._flights[key] = flight
+                self._stats["generations"] += 1
+            else:
+                self._stats["coalesced"] += 1
+            flight.subscribers += 1
+            if waiter is not None:
+                with flight.condition:
+                    flight.async_waiters.add(waiter)
+        
+        if started:
+            flight.producer = start(flight)
+        return flight
+    
+    def _leave(self, flight: Flight) -> None:
+        """
+        Unsubscribe from a flight.
+        
+        Args:
+            flight: The flight
+        """
+        with self._lock:
+            flight.subscribers -= 1
+    
+    def _generate(self, key: str, flight: Flight, generate: Callable[[], Iterator[str]]) -> None:
+        """
+        Run a generation and publish its chunks to the subscribers.
+        
+        Args:
+            key: Request key
+            flight: The flight to publish to
+            generate: Function starting the generation
+        """
+        chunks = None
+        try:
+            chunks = generate()
+            for chunk in chunks:
+                self._publish(flight, chunk)
+                if self._abandoned(key, flight):
+                    break
+        except Exception as e:
+            flight.error = e
+        finally:
+            if hasattr(chunks, "close"):
+                chunks.close()
+            self._finish(key, flight)
+    
+    async def _agenerate(self, key: str, flight: Flight, agenerate: Callable[[], AsyncIterator[str]]) -> None:
+        """
+        Run an async generation and publish its chunks to the subscribers.
+        
+        Args:
+            key: Request key
+            flight: The flight to publish to
+            agenerate: Function starting the async generation
+        """
+        chunks = None
+        try:
+            chunks = agenerate()
+            async for chunk in chunks:
+                self._publish(flight, chunk)
+                if self._abandoned(key, flight):
+                    break
+        except asyncio.CancelledError:
+            # The event loop is shutting down; subscribers must not take the partial answer as complete
+            flight.error = RuntimeError("The generation was cancelled")
+            raise
+        except Exception as e:
+            flight.error = e
+        finally:
+            if hasattr(chunks, "aclose"):
+                await chunks.aclose()
+            self._finish(key, flight)
+    
+    def _abandoned(self, key: str, flight: Flight) -> bool:
+        """
+        Check whether a flight lost all its subscribers, and forget it if so.
+        
+        Args:
+            key: Request key
+            flight: The flight
+        
+        Returns:
+            Whether the generation should stop; later requests start a new one
+        """
+        with self._lock:
+            if flight.subscribers == 0:
+                self._flights.pop(key, None)
+                return True
+            return False
+    
+    def _finish(self, key: str, flight: Flight) -> None:
+        """
+        Forget a finished flight and wake up its subscribers.
+        
+        Args:
+            key: Request key
+            flight: The flight
+        """
+        with self._lock:
+            if self._flights.get(key) is flight:
+                self._flights.pop(key)
+        self._publish(flight, None)
+    
+    @staticmethod
+    def _publish(flight: Flight, chunk: Optional[str]) -> None:
+        """
+        Append a chunk, or mark the flight done, and wake up the subscribers.
+        
+        Args:
+            flight: The flight
+            chunk: Response chunk (None when the generation ended)
+        """
+        with flight.condition:
+            if chunk is None:
+                flight.done = True
+            else:
+                flight.chunks.append(chunk)
+            flight.condition.notify_all()
+            waiters = list(flight.async_waiters)
+        for loop, wakeup in waiters:
+            try:
+                loop.call_soon_threadsafe(wakeup.set)
+            except RuntimeError:
+                # The subscriber's event loop was closed without finishing the stream
+                pass
@@ -0,0 +1,148 @@
+"""
+Term index module for finding the pages of a document that mention screening terms.
+"""
+from typing import Dict, List, Optional
+import json
+import re
+
+from langchain_core.documents import Document
+
+from rag.hashing import text_sha256
+
+
+# Screening term groups; each pattern is a case-insensitive regular expression
+DEFAULT_TERM_GROUPS = {
+    "alcohol": [
+        r"\bBAK\b", r"\bAAK\b", r"promille", r"alkohol", r"blutprobe", r"blutentnahme",
+        r"trunkenheit", r"betrunken", r"alkotest", r"§\s*316\b", r"§\s*24a\b"
+    ],
+    "drugs": [
+        r"\bTHC\b", r"drogen", r"betäubungsmittel", r"\bBtM", r"rauschgift", r"rauschmittel",
+        r"berausch", r"cannabis", r"marihuana", r"haschisch", r"kokain", r"amphetamin", r"heroin",
+        r"ecstasy", r"\bMDMA\b"
+    ],
+    "medication": [r"medikament", r"arznei", r"tabletten"],
+    "hit_and_run": [
+        r"unerlaubte[sn]?\s+entfernen", r"fahrerflucht", r"unfallflucht", r"§\s*142\b"
+    ],
+    "phone": [r"(?:tel(?:efon)?|fax|mobil|handy)\.?\s*:?\s*[+\d]", r"(?:\+49|\b0\d{2,5})[\s/-]?\d[\d\s/-]{4,}\d"],
+    "email": [r"[\w.+-]+@[\w-]+\.[\w.-]+"],
+    # Postal code and capitalized town name; the case is checked despite IGNORECASE
+    "address": [r"(?-i:\b\d{5}\s+[A-ZÄÖÜ][a-zäöüß]+)", r"wohnhaft"],
+    "fault_damage": [
+        r"schuld", r"verursach", r"haftung", r"schaden", r"gutachten", r"reparatur",
+        r"wertminderung", r"\d+(?:\.\d{3})*,\d{2}\s*(?:€|EUR)"
+    ]
+}
+
+# Words split by a hyphen at a line break ("Alko-\nhol"), joined before matching
+LINE_BREAK_HYPHEN = re.compile(r"(\w)-[ \t]*\r?\n\s*(\w)")
+
+# Version of the matching rules themselves, so cached indexes are rebuilt when they change
+INDEX_FORMAT = 2
+
+# A page with fewer non-whitespace characters has no usable text layer (e.g. a scan)
+MIN_PAGE_CHARS = 100
+
+
+def load_term_groups(path: Optional[str] = None) -> Dict[str, List[str]]:
+    """
+    Get the term groups, with groups from a JSON file replacing the defaults.
+    
+    Args:
+        path: JSON file mapping group names to lists of patterns (defaults only if None)
+    
+    Returns:
+        Dictionary mapping group names to patterns
+    """
+    term_groups = dict(DEFAULT_TERM_GROUPS)
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            term_groups.update(json.load(f))
+    return term_groups
+
+
+class TermIndex:
+    """
+    Finds the pages that match each term group.
+    
+    The index of a document is computed once when its pages are parsed and
+    cached with them, so screening questions only look up page numbers.
+    """
+    
+    def __init__(self, term_groups: Optional[Dict[str, List[str]]] = None):
+        """
+        Initialize the term index.
+        
+        Args:
+            term_groups: Dictionary mapping group names to patterns
+                (DEFAULT_TERM_GROUPS if None)
+        """
+        self.term_groups = term_groups or DEFAULT_TERM_GROUPS
+        self.patterns = {
+            group: re.compile("|".join(f"(?:{pattern})" for pattern in patterns), re.IGNORECASE)
+            for group, patterns in self.term_groups.items()
+        }
+        
+        # Identifies the configuration, so cached indexes are rebuilt when it changes
+        self.version = text_sha256(json.dumps([INDEX_FORMAT, self.term_groups], sort_keys=True))[:16]
+    
+    def build(self, pages: List[Document]) -> Dict[str, List[int]]:
+        """
+        Find the pages matching each term group.
+        
+        Each page is searched as extracted and with words hyphenated across
+        line breaks joined again.
+        
+        Args:
+            pages: Page documents in page order
+        
+        Returns:
+            Dictionary mapping group names to the indexes of matching pages
+        """
+        texts = [
+            (page.page_content, LINE_BREAK_HYPHEN.sub(r"\1\2", page.page_content))
+            for page in pages
+        ]
+        return {
+            group: [
+                i for i, (text, joined) in enumerate(texts)
+                if pattern.search(text) or (joined != text and pattern.search(joined))
+            ]
+            for group, pattern in self.patterns.items()
+        }
+
+
+def pages_matching(page_terms: Dict[str, List[int]], groups: List[str]) -> List[int]:
+    """
+    Get the pages matching any of the given term groups.
+    
+    Args:
+        page_terms: Term index of a document
+        groups: Names of the term groups
+    
+    Returns:
+        Sorted page indexes
+    """
+    return sorted({i for group in groups for i in page_terms.get(group, [])})
+
+
+def has_text_layer(pages: List[Document], min_share: float = 0.9) -> bool:
+    """
+    Check whether a document's pages carry enough extracted text to search.
+    
+    Scanned pages without OCR yield little or no text, so finding no term on
+    them does not mean the document does not mention it.
+    
+    Args:
+        pages: Page documents
+        min_share: Share of pages that must have at least MIN_PAGE_CHARS
+            non-whitespace characters
+    
+    Returns:
+        True if the document can be ruled out by term search
+    """
+    if not pages:
+        return False
+    with_text = sum(1 for page in pages if len("".join(page.page_content.split())) >= MIN_PAGE_CHARS)
+    return with_text >= min_share * len(pages)
@@ -0,0 +1,109 @@
+"""
+Token budget module for sizing the LLM context window to the prompt.
+"""
+from typing import List, Optional
+import re
+
+from rag.hashing import text_sha256
+from rag.lru import LRUCache
+
+
+# Context window sizes the LLM is run with. Ollama reloads the model whenever
+# num_ctx changes, so prompts are rounded up to a few fixed sizes.
+DEFAULT_CONTEXT_BUCKETS = [4096, 8192, 16384, 32768, 65536, 98304]
+
+# Words and single punctuation characters
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+# Average characters per token of a word for German text with the
+# subword tokenizers of common Ollama models (rounded down, so estimates
+# err on the high side)
+CHARS_PER_TOKEN = 4
+
+
+class ContextWindowExceededError(ValueError):
+    """
+    Raised when a prompt does not fit into the largest allowed context window.
+    """
+    
+    def __init__(self, prompt_tokens: int, max_ctx: int):
+        self.prompt_tokens = prompt_tokens
+        self.max_ctx = max_ctx
+        super().__init__(
+            f"Prompt needs about {prompt_tokens} tokens, which does not fit into "
+            f"the maximum context window of {max_ctx} tokens"
+        )
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens of a text.
+    
+    Args:
+        text: Text to estimate
+    
+    Returns:
+        Estimated token count
+    """
+    tokens = 0
+    for match in TOKEN_PATTERN.finditer(text):
+        tokens += -(-len(match.group()) // CHARS_PER_TOKEN)
+    return tokens
+
+
+def select_context_size(
+    required_tokens: int,
+    max_ctx: int,
+    buckets: Optional[List[int]] = None
+) -> int:
+    """
+    Choose the smallest context window that fits the required tokens.
+    
+    Args:
+        required_tokens: Tokens of the prompt plus the reserved response tokens
+        max_ctx: Largest allowed context window
+        buckets: Allowed context window sizes (only max_ctx if empty)
+    
+    Returns:
+        Context window size
+    """
+    if required_tokens > max_ctx:
+        raise ContextWindowExceededError(required_tokens, max_ctx)
+    
+    for size in sorted(buckets or []):
+        if required_tokens <= size <= max_ctx:
+            return size
+    return max_ctx
+
+
+class TokenCounter:
+    """
+    Token estimator with a cache keyed by text content, so pages and chunks
+    that appear in many prompts are only counted once.
+    """
+    
+    def __init__(self, max_entries: int = 4096):
+        """
+        Initialize the counter.
+        
+        Args:
+            max_entries: Number of texts whose counts are kept in memory
+        """
+        self.cache = LRUCache(max_entries)
+    
+    def count(self, text: str) -> int:
+        """
+        Estimate the number of tokens of a text, using the cache.
+        
+        Args:
+            text: Text to estimate
+        
+        Returns:
+            Estimated token count
+        """
+        key = text_sha256(text)
+        tokens = self.cache.get(key)
+        if tokens is None:
+            tokens = estimate_tokens(text)
+            self.cache.put(key, tokens)
+        return tokens
@@ -2,24 +2,54 @@
 Vector store module for storing and retrieving document embeddings.
 """
 from typing import List, Optional, Dict, Any
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import os
+import uuid
 
-from langchain_ollama import OllamaEmbeddings
 from langchain_chroma import Chroma
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
 from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
 from langchain_core.vectorstores import VectorStore
+from pydantic import ConfigDict, Field
+
+from rag.embedding_cache import CachedEmbeddings
+from rag.hybrid import reciprocal_rank_fusion
+from rag.mmr import maximal_marginal_relevance
+from rag.retrieval_cache import RetrievalCache
+from rag.lexical_index import LexicalIndex
+from rag.ollama_pool import OllamaPool, PooledEmbeddings
+from rag.shards import ShardedCollections
+
+# Retrieval modes
+VECTOR_RETRIEVAL = "vector"
+HYBRID_RETRIEVAL = "hybrid"
+MMR_RETRIEVAL = "mmr"
+RETRIEVAL_MODES = (VECTOR_RETRIEVAL, HYBRID_RETRIEVAL, MMR_RETRIEVAL)
 
 
 class ChromaVectorStore:
     """
     Manages the Chroma vector store for document embeddings.
+    
+    Searches can be scoped to one Akte by its source file name. In sharded
+    mode every Akte gets its own Chroma collection (see ShardedCollections),
+    so the latency of a scoped search does not grow with the corpus.
     """
     
     def __init__(
         self,
         persist_directory: str = "data/chroma",
         embedding_model: str = "nomic-embed-text",
-        collection_name: str = "pdf_docs"
+        collection_name: str = "pdf_docs",
+        embed_batch_size: int = 64,
+        max_embed_requests: int = 2,
+        embedding_cache_dir: Optional[str] = None,
+        sharded: bool = False,
+        max_shard_queries: int = 8,
+        embedding_keep_alive: Optional[int] = None,
+        embedding_pool: Optional[OllamaPool] = None
     ):
         """
         Initialize the Chroma vector store.
@@ -28,15 +58,39 @@ class ChromaVectorStore:
             persist_directory: Directory to persist the vector store
             embedding_model: Name of the embedding model to use with Ollama
             collection_name: Name of the collection in Chroma
+            embed_batch_size: Number of chunks embedded per Ollama request
+            max_embed_requests: Maximum number of embedding requests in flight
+            embedding_cache_dir: Directory of the persistent embedding cache
+                (no caching if None)
+            sharded: Whether to store each source file (Akte) in its own collection
+            max_shard_queries: Maximum number of shards searched at the same
+                time by unscoped searches
+            embedding_keep_alive: Seconds Ollama keeps the embedding model
+                loaded after a request (negative for forever, None for the
+                server default)
+            embedding_pool: Ollama hosts the embedding requests are routed
+                over (the host from OLLAMA_HOST if None)
         """
         self.persist_directory = persist_directory
         self.collection_name = collection_name
+        self.embedding_model = embedding_model
+        self.embedding_keep_alive = embedding_keep_alive
+        self.embedding_pool = embedding_pool or OllamaPool()
+        self.embed_batch_size = max(1, embed_batch_size)
+        self.max_embed_requests = max(1, max_embed_requests)
+        self.sharded = sharded
         
         # Create the persist directory if it doesn't exist
         os.makedirs(persist_directory, exist_ok=True)
         
-        # Set up the embedding function
-        self.embedding_function = OllamaEmbeddings(model=embedding_model)
+        # Set up the embedding function, routed over the embedding hosts
+        self.embedding_function = PooledEmbeddings(embedding_model, self.embedding_pool, embedding_keep_alive)
+        if embedding_cache_dir:
+            self.embedding_function = CachedEmbeddings(
+                self.embedding_function,
+                model_name=embedding_model,
+                cache_dir=embedding_cache_dir
+            )
         
         # Initialize the vector store
         self.vectorstore = Chroma(
@@ -44,57 +98,413 @@ class ChromaVectorStore:
             embedding_function=self.embedding_function,
             collection_name=collection_name
         )
+        
+        # The single collection, or one shard collection per Akte
+        self.collections = ShardedCollections(self.vectorstore, collection_name, sharded, max_shard_queries)
+        
+        # Cache query embeddings and search results between writes
+        self.retrieval_cache = RetrievalCache(
+            os.path.join(persist_directory, f"{collection_name}.version")
+        )
+        
+        # BM25 index of the same chunks for exact terms such as Aktenzeichen
+        self.lexical_index = LexicalIndex(
+            os.path.join(persist_directory, f"{collection_name}_lexical.sqlite3")
+        )
     
-    def add_documents(self, documents: List[Document]) -> None:
+    def add_documents(self, documents: List[Document], ids: Optional[List[str]] = None) -> None:
         """
         Add documents to the vector store.
         
+        Documents are embedded in batches with up to max_embed_requests
+        embedding requests in flight. Each finished batch is written to Chroma
+        while the following batches are still being embedded, so only a
+        bounded number of embeddings is held in memory.
+        
         Args:
             documents: List of documents to add
+            ids: Optional ids for the documents (random ids if omitted)
         """
         if not documents:
             print("No documents to add.")
             return
         
+        if ids is None:
+            ids = [str(uuid.uuid4()) for _ in documents]
+        
         print(f"Adding {len(documents)} documents to vector store...")
-        self.vectorstore.add_documents(documents)
+        batch_starts = range(0, len(documents), self.embed_batch_size)
+        
+        with ThreadPoolExecutor(max_workers=self.max_embed_requests) as executor:
+            pending = deque()
+            for start in batch_starts:
+                batch = documents[start:start + self.embed_batch_size]
+                future = executor.submit(
+                    self.embedding_function.embed_documents,
+                    [doc.page_content for doc in batch]
+                )
+                pending.append((start, future))
+                
+                # Write the oldest batch once the in-flight limit is reached
+                if len(pending) >= self.max_embed_requests:
+                    self._write_batch(documents, ids, *pending.popleft())
+            
+            while pending:
+                self._write_batch(documents, ids, *pending.popleft())
+        
+        self.lexical_index.add(
+            ids,
+            [doc.page_content for doc in documents],
+            [(doc.metadata or {}).get("source") for doc in documents]
+        )
         
         # Chroma automatically persists changes when using a persist_directory
+        self.retrieval_cache.bump_version()
         print("Documents added to vector store.")
     
-    def similarity_search(self, query: str, k: int = 8) -> List[Document]:
+    def _write_batch(self, documents: List[Document], ids: List[str], start: int, future) -> None:
+        """
+        Wait for an embedding batch and write it to Chroma.
+        
+        Args:
+            documents: All documents being added
+            ids: Ids of all documents being added
+            start: Index of the first document in the batch
+            future: Future resolving to the batch embeddings
+        """
+        embeddings = future.result()
+        end = start + len(embeddings)
+        
+        # Group the batch by collection (a single group unless sharded)
+        groups: Dict[str, List[int]] = {}
+        for i in range(start, end):
+            source = documents[i].metadata.get("source", "") if self.sharded else ""
+            groups.setdefault(source, []).append(i)
+        
+        for source, indexes in groups.items():
+            self.collections.for_write(source).upsert(
+                ids=[ids[i] for i in indexes],
+                embeddings=[embeddings[i - start] for i in indexes],
+                metadatas=[documents[i].metadata or None for i in indexes],
+                documents=[documents[i].page_content for i in indexes]
+            )
+        print(f"Stored {end} of {len(documents)} documents")
+    
+    def delete_documents(self, ids: List[str], source: Optional[str] = None) -> None:
+        """
+        Delete documents from the vector store.
+        
+        Args:
+            ids: Ids of the documents to delete
+            source: Source file name of the documents, so only its shard is
+                touched in sharded mode (all shards if None)
+        """
+        if not ids:
+            return
+        
+        self.collections.delete(ids, source)
+        self.lexical_index.remove(ids)
+        self.retrieval_cache.bump_version()
+        print(f"Deleted {len(ids)} documents from vector store.")
+    
+    def embedding_cache_stats(self) -> Optional[Dict[str, Any]]:
+        """
+        Get statistics of the embedding cache.
+        
+        Returns:
+            Cache statistics, or None if caching is disabled
+        """
+        if isinstance(self.embedding_function, CachedEmbeddings):
+            return self.embedding_function.stats()
+        return None
+    
+    def count(self) -> int:
+        """
+        Get the number of documents in the collection.
+        
+        Returns:
+            Number of stored documents
+        """
+        return sum(collection.count() for collection in self.collections.in_scope())
+    
+    def clear(self) -> None:
+        """
+        Remove all documents from the collection.
+        """
+        self.collections.drop_shards()
+        self.vectorstore.reset_collection()
+        self.lexical_index.clear()
+        self.retrieval_cache.bump_version()
+        print(f"Cleared collection {self.collection_name}.")
+    
+    def sync_lexical_index(self, batch_size: int = 1000) -> None:
+        """
+        Rebuild the lexical index from the collection if they differ.
+        
+        Covers collections ingested before the lexical index existed and
+        runs that were interrupted between the two writes.
+        
+        Args:
+            batch_size: Number of chunks read from Chroma at a time
+        """
+        total = self.count()
+        if self.lexical_index.count() == total:
+            return
+        
+        print(f"Rebuilding lexical index for {total} documents...")
+        self.lexical_index.clear()
+        for collection in self.collections.in_scope():
+            for offset in range(0, collection.count(), batch_size):
+                batch = collection.get(include=["documents", "metadatas"], limit=batch_size, offset=offset)
+                self.lexical_index.add(
+                    batch["ids"],
+                    batch["documents"],
+                    [(metadata or {}).get("source") for metadata in batch["metadatas"]]
+                )
+        self.retrieval_cache.bump_version()
+    
+    def embed_query(self, query: str) -> List[float]:
+        """
+        Embed a query, reusing the embedding of an identical earlier query.
+        
+        Args:
+            query: Query string
+            
+        Returns:
+            Query embedding
+        """
+        return self.retrieval_cache.embed_query(
+            self.embedding_model,
+            query,
+            self.embedding_function.embed_query
+        )
+    
+    def similarity_search(
+        self,
+        query: str,
+        k: int = 8,
+        filter: Optional[Dict[str, Any]] = None,
+        source: Optional[str] = None
+    ) -> List[Document]:
         """
         Perform a similarity search for a query.
         
+        Results are cached until the collection changes.
+        
         Args:
             query: Query string
             k: Number of results to return
+            filter: Optional Chroma metadata filter
+            source: Source file name of the Akte to search (all if None)
             
         Returns:
             List of relevant documents
         """
-        return self.vectorstore.similarity_search(query, k=k)
+        cache_key = self.retrieval_cache.result_key(query, k, filter, source=source)
+        documents = self.retrieval_cache.get_results(cache_key)
+        if documents is not None:
+            return documents
+        
+        hits = self.collections.query(self.embed_query(query), k, filter, source, ["documents", "metadatas"])
+        documents = [_hit_document(hit) for hit in hits]
+        self.retrieval_cache.put_results(cache_key, documents)
+        return documents
     
-    def get_retriever(self, search_kwargs: Optional[Dict[str, Any]] = None):
+    def search(
+        self,
+        query: str,
+        mode: str = VECTOR_RETRIEVAL,
+        k: int = 8,
+        filter: Optional[Dict[str, Any]] = None,
+        source: Optional[str] = None,
+        fetch_k: Optional[int] = None,
+        lambda_mult: float = 0.5
+    ) -> List[Document]:
+        """
+        Search with the given retrieval mode.
+        
+        Args:
+            query: Query string
+            mode: "vector" for similarity search, "hybrid" for fused vector and
+                BM25 search, "mmr" for diversified similarity search
+            k: Number of results to return
+            filter: Optional Chroma metadata filter
+            source: Source file name of the Akte to search (all if None)
+            fetch_k: Number of candidates of the hybrid and MMR modes (their
+                defaults if None)
+            lambda_mult: Weight of relevance against diversity in MMR mode
+            
+        Returns:
+            List of relevant documents
+        """
+        candidates = {} if fetch_k is None else {"fetch_k": fetch_k}
+        if mode == HYBRID_RETRIEVAL:
+            return self.hybrid_search(query, k=k, filter=filter, source=source, **candidates)
+        if mode == MMR_RETRIEVAL:
+            return self.mmr_search(
+                query, k=k, filter=filter, source=source, lambda_mult=lambda_mult, **candidates
+            )
+        if mode == VECTOR_RETRIEVAL:
+            return self.similarity_search(query, k=k, filter=filter, source=source)
+        raise ValueError(f"Unknown retrieval mode '{mode}', expected one of {RETRIEVAL_MODES}")
+    
+    def hybrid_search(
+        self,
+        query: str,
+        k: int = 4,
+        fetch_k: int = 20,
+        filter: Optional[Dict[str, Any]] = None,
+        source: Optional[str] = None
+    ) -> List[Document]:
+        """
+        Search with both the vector and the lexical index and fuse the rankings.
+        
+        Each index contributes its top fetch_k chunks of the Akte in scope
+        (other metadata filters only apply to the lexical hits afterwards);
+        chunks are ranked by reciprocal rank fusion, so exact identifiers
+        found lexically and paraphrases found by embeddings both reach the
+        top k. Results are cached until the collection changes.
+        
+        Args:
+            query: Query string
+            k: Number of results to return
+            fetch_k: Number of candidates taken from each index
+            filter: Optional Chroma metadata filter
+            source: Source file name of the Akte to search (all if None)
+            
+        Returns:
+            List of relevant documents
+        """
+        cache_key = self.retrieval_cache.result_key(
+            query, k, filter, mode="hybrid", fetch_k=fetch_k, source=source
+        )
+        documents = self.retrieval_cache.get_results(cache_key)
+        if documents is not None:
+            return documents
+        
+        dense = self.collections.query(self.embed_query(query), fetch_k, filter, source, ["documents", "metadatas"])
+        candidates = {hit["id"]: _hit_document(hit) for hit in dense}
+        
+        lexical_ids = [chunk_id for chunk_id, _ in self.lexical_index.search(query, fetch_k, source=source)]
+        
+        # Load lexical hits the vector search did not return (dropping filtered-out chunks)
+        missing = [chunk_id for chunk_id in lexical_ids if chunk_id not in candidates]
+        if missing:
+            where = self.collections.scope_filter(filter, source)
+            for collection in self.collections.in_scope(source):
+                found = collection.get(ids=missing, where=where, include=["documents", "metadatas"])
+                for chunk_id, text, metadata in zip(found["ids"], found["documents"], found["metadatas"]):
+                    candidates[chunk_id] = Document(page_content=text, metadata=metadata or {})
+        
+        ranked = [
+            chunk_id for chunk_id in reciprocal_rank_fusion([[hit["id"] for hit in dense], lexical_ids])
+            if chunk_id in candidates
+        ]
+        documents = [candidates[chunk_id] for chunk_id in ranked[:k]]
+        self.retrieval_cache.put_results(cache_key, documents)
+        return documents
+    
+    def mmr_search(
+        self,
+        query: str,
+        k: int = 8,
+        fetch_k: int = 32,
+        lambda_mult: float = 0.5,
+        filter: Optional[Dict[str, Any]] = None,
+        source: Optional[str] = None
+    ) -> List[Document]:
+        """
+        Perform a similarity search that skips near-duplicate chunks.
+        
+        The top fetch_k chunks are fetched together with their stored
+        embeddings and k of them are selected by maximal marginal relevance,
+        so overlapping neighbour chunks of the same page do not fill the
+        prompt. No embeddings are computed besides the (cached) query
+        embedding. Results are cached until the collection changes.
+        
+        Args:
+            query: Query string
+            k: Number of results to return
+            fetch_k: Number of candidates to select from
+            lambda_mult: Weight of relevance against diversity (1 is a plain
+                similarity search)
+            filter: Optional Chroma metadata filter
+            source: Source file name of the Akte to search (all if None)
+            
+        Returns:
+            List of relevant documents, most relevant first
+        """
+        cache_key = self.retrieval_cache.result_key(
+            query, k, filter, mode="mmr", fetch_k=fetch_k, lambda_mult=lambda_mult, source=source
+        )
+        documents = self.retrieval_cache.get_results(cache_key)
+        if documents is not None:
+            return documents
+        
+        query_embedding = self.embed_query(query)
+        hits = self.collections.query(
+            query_embedding, max(k, fetch_k), filter, source, ["documents", "metadatas", "embeddings"]
+        )
+        selected = maximal_marginal_relevance(query_embedding, [hit["embeddings"] for hit in hits], k, lambda_mult)
+        documents = [_hit_document(hits[i]) for i in selected]
+        self.retrieval_cache.put_results(cache_key, documents)
+        return documents
+    
+    def get_retriever(self, search_kwargs: Optional[Dict[str, Any]] = None, mode: str = VECTOR_RETRIEVAL):
         """
         Get a retriever for the vector store.
         
         Args:
-            search_kwargs: Search parameters
+            search_kwargs: Search parameters: "k", and optionally a Chroma
+                metadata "filter", the "source" file name of one Akte and
+                the "fetch_k" and "lambda_mult" of the hybrid and MMR modes
+            mode: Retrieval mode ("vector", "hybrid" or "mmr")
             
         Returns:
             Retriever object
         """
         if search_kwargs is None:
             search_kwargs = {"k": 8}
-            
-        return self.vectorstore.as_retriever(search_kwargs=search_kwargs)
+        
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode '{mode}', expected one of {RETRIEVAL_MODES}")
+        return StoreRetriever(store=self, mode=mode, search_kwargs=search_kwargs)
     
     def get_vectorstore(self) -> VectorStore:
         """
         Get the underlying vector store.
         
         Returns:
-            The Chroma vector store
+            The Chroma vector store (only the unsharded collection in sharded mode)
         """
-        return self.vectorstore 
\ No newline at end of file
+        return self.vectorstore
+
+
+class StoreRetriever(BaseRetriever):
+    """
+    Retriever that searches a ChromaVectorStore in a given retrieval mode.
+    """
+    
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+    
+    store: ChromaVectorStore
+    mode: str = VECTOR_RETRIEVAL
+    search_kwargs: Dict[str, Any] = Field(default_factory=dict)
+    
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return self.store.search(query, self.mode, **self.search_kwargs)
+
+
+def _hit_document(hit: Dict[str, Any]) -> Document:
+    """
+    Build a document from a search hit.
+    
+    Args:
+        hit: Hit with "documents" and "metadatas" fields
+        
+    Returns:
+        Document with the chunk text and metadata
+    """
+    return Document(page_content=hit["documents"], metadata=hit["metadatas"] or {})
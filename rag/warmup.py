@@ -0,0 +1,356 @@
+"""
+Warm-up module for loading the Ollama models before the first request.
+"""
+from typing import Callable, Dict, Any, List, Optional, Tuple, Union
+from concurrent.futures import ThreadPoolExecutor
+import re
+import threading
+import time
+
+from ollama import Client
+
+from rag.llm import OllamaWrapper
+from rag.vector_store import ChromaVectorStore
+
+# Units of Ollama keep_alive durations such as "30m" or "1h30m"
+DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def keep_alive_seconds(keep_alive: Optional[Union[str, int]]) -> Optional[int]:
+    """
+    Convert an Ollama keep_alive duration to seconds.
+    
+    Args:
+        keep_alive: Duration such as "30m" or "1h30m", a number of seconds,
+            negative to keep the model loaded forever, or None for the
+            server default
+    
+    Returns:
+        Seconds (negative for forever), or None for the server default
+    """
+    if keep_alive is None or isinstance(keep_alive, int):
+        return keep_alive
+    
+    keep_alive = keep_alive.strip()
+    if re.fullmatch(r"-?\d+", keep_alive):
+        return int(keep_alive)
+    
+    parts = re.findall(r"(\d+(?:\.\d+)?)(ms|s|m|h)", keep_alive)
+    if not parts or "".join(number + unit for number, unit in parts) != keep_alive.lstrip("-"):
+        raise ValueError(f"Invalid keep_alive duration '{keep_alive}'")
+    seconds = int(sum(float(number) * DURATION_UNITS[unit] for number, unit in parts))
+    return -seconds if keep_alive.startswith("-") else seconds
+
+
+class ModelWarmup:
+    """
+    Loads the LLM and the embedding model into Ollama and reports when both are hot.
+    
+    Both models are loaded at the same time on every host of their pool, with
+    the keep_alive and context window the requests use, so Ollama does not
+    reload them for the first request. `ready` is set once each model is
+    loaded on at least one host; servers report it on their
+    readiness endpoint and hold requests until then. Optionally the loaded
+    models are checked periodically and loaded again if Ollama unloaded them
+    (after its keep_alive expired, under memory pressure or after a restart)
+    or holds the LLM with another context window than the latest request
+    used; `ready` is cleared until they are loaded again.
+    """
+    
+    def __init__(
+        self,
+        llm: OllamaWrapper,
+        vector_store: ChromaVectorStore,
+        num_ctx: int,
+        refresh_seconds: float = 0,
+        retry_seconds: float = 10
+    ):
+        """
+        Initialize the warm-up.
+        
+        Args:
+            llm: LLM wrapper whose model, keep_alive and options are loaded
+            vector_store: Vector store whose embedding model is loaded
+            num_ctx: Context window the LLM is loaded with before the first
+                request (afterwards the one the latest request used); Ollama
+                reloads the model when a request uses a different one
+            refresh_seconds: Interval of the check that reloads unloaded
+                models (0 disables it)
+            retry_seconds: Time between two attempts while Ollama is unreachable
+        """
+        self.llm = llm
+        self.vector_store = vector_store
+        self.num_ctx = num_ctx
+        self.refresh_seconds = refresh_seconds
+        self.retry_seconds = retry_seconds
+        
+        # Set once both models are loaded on at least one host
+        self.ready = threading.Event()
+        
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._stats = {"models": {}, "reloads": 0, "error": None}
+    
+    def start(self) -> None:
+        """
+        Start warming up in a background thread.
+        """
+        if self._thread:
+            return
+        self._thread = threading.Thread(target=self._run, name="model-warmup", daemon=True)
+        self._thread.start()
+    
+    def stop(self) -> None:
+        """
+        Stop the background thread.
+        """
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+    
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until both models are loaded.
+        
+        Args:
+            timeout: Maximum seconds to wait (forever if None)
+        
+        Returns:
+            Whether the models are loaded
+        """
+        return self.ready.wait(timeout)
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get the readiness and the load time of each model.
+        
+        Returns:
+            Dictionary with ready, the load seconds and time per model, the
+            number of reloads and the last error
+        """
+        with self._lock:
+            return {
+                "ready": self.ready.is_set(),
+                "models": {name: dict(model) for name, model in self._stats["models"].items()},
+                "reloads": self._stats["reloads"],
+                "error": self._stats["error"]
+            }
+    
+    def _run(self) -> None:
+        """
+        Warm up until it succeeds, then check the loaded models until stopped.
+        """
+        while not self._stop.is_set() and not self.ready.is_set():
+            try:
+                self.warm_up()
+            except Exception as e:
+                with self._lock:
+                    self._stats["error"] = str(e)
+                print(f"Error warming up models, retrying in {self.retry_seconds:.0f}s: {str(e)}")
+                self._stop.wait(self.retry_seconds)
+        
+        while self.refresh_seconds > 0 and not self._stop.wait(self.refresh_seconds):
+            try:
+                self.refresh()
+            except Exception as e:
+                with self._lock:
+                    self._stats["error"] = str(e)
+                print(f"Error checking loaded models: {str(e)}")
+    
+    def warm_up(self) -> Dict[str, float]:
+        """
+        Load both models on all their hosts at the same time and set `ready`.
+        
+        Hosts that fail are reported; the warm-up only fails if a model could
+        not be loaded on any host.
+        
+        Returns:
+            Load seconds per model name (model@host if a pool has several hosts)
+        """
+        targets = self._targets()
+        with ThreadPoolExecutor(max_workers=len(targets)) as executor:
+            futures = [
+                (label, model, executor.submit(self._timed, load, host))
+                for label, model, host, load in targets
+            ]
+        
+        load_seconds = {}
+        errors = []
+        for label, model, future in futures:
+            try:
+                load_seconds[label] = future.result()
+            except Exception as e:
+                errors.append(f"{label}: {str(e)}")
+        self._record(load_seconds)
+        for label, seconds in load_seconds.items():
+            print(f"Model {label} loaded in {seconds:.1f}s")
+        
+        loaded_models = {model for label, model, _ in futures if label in load_seconds}
+        if loaded_models != {model for _, model, _ in futures}:
+            raise RuntimeError("; ".join(errors))
+        if errors:
+            with self._lock:
+                self._stats["error"] = "; ".join(errors)
+            print(f"Models could not be loaded on some hosts: {'; '.join(errors)}")
+        self.ready.set()
+        return load_seconds
+    
+    def refresh(self) -> Dict[str, float]:
+        """
+        Load the models again that Ollama has unloaded on any host.
+        
+        The LLM is also loaded again if it runs with another context window
+        than llm_num_ctx(). `ready` is cleared while a model is not loaded
+        on any host, and set again once it is.
+        
+        Returns:
+            Load seconds per reloaded model name (model@host if a pool has
+            several hosts)
+        """
+        loaded = {}
+        stale = []
+        hot = set()
+        targets = self._targets()
+        for label, model, host, load in targets:
+            try:
+                if host not in loaded:
+                    loaded[host] = {running.model: running.context_length for running in Client(host=host).ps().models}
+                num_ctx = self.llm_num_ctx() if model == self.llm.model_name else None
+                if self._is_loaded(model, loaded[host], num_ctx):
+                    hot.add(model)
+                else:
+                    stale.append((label, model, host, load))
+            except Exception as e:
+                with self._lock:
+                    self._stats["error"] = f"{label}: {str(e)}"
+                print(f"Error checking model {label}: {str(e)}")
+        
+        # Requests would wait for the reload, so report not ready until it is done
+        models = {model for _, model, _, _ in targets}
+        if hot != models:
+            self.ready.clear()
+        
+        load_seconds = {}
+        for label, model, host, load in stale:
+            try:
+                load_seconds[label] = self._timed(load, host)
+                hot.add(model)
+            except Exception as e:
+                with self._lock:
+                    self._stats["error"] = f"{label}: {str(e)}"
+                print(f"Error reloading model {label}: {str(e)}")
+        
+        if load_seconds:
+            self._record(load_seconds, reload=True)
+            for label, seconds in load_seconds.items():
+                print(f"Model {label} was unloaded or resized, reloaded in {seconds:.1f}s")
+        if hot == models:
+            self.ready.set()
+        return load_seconds
+    
+    def llm_num_ctx(self) -> int:
+        """
+        Get the context window the LLM is kept loaded with.
+        
+        Returns:
+            The context window of the latest request, or num_ctx before the first
+        """
+        return self.llm.last_num_ctx or self.num_ctx
+    
+    def load_llm(self, host: Optional[str] = None) -> None:
+        """
+        Load the LLM; Ollama loads a model without generating for an empty prompt.
+        
+        Args:
+            host: Host URL (the host from OLLAMA_HOST if None)
+        """
+        Client(host=host).generate(
+            model=self.llm.model_name,
+            prompt="",
+            keep_alive=self.llm.keep_alive,
+            options={"num_ctx": self.llm_num_ctx(), "temperature": self.llm.temperature}
+        )
+    
+    def load_embedding_model(self, host: Optional[str] = None) -> None:
+        """
+        Load the embedding model by embedding a short text.
+        
+        Args:
+            host: Host URL (the host from OLLAMA_HOST if None)
+        """
+        Client(host=host).embed(
+            model=self.vector_store.embedding_model,
+            input="warm-up",
+            keep_alive=self.vector_store.embedding_keep_alive
+        )
+    
+    def _targets(self) -> List[Tuple[str, str, Optional[str], Callable[[Optional[str]], None]]]:
+        """
+        Get the models to load on each host.
+        
+        Returns:
+            List of (label, model name, host URL, load function) tuples; the
+            label names the host if the model's pool has several hosts
+        """
+        targets = []
+        for model, pool, load in (
+            (self.llm.model_name, self.llm.pool, self.load_llm),
+            (self.vector_store.embedding_model, self.vector_store.embedding_pool, self.load_embedding_model)
+        ):
+            for host in pool.hosts:
+                label = f"{model}@{host.name}" if len(pool.hosts) > 1 else model
+                targets.append((label, model, host.url, load))
+        return targets
+    
+    @staticmethod
+    def _timed(load: Callable[[Optional[str]], None], host: Optional[str]) -> float:
+        """
+        Run a load function and measure it.
+        
+        Args:
+            load: Function loading a model on a host
+            host: Host URL
+        
+        Returns:
+            Seconds the load took
+        """
+        started = time.perf_counter()
+        load(host)
+        return time.perf_counter() - started
+    
+    @staticmethod
+    def _is_loaded(name: str, loaded: Dict[str, Optional[int]], num_ctx: Optional[int] = None) -> bool:
+        """
+        Check whether a model is loaded, with or without its ":latest" tag.
+        
+        Args:
+            name: Model name
+            loaded: Context length per loaded model name (None if Ollama
+                does not report it)
+            num_ctx: Context window the model must be loaded with (any if None)
+        
+        Returns:
+            Whether the model is loaded with the context window
+        """
+        for loaded_name in (name, f"{name}:latest"):
+            if loaded_name in loaded:
+                context_length = loaded[loaded_name]
+                return num_ctx is None or context_length is None or context_length == num_ctx
+        return False
+    
+    def _record(self, load_seconds: Dict[str, float], reload: bool = False) -> None:
+        """
+        Record the load times of models.
+        
+        Args:
+            load_seconds: Load seconds per model label
+            reload: Whether the models were loaded again after being unloaded
+        """
+        with self._lock:
+            for name, seconds in load_seconds.items():
+                self._stats["models"][name] = {"load_seconds": round(seconds, 3), "loaded_at": time.time()}
+            if reload:
+                self._stats["reloads"] += len(load_seconds)
+            self._stats["error"] = None
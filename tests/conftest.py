@@ -0,0 +1,142 @@
+"""
+Shared fixtures for the tests.
+
+The tests run without an Ollama server: embeddings come from a hash of the
+words of a text, PDFs are written on the fly, and LLM requests go to the
+Ollama stand-in of the benchmarks.
+"""
+from typing import List
+import argparse
+import hashlib
+import json
+import re
+import threading
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from benchmarks.fake_ollama import FakeOllama, make_handler
+from rag.ollama_pool import OllamaPool
+from rag.pipeline import RAGPipeline
+
+# Dimension of the test embeddings
+EMBEDDING_DIM = 64
+
+
+class HashEmbeddings(Embeddings):
+    """
+    Bag-of-words embeddings from word hashes, so texts sharing words are similar.
+    """
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = [0.0] * EMBEDDING_DIM
+        for word in re.findall(r"\w+", text.lower()):
+            vector[int(hashlib.sha256(word.encode("utf-8")).hexdigest(), 16) % EMBEDDING_DIM] += 1.0
+        # Avoid zero vectors for texts without words
+        vector[0] += 0.01
+        return vector
+
+
+def write_pdf(path, pages: List[str]) -> None:
+    """
+    Write a minimal PDF with one line of text per page (empty strings give blank pages).
+
+    Args:
+        path: Path of the PDF file
+        pages: Text of each page
+    """
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for text in pages:
+        escaped = text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+        stream = f"BT /F1 12 Tf 72 720 Td ({escaped}) Tj ET" if text else ""
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>"
+        )
+        page_ids.append(len(objects))
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(f'{i} 0 R' for i in page_ids)}] /Count {len(page_ids)} >>"
+
+    data = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(data))
+        data += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(data)
+    data += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    data += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode("latin-1")
+    data += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+@pytest.fixture
+def make_pdf():
+    """Function writing a PDF with the given page texts."""
+    return write_pdf
+
+
+@pytest.fixture(params=[False, True], ids=["single", "sharded"])
+def pipeline(request, tmp_path):
+    """Pipeline on temporary directories with hash embeddings, unsharded and sharded."""
+    pipeline = RAGPipeline(
+        pdf_directory=str(tmp_path / "pdfs"),
+        vector_store_dir=str(tmp_path / "chroma"),
+        cache_dir=str(tmp_path / "cache"),
+        sharded=request.param
+    )
+    pipeline.vector_store.embedding_function.embeddings = HashEmbeddings()
+    (tmp_path / "pdfs").mkdir()
+    return pipeline
+
+
+class FakeOllamaServer:
+    """
+    The Ollama stand-in of the benchmarks, served on a free local port.
+    """
+
+    def __init__(self):
+        args = argparse.Namespace(
+            parallel=4, load_seconds=0, prefill_ms_per_kchar=0, tokens_per_second=1000, dim=EMBEDDING_DIM
+        )
+        self.state = FakeOllama(args)
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(self.state))
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stats(self):
+        with urllib.request.urlopen(f"{self.url}/fake/stats") as response:
+            return json.loads(response.read())
+
+
+@pytest.fixture
+def fake_ollama():
+    """Ollama stand-in that counts requests and model loads."""
+    server = FakeOllamaServer()
+    yield server
+    server.server.shutdown()
+    server.server.server_close()
+
+
+@pytest.fixture
+def served_pipeline(tmp_path, fake_ollama):
+    """Pipeline with one ingested Akte whose models are served by the Ollama stand-in."""
+    (tmp_path / "pdfs").mkdir()
+    write_pdf(str(tmp_path / "pdfs" / "akte.pdf"), [f"Seite {i} der Akte zum Unfall" for i in range(12)])
+    pipeline = RAGPipeline(
+        pdf_directory=str(tmp_path / "pdfs"),
+        vector_store_dir=str(tmp_path / "chroma"),
+        cache_dir=str(tmp_path / "cache"),
+        embedding_model="embed",
+        llm_model="llm",
+        llm_pool=OllamaPool([fake_ollama.url]),
+        embedding_pool=OllamaPool([fake_ollama.url])
+    )
+    pipeline.ingest_documents(store_full_docs=False)
+    return pipeline
@@ -0,0 +1,72 @@
+"""
+Tests for the incremental, manifest-based ingestion.
+"""
+import os
+
+from rag.manifest import IngestManifest
+
+
+def manifest_of(pipeline):
+    return IngestManifest(os.path.join(pipeline.vector_store_dir, "ingest_manifest.json"))
+
+
+def test_unchanged_files_are_skipped(pipeline, make_pdf, monkeypatch):
+    pdf_dir = pipeline.pdf_directory
+    make_pdf(os.path.join(pdf_dir, "a.pdf"), ["Unfall auf der Hauptstrasse", "Gutachten zum Schaden"])
+    make_pdf(os.path.join(pdf_dir, "b.pdf"), ["Zeugenaussage des Fahrers"])
+
+    assert pipeline.ingest_documents(store_full_docs=False) == {}
+    assert pipeline.vector_store.count() == 3
+
+    parsed = []
+    process_files = pipeline.pdf_processor.process_files
+    monkeypatch.setattr(
+        pipeline.pdf_processor,
+        "process_files",
+        lambda paths, workers=1: parsed.extend(paths) or process_files(paths, workers)
+    )
+
+    # Touching a file without changing it does not parse it again
+    os.utime(os.path.join(pdf_dir, "a.pdf"), (1, 1))
+    pipeline.ingest_documents(store_full_docs=False)
+    assert parsed == []
+    assert manifest_of(pipeline).files["a.pdf"]["mtime"] == 1
+
+    # Only the changed file is parsed, and its old chunks are replaced
+    make_pdf(os.path.join(pdf_dir, "b.pdf"), ["Neue Zeugenaussage", "Nachtrag der Polizei"])
+    pipeline.ingest_documents(store_full_docs=False)
+    assert parsed == [os.path.join(pdf_dir, "b.pdf")]
+    assert pipeline.vector_store.count() == 4
+    assert pipeline.vector_store.lexical_index.count() == 4
+
+
+def test_removed_file_drops_its_chunks(pipeline, make_pdf):
+    pdf_dir = pipeline.pdf_directory
+    make_pdf(os.path.join(pdf_dir, "a.pdf"), ["Unfall auf der Hauptstrasse"])
+    make_pdf(os.path.join(pdf_dir, "b.pdf"), ["Zeugenaussage des Fahrers"])
+    pipeline.ingest_documents(store_full_docs=False)
+
+    os.remove(os.path.join(pdf_dir, "b.pdf"))
+    pipeline.ingest_documents(store_full_docs=False)
+
+    assert pipeline.vector_store.count() == 1
+    assert pipeline.vector_store.lexical_index.count() == 1
+    assert list(manifest_of(pipeline).files) == ["a.pdf"]
+
+
+def test_file_without_chunks_replaces_old_chunks(pipeline, make_pdf):
+    pdf_path = os.path.join(pipeline.pdf_directory, "a.pdf")
+    make_pdf(pdf_path, ["Unfall auf der Hauptstrasse", "Gutachten zum Schaden"])
+    pipeline.ingest_documents(store_full_docs=False)
+    assert pipeline.vector_store.count() == 2
+
+    # A new version without any text, e.g. a scan, produces no chunks
+    make_pdf(pdf_path, ["", ""])
+    assert pipeline.ingest_documents(store_full_docs=False) == {}
+
+    assert pipeline.vector_store.count() == 0
+    assert pipeline.vector_store.lexical_index.count() == 0
+    assert pipeline.vector_store.lexical_index.search("Unfall", 8) == []
+    entry = manifest_of(pipeline).files["a.pdf"]
+    assert entry["chunk_ids"] == []
+    assert entry["sha256"] == pipeline.pdf_processor.content_hash(pdf_path)
@@ -0,0 +1,122 @@
+"""
+Tests for the persistent jobs and their replayable event streams.
+"""
+import asyncio
+import threading
+import time
+
+from rag.jobs import JobStore, JobManager, COMPLETED, PROCESSING
+
+
+def test_single_chunk_is_written_within_the_flush_interval(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    release = threading.Event()
+
+    def handler(job, emit):
+        emit({"status": "streaming", "chunk": "Erster"})
+        # The generation stalls, e.g. while the next prompt is evaluated
+        release.wait(5)
+        return {}
+
+    manager = JobManager(store, handler, flush_interval=0.1)
+    manager.start()
+    manager.submit("job", {})
+    try:
+        deadline = time.monotonic() + 1.0
+        while not store.events("job") and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert [event.get("chunk") for event in store.events("job")] == ["Erster"]
+        assert time.monotonic() < deadline
+        assert store.get("job")["status"] == PROCESSING
+    finally:
+        release.set()
+
+
+def test_chunks_are_written_in_few_transactions_and_in_order(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    writes = []
+    append_events = store.append_events
+    store.append_events = lambda job_id, events, replace=False: writes.append(len(events)) or append_events(
+        job_id, events, replace
+    )
+
+    def handler(job, emit):
+        emit({"status": "started"})
+        for i in range(200):
+            emit({"status": "streaming", "chunk": str(i)})
+        emit({"status": "completed"})
+        return {}
+
+    manager = JobManager(store, handler, flush_interval=10, max_buffered=64)
+    manager.start()
+    manager.submit("job", {})
+    events = list(manager.stream("job", poll_interval=0.05))
+
+    assert [event["event_id"] for event in events] == list(range(202))
+    assert [event["chunk"] for event in events[1:-1]] == [str(i) for i in range(200)]
+    assert len(writes) < 10
+
+
+def test_stream_replays_from_an_offset(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    store.create("job", {})
+    store.append_events("job", [{"status": "started"}, {"status": "streaming", "chunk": "a"}])
+    store.append_event("job", {"status": "completed"})
+    store.update("job", status=COMPLETED)
+
+    manager = JobManager(store, lambda job, emit: {})
+    assert [event["event_id"] for event in manager.stream("job")] == [0, 1, 2]
+    assert [event["status"] for event in manager.stream("job", offset=2)] == ["completed"]
+    assert list(manager.stream("job", offset=3)) == []
+
+
+def test_resumed_job_replaces_the_events_of_the_interrupted_run(tmp_path):
+    db_path = str(tmp_path / "jobs.sqlite3")
+    store = JobStore(db_path)
+    store.create("job", {})
+    store.update("job", status=PROCESSING)
+    store.append_events("job", [{"status": "started"}, {"status": "streaming", "chunk": "halb"}])
+
+    # The server restarts and runs the job again from the start
+    def handler(job, emit):
+        emit({"status": "streaming", "chunk": "ganz"})
+        return {}
+
+    manager = JobManager(JobStore(db_path), handler)
+    manager.start()
+    events = list(manager.stream("job", poll_interval=0.05))
+
+    assert [event["status"] for event in events] == ["resumed", "streaming"]
+    assert [event.get("chunk") for event in events] == [None, "ganz"]
+    # Numbering continues, so a client at offset 2 of the old run gets the new run
+    assert [event["event_id"] for event in events] == [2, 3]
+    assert [event["event_id"] for event in manager.stream("job", offset=2)] == [2, 3]
+
+
+def test_async_stream_reads_the_store_off_the_event_loop(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    store.create("job", {})
+    store.append_event("job", {"status": "completed"})
+    store.update("job", status=COMPLETED)
+    get = store.get
+    # A slow read, e.g. while a writer holds the database
+    store.get = lambda job_id: time.sleep(0.3) or get(job_id)
+    manager = JobManager(store, lambda job, emit: {})
+
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        events = [event async for event in manager.astream("job")]
+        task.cancel()
+        return events, ticks
+
+    events, ticks = asyncio.run(main())
+    assert [event["status"] for event in events] == ["completed"]
+    assert ticks >= 10
@@ -0,0 +1,54 @@
+"""
+Tests for answering queries with the sync and async query graphs.
+"""
+import asyncio
+
+from benchmarks.fake_ollama import ANSWER_WORDS
+
+
+def test_sync_and_async_queries_yield_the_same_events(served_pipeline):
+    async def collect():
+        return [event async for event in served_pipeline.astream_query("Wie kam es zum Unfall?", "akte.pdf")]
+
+    for events in (list(served_pipeline.stream_query("Wie kam es zum Unfall?", "akte.pdf")), asyncio.run(collect())):
+        assert events[0]["status"] == "retrieved"
+        assert {document.metadata["source"] for document in events[0]["documents"]} == {"akte.pdf"}
+        assert {event["status"] for event in events[1:-1]} == {"streaming"}
+        assert events[-1] == {"status": "completed", "answer": "".join(event["chunk"] for event in events[1:-1])}
+        assert events[-1]["answer"].split() == ANSWER_WORDS
+
+
+def test_query_and_aquery_return_the_answer(served_pipeline):
+    answer = " ".join(ANSWER_WORDS) + " "
+    assert served_pipeline.query("Wie kam es zum Unfall?") == answer
+    assert served_pipeline.query("Wie kam es zum Unfall?", stream=True) == answer
+
+    # The async Ollama client stays bound to the event loop of its first request
+    async def ask():
+        return [
+            await served_pipeline.aquery("Wie kam es zum Unfall?"),
+            await served_pipeline.aquery("Wie kam es zum Unfall?", stream=True)
+        ]
+
+    assert asyncio.run(ask()) == [answer, answer]
+
+
+def test_failed_generation_yields_an_error_and_the_fallback_answer(served_pipeline, monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError("model crashed")
+        yield
+
+    async def afail(*args, **kwargs):
+        raise RuntimeError("model crashed")
+        yield
+
+    monkeypatch.setattr(served_pipeline.ollama_llm, "stream_documents_answer", fail)
+    monkeypatch.setattr(served_pipeline.ollama_llm, "astream_documents_answer", afail)
+
+    async def collect():
+        return [event async for event in served_pipeline.astream_query("Wie kam es zum Unfall?")]
+
+    for events in (list(served_pipeline.stream_query("Wie kam es zum Unfall?")), asyncio.run(collect())):
+        assert [event["status"] for event in events] == ["retrieved", "error", "completed"]
+        assert events[1]["error"] == "model crashed"
+        assert events[2]["answer"] == "Sorry, I couldn't generate an answer due to an error."
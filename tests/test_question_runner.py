@@ -0,0 +1,80 @@
+"""
+Tests for answering the questions of an upload job.
+"""
+from langchain_core.documents import Document
+
+from rag.answer_cache import AnswerCache
+from rag.llm import OllamaWrapper
+from rag.ollama_pool import OllamaPool
+from rag.question_runner import QuestionRunner
+
+QUESTIONS = ["Bitte fasse die Akte zusammen", "Wer war beteiligt?", "Wie hoch ist der Schaden?"]
+
+
+def job_contexts(llm):
+    """A long shared context and small contexts of their own for two questions."""
+    pages = [
+        Document(page_content=f"Seite {i}: " + "Unfallhergang und Zeugenaussage. " * 400, metadata={"page": i})
+        for i in range(8)
+    ]
+    own = {
+        question: {"context": llm.format_context(pages[:1]), "context_tokens": llm.count_context_tokens(pages[:1])}
+        for question in QUESTIONS[1:]
+    }
+    return llm.format_context(pages), llm.count_context_tokens(pages), own
+
+
+def run_job(runner, llm):
+    context, context_tokens, own = job_contexts(llm)
+    answers = {}
+    events = list(runner.run(context, "hash", QUESTIONS, answers, context_tokens, own))
+    assert [event["status"] for event in events if event.get("status") in ("completed", "error")] == ["completed"] * 3
+    return answers
+
+
+def test_questions_of_a_job_share_one_context_window(fake_ollama):
+    llm = OllamaWrapper(model_name="test", pool=OllamaPool([fake_ollama.url]), coalesce=False)
+    runner = QuestionRunner(llm)
+    context, context_tokens, own = job_contexts(llm)
+
+    # The small contexts alone would fit into a smaller window
+    num_ctx = runner.select_num_ctx(QUESTIONS, context_tokens, own)
+    assert num_ctx == llm.select_num_ctx(llm.count_prompt_tokens(context_tokens, QUESTIONS[0], QUESTIONS[0]))
+    assert llm.select_num_ctx(llm.count_prompt_tokens(own[QUESTIONS[1]]["context_tokens"], QUESTIONS[1])) < num_ctx
+
+    # The first request loads the model; the rest of the job and the next job reuse it
+    run_job(runner, llm)
+    assert fake_ollama.stats()["loads"] == 1
+    run_job(QuestionRunner(llm, concurrency=3), llm)
+    stats = fake_ollama.stats()
+    assert stats["requests"] == 6
+    assert stats["loads"] == 1
+
+
+def test_questions_answered_without_llm_do_not_size_the_window():
+    llm = OllamaWrapper(model_name="test", coalesce=False)
+    runner = QuestionRunner(llm)
+    _, context_tokens, own = job_contexts(llm)
+    own[QUESTIONS[0]] = {"answer": "Nein."}
+
+    assert runner.select_num_ctx(QUESTIONS, context_tokens, own) == llm.select_num_ctx(
+        llm.count_prompt_tokens(own[QUESTIONS[1]]["context_tokens"], QUESTIONS[1], QUESTIONS[1])
+    )
+    assert runner.select_num_ctx(QUESTIONS[:1], context_tokens, own) is None
+
+
+def test_cached_answers_are_keyed_on_the_context_window_used(fake_ollama, tmp_path):
+    cache = AnswerCache(str(tmp_path / "answers.sqlite3"))
+    llm = OllamaWrapper(model_name="test", pool=OllamaPool([fake_ollama.url]), coalesce=False)
+    run_job(QuestionRunner(llm, answer_cache=cache), llm)
+
+    # A lower maximum that still fits the job's prompts replays the answers
+    smaller = OllamaWrapper(model_name="test", num_ctx=65536, pool=OllamaPool([fake_ollama.url]), coalesce=False)
+    context, context_tokens, own = job_contexts(smaller)
+    events = list(QuestionRunner(smaller, answer_cache=cache).run(context, "hash", QUESTIONS, {}, context_tokens, own))
+    assert [event.get("cached") for event in events if event["status"] == "completed"] == [True] * 3
+
+    # A job run with another context window generates its answers again
+    events = list(QuestionRunner(llm, answer_cache=cache).run(context, "hash", QUESTIONS, {}, context_tokens, own, 98304))
+    assert [event.get("cached") for event in events if event["status"] == "completed"] == [None] * 3
+    assert fake_ollama.stats()["requests"] == 6
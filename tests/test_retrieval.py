@@ -0,0 +1,52 @@
+"""
+Tests for the scoped vector, hybrid and MMR searches.
+"""
+import os
+
+import pytest
+
+from rag.hybrid import reciprocal_rank_fusion
+from rag.mmr import maximal_marginal_relevance
+
+
+@pytest.fixture
+def two_akten(pipeline, make_pdf):
+    # Both Akten mention the Aktenzeichen, only b.pdf on every page
+    make_pdf(os.path.join(pipeline.pdf_directory, "a.pdf"), ["Unfall Hauptstrasse Az 12 O 345", "Gutachten Schaden"])
+    make_pdf(
+        os.path.join(pipeline.pdf_directory, "b.pdf"),
+        ["Az 12 O 345 Zeugenaussage", "Az 12 O 345 Nachtrag", "Az 12 O 345 Polizei"]
+    )
+    pipeline.ingest_documents(store_full_docs=False)
+    return pipeline.vector_store
+
+
+def test_fusion_ranks_ids_found_by_both_rankings_first():
+    assert reciprocal_rank_fusion([["a", "b", "c"], ["c", "d"]]) == ["c", "a", "b", "d"]
+    assert reciprocal_rank_fusion([[], ["x"]]) == ["x"]
+
+
+@pytest.mark.parametrize("mode", ["vector", "hybrid", "mmr"])
+def test_scoped_search_only_returns_the_akte_in_scope(two_akten, mode):
+    documents = two_akten.search("Az 12 O 345", mode=mode, k=5, source="a.pdf", fetch_k=10)
+    assert documents
+    assert {document.metadata["source"] for document in documents} == {"a.pdf"}
+
+
+def test_hybrid_search_finds_lexical_hits_of_all_akten_unscoped(two_akten):
+    documents = two_akten.search("Az 12 O 345", mode="hybrid", k=10, fetch_k=10)
+    assert {document.metadata["source"] for document in documents} == {"a.pdf", "b.pdf"}
+
+
+def test_hybrid_search_applies_the_filter_to_lexical_hits(two_akten):
+    documents = two_akten.search("Az 12 O 345", mode="hybrid", k=10, fetch_k=10, filter={"page": 0})
+    assert documents
+    assert {document.metadata["page"] for document in documents} == {0}
+
+
+def test_mmr_skips_near_duplicates():
+    query = [1.0, 0.2]
+    candidates = [[1.0, 0.0], [1.0, 0.01], [0.0, 1.0]]
+    assert maximal_marginal_relevance(query, candidates, 2, lambda_mult=0.5) == [1, 2]
+    assert maximal_marginal_relevance(query, candidates, 2, lambda_mult=1.0) == [1, 0]
+    assert maximal_marginal_relevance(query, [], 2) == []
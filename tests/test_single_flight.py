@@ -0,0 +1,121 @@
+"""
+Tests for sharing identical LLM generations between concurrent requests.
+"""
+import asyncio
+import threading
+
+import pytest
+
+from rag.single_flight import SingleFlight
+
+
+class Generation:
+    """Generation whose chunks are released one by one by the test."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.produced = []
+        self.release = threading.Semaphore(0)
+        self.closed = threading.Event()
+
+    def __call__(self):
+        try:
+            for chunk in self.chunks:
+                assert self.release.acquire(timeout=5)
+                self.produced.append(chunk)
+                yield chunk
+        finally:
+            self.closed.set()
+
+    async def agenerate(self):
+        try:
+            for chunk in self.chunks:
+                while not self.release.acquire(blocking=False):
+                    await asyncio.sleep(0.001)
+                self.produced.append(chunk)
+                yield chunk
+        finally:
+            self.closed.set()
+
+
+def test_late_subscriber_receives_the_whole_stream():
+    flights = SingleFlight()
+    generation = Generation(["a", "b", "c"])
+    first = flights.stream("key", generation)
+
+    generation.release.release()
+    assert next(first) == "a"
+    second = flights.stream("key", lambda: pytest.fail("a second generation was started"))
+    generation.release.release(2)
+
+    assert "".join(second) == "abc"
+    assert "".join(first) == "bc"
+    assert flights.stats() == {"generations": 1, "coalesced": 1, "in_flight": 0}
+
+
+def test_abandoned_generation_is_stopped_and_forgotten():
+    flights = SingleFlight()
+    generation = Generation(["a", "b", "c", "d"])
+    stream = flights.stream("key", generation)
+
+    generation.release.release()
+    assert next(stream) == "a"
+    stream.close()
+
+    # The generation stops after its next chunk instead of running to the end
+    generation.release.release(3)
+    assert generation.closed.wait(5)
+    assert generation.produced == ["a", "b"]
+    assert flights.stats()["in_flight"] == 0
+
+    # A later identical request starts a new generation
+    again = Generation(["x"])
+    again.release.release()
+    assert list(flights.stream("key", again)) == ["x"]
+    assert flights.stats()["generations"] == 2
+
+
+def test_generation_continues_while_a_subscriber_remains():
+    flights = SingleFlight()
+    generation = Generation(["a", "b", "c"])
+    first = flights.stream("key", generation)
+    generation.release.release()
+    assert next(first) == "a"
+    second = flights.stream("key", generation)
+    assert next(second) == "a"
+
+    first.close()
+    generation.release.release(2)
+    assert list(second) == ["b", "c"]
+    assert generation.produced == ["a", "b", "c"]
+
+
+def test_errors_reach_every_subscriber():
+    flights = SingleFlight()
+
+    def failing():
+        yield "a"
+        raise RuntimeError("model crashed")
+
+    with pytest.raises(RuntimeError, match="model crashed"):
+        list(flights.stream("key", failing))
+    assert flights.stats()["in_flight"] == 0
+
+
+def test_abandoned_async_generation_is_closed():
+    flights = SingleFlight()
+    generation = Generation(["a", "b", "c", "d"])
+
+    async def main():
+        stream = flights.astream("key", generation.agenerate)
+        generation.release.release()
+        assert await stream.__anext__() == "a"
+        await stream.aclose()
+
+        generation.release.release(3)
+        while not generation.closed.is_set():
+            await asyncio.sleep(0.001)
+
+    asyncio.run(asyncio.wait_for(main(), 5))
+    assert generation.produced == ["a", "b"]
+    assert flights.stats()["in_flight"] == 0
@@ -0,0 +1,58 @@
+"""
+Tests for loading the models before the first request.
+"""
+import pytest
+from ollama import Client
+
+from rag.warmup import ModelWarmup
+
+
+@pytest.fixture
+def warm_pipeline(served_pipeline, fake_ollama):
+    """Served pipeline whose models are loaded."""
+    pipeline = served_pipeline
+    warmup = ModelWarmup(pipeline.ollama_llm, pipeline.vector_store, num_ctx=pipeline.retrieval_num_ctx())
+    warmup.warm_up()
+    assert warmup.ready.is_set()
+    assert fake_ollama.stats()["loads"] == 2
+    return pipeline, warmup
+
+
+def test_queries_use_the_warmed_up_context_window(warm_pipeline, fake_ollama):
+    pipeline, _ = warm_pipeline
+
+    pipeline.query("Wie kam es zum Unfall?")
+    pipeline.query("Welche Seite nennt den Schaden?", source="akte.pdf")
+    stats = fake_ollama.stats()
+    assert stats["requests"] == 2
+    assert stats["loads"] == 2
+
+
+def test_refresh_reloads_a_model_with_another_context_window(warm_pipeline, fake_ollama):
+    pipeline, warmup = warm_pipeline
+    assert warmup.refresh() == {}
+
+    # Another client loads the LLM with a different context window
+    Client(host=fake_ollama.url).generate(model="llm", prompt="", options={"num_ctx": 4096})
+    assert warmup.refresh().keys() == {"llm"}
+    assert warmup.ready.is_set()
+    assert fake_ollama.state.loaded["llm"] == pipeline.retrieval_num_ctx()
+
+    # A request of this process with another window becomes the one kept loaded
+    pipeline.ollama_llm.invoke("Kurze Frage", num_ctx=8192)
+    assert warmup.refresh() == {}
+    assert warmup.stats()["reloads"] == 1
+
+
+def test_refresh_reports_not_ready_until_unloaded_models_are_back(warm_pipeline, fake_ollama):
+    _, warmup = warm_pipeline
+    fake_ollama.state.reset()
+    fake_ollama.state.args.load_seconds = 0.2
+
+    ready_during_reload = []
+    load = warmup.load_llm
+    warmup.load_llm = lambda host: ready_during_reload.append(warmup.ready.is_set()) or load(host)
+
+    assert warmup.refresh().keys() == {"llm", "embed"}
+    assert ready_during_reload == [False]
+    assert warmup.ready.is_set()
@@ -12,8 +12,14 @@ from dotenv import load_dotenv
 from werkzeug.utils import secure_filename
 
 from rag.pipeline import RAGPipeline
-from rag.document_loader import PDFProcessor
-from rag.llm import OllamaLLM
+from rag.answer_cache import AnswerCache
+from rag.question_runner import QuestionRunner
+from rag.jobs import JobStore, JobManager, COMPLETED, FAILED
+from rag.retention import RetentionSweeper
+from rag.context_selector import ContextSelector, FULL_CONTEXT, KEYWORD_CONTEXT
+from rag.term_index import load_term_groups, pages_matching, has_text_layer
+from rag.warmup import ModelWarmup
+from rag.ollama_pool import OllamaPool, parse_hosts
 
 # Load environment variables
 load_dotenv()
@@ -22,8 +28,33 @@ load_dotenv()
 PDF_DIR = os.getenv('PDF_DIR', 'data/pdfs')
 UPLOAD_DIR = os.getenv('UPLOAD_DIR', 'data/uploads')
 VECTOR_STORE_DIR = os.getenv('VECTOR_STORE_DIR', 'data/chroma')
+CACHE_DIR = os.getenv('CACHE_DIR', 'data/cache')
 EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', 'jina/jina-embeddings-v2-base-de')
 LLM_MODEL = os.getenv('LLM_MODEL', 'qwq:32b')
+PROMPT_LAYOUT = os.getenv('PROMPT_LAYOUT', 'context_first')
+LLM_KEEP_ALIVE = os.getenv('LLM_KEEP_ALIVE', '30m')
+EMBEDDING_KEEP_ALIVE = os.getenv('EMBEDDING_KEEP_ALIVE', '30m')
+MODEL_WARMUP = os.getenv('MODEL_WARMUP', 'true').lower() == 'true'
+WARMUP_NUM_CTX = int(os.getenv('WARMUP_NUM_CTX', '0'))
+MODEL_REFRESH_MINUTES = float(os.getenv('MODEL_REFRESH_MINUTES', '0'))
+WARMUP_WAIT_SECONDS = float(os.getenv('WARMUP_WAIT_SECONDS', '600'))
+OLLAMA_LLM_HOSTS = os.getenv('OLLAMA_LLM_HOSTS', '')
+OLLAMA_EMBEDDING_HOSTS = os.getenv('OLLAMA_EMBEDDING_HOSTS', '') or OLLAMA_LLM_HOSTS
+OLLAMA_STICKY_SLACK = int(os.getenv('OLLAMA_STICKY_SLACK', '1'))
+OLLAMA_HEALTH_SECONDS = float(os.getenv('OLLAMA_HEALTH_SECONDS', '15'))
+LLM_COALESCE = os.getenv('LLM_COALESCE', 'true').lower() == 'true'
+LLM_NUM_CTX = int(os.getenv('LLM_NUM_CTX', '98304'))
+LLM_CONTEXT_BUCKETS = [int(size) for size in os.getenv('LLM_CONTEXT_BUCKETS', '4096,8192,16384,32768,65536,98304').split(',') if size.strip()]
+QUESTION_CONCURRENCY = int(os.getenv('QUESTION_CONCURRENCY', '1'))
+MAP_CONCURRENCY = int(os.getenv('MAP_CONCURRENCY', '1'))
+QUESTION_CONTEXT = os.getenv('QUESTION_CONTEXT', 'full,full,full,keywords,retrieve')
+TERM_GROUPS_FILE = os.getenv('TERM_GROUPS_FILE', '')
+CONTEXT_TOP_K = int(os.getenv('CONTEXT_TOP_K', '6'))
+JOB_DB = os.getenv('JOB_DB', 'data/jobs.sqlite3')
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '1'))
+RETENTION_TTL_HOURS = float(os.getenv('RETENTION_TTL_HOURS', '168'))
+RETENTION_MAX_MB = int(os.getenv('RETENTION_MAX_MB', '2048'))
+RETENTION_INTERVAL_MINUTES = float(os.getenv('RETENTION_INTERVAL_MINUTES', '10'))
 WEB_HOST = os.getenv('WEB_HOST', '0.0.0.0')
 WEB_PORT = int(os.getenv('WEB_PORT', '5001'))
 WEB_DEBUG = os.getenv('WEB_DEBUG', 'true').lower() == 'true'
@@ -49,12 +80,75 @@ DEFAULT_QUESTIONS = [
     "Bitte beantworte kurz und knapp wer der Schuldige in dem Fall war und wie hoch der Schaden ist"
 ]
 
+# Context strategy per default question (full document, retrieved or keyword-selected pages);
+# other questions always get the full document
+QUESTION_STRATEGIES = dict(zip(DEFAULT_QUESTIONS, [strategy.strip() for strategy in QUESTION_CONTEXT.split(',')]))
+
+# Term groups of the page index whose pages the "keywords" strategy sends
+QUESTION_TERM_GROUPS = {
+    DEFAULT_QUESTIONS[2]: ["phone", "email", "address"],
+    DEFAULT_QUESTIONS[3]: ["alcohol", "drugs", "medication", "hit_and_run"],
+    DEFAULT_QUESTIONS[4]: ["fault_damage"]
+}
+
+# Screening questions answered without the LLM when no page of a text PDF matches their terms
+NO_EVIDENCE_ANSWERS = {
+    DEFAULT_QUESTIONS[3]: (
+        "Nein. In der Akte wurden keine Hinweise auf Drogen, Alkohol, Medikamente "
+        "oder Fahrerflucht gefunden (kein Treffer in der Stichwortsuche)."
+    )
+}
+
+# Route LLM and embedding requests over the configured Ollama hosts
+llm_pool = OllamaPool(
+    parse_hosts(OLLAMA_LLM_HOSTS),
+    sticky_slack=OLLAMA_STICKY_SLACK,
+    health_interval_seconds=OLLAMA_HEALTH_SECONDS
+)
+embedding_pool = OllamaPool(
+    parse_hosts(OLLAMA_EMBEDDING_HOSTS),
+    sticky_slack=OLLAMA_STICKY_SLACK,
+    health_interval_seconds=OLLAMA_HEALTH_SECONDS
+)
+
 # Initialize the pipeline
 pipeline = RAGPipeline(
     pdf_directory=PDF_DIR,
     vector_store_dir=VECTOR_STORE_DIR,
     embedding_model=EMBEDDING_MODEL,
-    llm_model=LLM_MODEL
+    llm_model=LLM_MODEL,
+    cache_dir=CACHE_DIR,
+    prompt_layout=PROMPT_LAYOUT,
+    keep_alive=LLM_KEEP_ALIVE,
+    embedding_keep_alive=EMBEDDING_KEEP_ALIVE,
+    num_ctx=LLM_NUM_CTX,
+    context_buckets=LLM_CONTEXT_BUCKETS or None,
+    map_concurrency=MAP_CONCURRENCY,
+    term_groups=load_term_groups(TERM_GROUPS_FILE or None),
+    llm_pool=llm_pool,
+    embedding_pool=embedding_pool,
+    coalesce_llm_requests=LLM_COALESCE
+)
+
+# Load both models before the first request and report when they are hot
+model_warmup = ModelWarmup(
+    pipeline.ollama_llm,
+    pipeline.vector_store,
+    num_ctx=WARMUP_NUM_CTX or pipeline.retrieval_num_ctx(),
+    refresh_seconds=MODEL_REFRESH_MINUTES * 60
+)
+
+# Select the pages sent with narrow questions
+context_selector = ContextSelector(pipeline.vector_store, top_k=CONTEXT_TOP_K)
+
+# Cache answers per (PDF content, question, prompt, model settings)
+answer_cache = AnswerCache(os.path.join(CACHE_DIR, "answers.sqlite3"))
+
+# Answer the questions of a job, up to QUESTION_CONCURRENCY at the same time
+question_runner = QuestionRunner(
+    pipeline.ollama_llm,
+    answer_cache=answer_cache,
+    concurrency=QUESTION_CONCURRENCY
 )
 
 # Helper functions
@@ -68,8 +162,7 @@ def generate_answers(pdf_path, questions=None):
         questions = DEFAULT_QUESTIONS
     
     # Process the PDF
-    pdf_processor = PDFProcessor()
-    document = pdf_processor.load_single_document(pdf_path)
+    document = pipeline.pdf_processor.load_single_document(pdf_path)
     
     if not document:
         return {"error": "Failed to process PDF"}
@@ -202,6 +295,193 @@ def clean_output(text):
     
     return text
 
+def query_event_payload(event):
+    """
+    Convert a query event into its JSON payload.
+    
+    Args:
+        event: Event of RAGPipeline.stream_query or astream_query
+    
+    Returns:
+        The event, with retrieved documents replaced by their source and page
+    """
+    if event['status'] != 'retrieved':
+        return event
+    
+    # Send where the context came from instead of the chunks themselves
+    return {
+        'status': 'retrieved',
+        'sources': [
+            {'source': doc.metadata.get('source'), 'page': doc.metadata.get('page')}
+            for doc in event['documents']
+        ]
+    }
+
+def process_upload(job, emit):
+    """
+    Answer the questions of an uploaded PDF and write the export files.
+    
+    Runs on a job worker thread. Progress is reported through emit in the
+    NDJSON event format the web page reads.
+    
+    Args:
+        job: Job fields (filepath, filename, unique_filename, questions)
+        emit: Function storing one progress event
+    
+    Returns:
+        Job fields to store: status, answers and export filenames
+    """
+    # Process the PDF once (reuses the parsed pages of identical uploads)
+    document = pipeline.pdf_processor.load_single_document(job['filepath'])
+    
+    if not document:
+        emit({"error": "Failed to process PDF"})
+        return {"status": FAILED, "error": "Failed to process PDF"}
+    
+    all_answers = {}
+    content_hash = pipeline.pdf_processor.content_hash(job['filepath'])
+    
+    # Pre-process document once to format it (instead of doing it for each question)
+    context = pipeline.ollama_llm.format_context([document])
+    context_tokens = pipeline.ollama_llm.count_context_tokens([document])
+    
+    # Parsing overlaps with the warm-up; the models are only used once they are hot
+    if not model_warmup.wait(WARMUP_WAIT_SECONDS):
+        reason = model_warmup.stats()['error'] or "timed out"
+        error = f"The models could not be loaded within {WARMUP_WAIT_SECONDS:.0f} seconds ({reason})"
+        emit({"error": error})
+        return {"status": FAILED, "error": error}
+    
+    # Narrow questions only get the pages selected by their context strategy
+    question_contexts = {}
+    full_questions = []
+    pages = None
+    page_terms = None
+    for question in job['questions']:
+        strategy = QUESTION_STRATEGIES.get(question, FULL_CONTEXT)
+        if strategy == FULL_CONTEXT:
+            full_questions.append(question)
+            continue
+        
+        # Look up the pages hit by the question's screening terms (indexed at parse time)
+        term_pages = None
+        if strategy == KEYWORD_CONTEXT and question in QUESTION_TERM_GROUPS:
+            if page_terms is None:
+                page_terms = pipeline.pdf_processor.page_terms(job['filepath'])
+            term_pages = pages_matching(page_terms, QUESTION_TERM_GROUPS[question])
+            if not term_pages and question in NO_EVIDENCE_ANSWERS:
+                if pages is None:
+                    pages = pipeline.pdf_processor.load_full_document(job['filepath'])
+                # Scanned pages without text can hide the terms; let the LLM look at them
+                if has_text_layer(pages):
+                    question_contexts[question] = {"answer": NO_EVIDENCE_ANSWERS[question]}
+                    print(f"No screening terms found, skipping the LLM for: {question}")
+                    continue
+                print(f"Too little extracted text to rule out screening terms for: {question}")
+        
+        if pages is None:
+            pages = pipeline.pdf_processor.load_full_document(job['filepath'])
+        selected = context_selector.select(pages, question, strategy, term_pages)
+        if len(selected) == len(pages):
+            full_questions.append(question)
+            continue
+        
+        question_contexts[question] = {
+            "context": pipeline.ollama_llm.format_context(selected),
+            "context_tokens": pipeline.ollama_llm.count_context_tokens(selected)
+        }
+        print(f"Using {len(selected)} of {len(pages)} pages ({strategy}) for: {question}")
+    
+    # Condense an Akte that exceeds the context window into notes shared by the full-context questions
+    if full_questions and not pipeline.map_reducer.fits(context_tokens, full_questions):
+        notes = pipeline.map_reducer.condense(
+            pipeline.pdf_processor.load_full_document(job['filepath']),
+            content_hash,
+            full_questions,
+            progress=lambda message: emit({"status": "condensing", "message": message})
+        )
+        context = pipeline.ollama_llm.format_context(notes)
+        context_tokens = pipeline.ollama_llm.count_context_tokens(notes)
+    
+    # Generate answers for each question incrementally
+    for event in question_runner.run(
+        context, content_hash, job['questions'], all_answers, context_tokens, question_contexts
+    ):
+        emit(event)
+    
+    # After all questions are processed, create the markdown and text files
+    base_filename = job['unique_filename'].rsplit('.', 1)[0]
+    md_filename = ''
+    txt_filename = ''
+    try:
+        # Ensure the upload directory exists
+        os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+        
+        # Create markdown file
+        md_content = format_as_markdown(job['filename'], all_answers)
+        with open(os.path.join(app.config['UPLOAD_FOLDER'], f"{base_filename}.md"), 'w', encoding='utf-8') as f:
+            f.write(md_content)
+        md_filename = f"{base_filename}.md"
+        
+        # Create text file
+        txt_content = format_as_text(job['filename'], all_answers)
+        with open(os.path.join(app.config['UPLOAD_FOLDER'], f"{base_filename}.txt"), 'w', encoding='utf-8') as f:
+            f.write(txt_content)
+        txt_filename = f"{base_filename}.txt"
+        
+        # Send completion message
+        emit({
+            "completed": True,
+            "md_filename": md_filename,
+            "txt_filename": txt_filename
+        })
+        print(f"Job {job['id']} completed successfully")
+        
+    except Exception as e:
+        print(f"Error in file generation phase: {str(e)}")
+        emit({"error": f"Error generating output files: {str(e)}"})
+        
+        # Even if we have an error, send a completion message with any files we did manage to create
+        if md_filename or txt_filename:
+            emit({
+                "completed": True,
+                "md_filename": md_filename,
+                "txt_filename": txt_filename,
+                "partial": True  # Flag that this is a partial completion
+            })
+            print(f"Job {job['id']} completed partially with some errors")
+    
+    return {
+        "answers": all_answers,
+        "md_filename": md_filename,
+        "txt_filename": txt_filename
+    }
+
+# Persist jobs and their events, and process them on background workers
+job_store = JobStore(JOB_DB)
+job_manager = JobManager(job_store, process_upload, workers=JOB_WORKERS)
+
+# Remove jobs, uploads and exports that were not accessed for a while
+retention_sweeper = RetentionSweeper(
+    UPLOAD_FOLDER,
+    job_store,
+    ttl_seconds=RETENTION_TTL_HOURS * 3600,
+    max_bytes=RETENTION_MAX_MB * 1024 * 1024,
+    interval_seconds=RETENTION_INTERVAL_MINUTES * 60
+)
+
+# In debug mode the reloader's parent process only watches files; starting
+# workers there would process (and resume) every job twice
+if not (__name__ == '__main__' and WEB_DEBUG and os.environ.get('WERKZEUG_RUN_MAIN') != 'true'):
+    llm_pool.start()
+    embedding_pool.start()
+    if MODEL_WARMUP:
+        model_warmup.start()
+    else:
+        model_warmup.ready.set()
+    job_manager.start()
+    retention_sweeper.start()
+
 # Routes
 @app.route('/')
 def index():
@@ -210,7 +490,7 @@ def index():
 
 @app.route('/upload', methods=['POST'])
 def upload_file():
-    """Handle file upload and processing."""
+    """Handle file upload and queue the analysis job."""
     # Check if a file was uploaded
     if 'pdf' not in request.files:
         return jsonify({"error": "No file part"}), 400
@@ -238,15 +518,14 @@ def upload_file():
     # Return a unique job ID to track this processing task
     job_id = str(uuid.uuid4())
     
-    # Store file info for processing
-    app.config[f'job_{job_id}'] = {
+    # Queue the job; a worker starts generating right away, with or without a client
+    job_manager.submit(job_id, {
         'filepath': filepath,
         'questions': questions,
         'filename': filename,
         'unique_filename': unique_filename,
-        'answers': {},
-        'status': 'processing'
-    }
+        'answers': {}
+    })
     
     return jsonify({
         'success': True,
@@ -256,218 +535,76 @@ def upload_file():
 
 @app.route('/process/<job_id>', methods=['GET'])
 def process_job(job_id):
-    """Process a job incrementally and stream results."""
-    if f'job_{job_id}' not in app.config:
+    """Stream the events of a job, replaying from the given offset."""
+    if job_store.get(job_id) is None:
         return jsonify({"error": "Job not found"}), 404
     
-    job_data = app.config[f'job_{job_id}']
+    job_store.touch(job_id)
+    offset = request.args.get('offset', 0, type=int)
     
-    if job_data['status'] == 'completed':
-        return jsonify({
-            'success': True,
-            'completed': True,
-            'answers': job_data['answers'],
-            'md_filename': job_data.get('md_filename', ''),
-            'txt_filename': job_data.get('txt_filename', '')
-        })
+    def stream_events():
+        for event in job_manager.stream(job_id, offset):
+            yield json.dumps(event) + "\n"
     
-    def generate_results():
-        try:
-            # Process the PDF once
-            pdf_processor = PDFProcessor()
-            document = pdf_processor.load_single_document(job_data['filepath'])
-            
-            if not document:
-                yield json.dumps({
-                    "error": "Failed to process PDF"
-                }) + "\n"
-                return
-            
-            # Create a retriever that returns the full document
-            class FullDocRetriever:
-                def __init__(self, doc):
-                    self.doc = doc
-                    
-                def invoke(self, _query):
-                    return [self.doc]
-            
-            retriever = FullDocRetriever(document)
-            all_answers = {}
-            
-            # Pre-process document once to format it (instead of doing it for each question)
-            docs = retriever.invoke("initial_query")
-            formatted_docs = []
-            for doc in docs:
-                page_number = doc.metadata.get("page", 1)
-                formatted_text = f"""
-=========
-PAGE NUMBER {page_number}
-=========
-{doc.page_content}
-=========
-PAGE END
-========="""
-                formatted_docs.append(formatted_text)
-            
-            context = "\n\n".join(formatted_docs)
-            
-            # Create a single streaming LLM instance to reuse
-            streaming_llm = OllamaLLM(
-                model=pipeline.ollama_llm.model_name,
-                temperature=pipeline.ollama_llm.temperature,
-                num_ctx=pipeline.ollama_llm.num_ctx,
-                streaming=True
-            )
-            
-            # Generate answers for each question incrementally
-            for i, question in enumerate(job_data['questions']):
-                try:
-                    # Signal the start of this question processing
-                    start_result = {
-                        "question_index": i,
-                        "question": question,
-                        "status": "started"
-                    }
-                    yield json.dumps(start_result) + "\n"
-                    
-                    # Select the appropriate prompt template
-                    prompt_template = pipeline.ollama_llm.rag_prompt_template
-                    if question in pipeline.ollama_llm.question_prompts:
-                        prompt_template = pipeline.ollama_llm.question_prompts[question]
-                    
-                    # Prepare inputs
-                    inputs = {
-                        "context": context,
-                        "query": question
-                    }
-                    
-                    # Format prompt with template
-                    prompt = prompt_template.format_prompt(**inputs).to_string()
-                    
-                    # Stream the response
-                    answer = ""
-                    for chunk in streaming_llm.stream(prompt):
-                        answer += chunk
-                        # Send each chunk to the client
-                        chunk_result = {
-                            "question_index": i,
-                            "question": question,
-                            "chunk": chunk,
-                            "status": "streaming"
-                        }
-                        yield json.dumps(chunk_result) + "\n"
-                    
-                    # Signal completion of this question and notify preparation for next question
-                    answer_result = {
-                        "question_index": i,
-                        "question": question,
-                        "answer": answer,
-                        "status": "completed"
-                    }
-                    
-                    # Save the answer in the job data
-                    all_answers[f"question_{i+1}"] = {
-                        "question": question,
-                        "answer": answer
-                    }
-                    
-                    yield json.dumps(answer_result) + "\n"
-                    
-                    # If not the last question, notify the user that we're preparing the next one
-                    if i < len(job_data['questions']) - 1:
-                        prep_result = {
-                            "status": "preparing_next",
-                            "message": "Preparing next question..."
-                        }
-                        yield json.dumps(prep_result) + "\n"
-                    
-                except Exception as e:
-                    print(f"Error processing question {i}: {str(e)}")
-                    error_result = {
-                        "question_index": i,
-                        "question": question,
-                        "error": str(e),
-                        "status": "error"
-                    }
-                    all_answers[f"question_{i+1}"] = {
-                        "question": question,
-                        "answer": f"Error generating answer: {str(e)}"
-                    }
-                    yield json.dumps(error_result) + "\n"
-            
-            # After all questions are processed, create the markdown and text files
-            try:
-                # Create markdown file
-                md_content = format_as_markdown(job_data['filename'], all_answers)
-                md_filename = f"{job_data['unique_filename'].rsplit('.', 1)[0]}.md"
-                md_filepath = os.path.join(app.config['UPLOAD_FOLDER'], md_filename)
-                
-                # Ensure the upload directory exists
-                os.makedirs(os.path.dirname(md_filepath), exist_ok=True)
-                
-                with open(md_filepath, 'w', encoding='utf-8') as f:
-                    f.write(md_content)
-                
-                # Create text file
-                txt_content = format_as_text(job_data['filename'], all_answers)
-                txt_filename = f"{job_data['unique_filename'].rsplit('.', 1)[0]}.txt"
-                txt_filepath = os.path.join(app.config['UPLOAD_FOLDER'], txt_filename)
-                
-                # Ensure the upload directory exists for txt file
-                os.makedirs(os.path.dirname(txt_filepath), exist_ok=True)
-                
-                with open(txt_filepath, 'w', encoding='utf-8') as f:
-                    f.write(txt_content)
-                
-                # Update job status
-                job_data['answers'] = all_answers
-                job_data['md_filename'] = md_filename
-                job_data['txt_filename'] = txt_filename
-                job_data['status'] = 'completed'
-                
-                # Send completion message
-                completion_result = {
-                    "completed": True,
-                    "md_filename": md_filename,
-                    "txt_filename": txt_filename
-                }
-                yield json.dumps(completion_result) + "\n"
-                print(f"Job {job_id} completed successfully")
-                
-            except Exception as e:
-                print(f"Error in file generation phase: {str(e)}")
-                error_msg = {
-                    "error": f"Error generating output files: {str(e)}"
-                }
-                yield json.dumps(error_msg) + "\n"
-                
-                # Even if we have an error, try to send a completion message with any files we did manage to create
-                try:
-                    md_filename = job_data.get('md_filename', '')
-                    txt_filename = job_data.get('txt_filename', '')
-                    
-                    # If we have at least one file, send a completion
-                    if md_filename or txt_filename:
-                        completion_result = {
-                            "completed": True,
-                            "md_filename": md_filename,
-                            "txt_filename": txt_filename,
-                            "partial": True  # Flag that this is a partial completion
-                        }
-                        yield json.dumps(completion_result) + "\n"
-                        print(f"Job {job_id} completed partially with some errors")
-                except Exception as inner_e:
-                    print(f"Failed to send completion message: {str(inner_e)}")
-                
-        except Exception as e:
-            print(f"Unexpected error in generate_results: {str(e)}")
-            error_msg = {
-                "error": f"Unexpected error: {str(e)}"
-            }
-            yield json.dumps(error_msg) + "\n"
+    return Response(stream_with_context(stream_events()), 
+                    mimetype='application/x-ndjson')
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Return the status and results of a job."""
+    job = job_store.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    
+    job_store.touch(job_id)
+    return jsonify({
+        'success': True,
+        'job_id': job_id,
+        'status': job['status'],
+        'completed': job['status'] == COMPLETED,
+        'answers': job.get('answers', {}),
+        'md_filename': job.get('md_filename', ''),
+        'txt_filename': job.get('txt_filename', ''),
+        'error': job.get('error', '')
+    })
+
+@app.route('/query', methods=['POST'])
+def query_documents():
+    """Answer a question about the ingested Akten, streaming the answer as NDJSON."""
+    data = request.get_json(silent=True) or {}
+    query = (data.get('query') or '').strip()
+    if not query:
+        return jsonify({"error": "No query provided"}), 400
+    if not model_warmup.ready.is_set():
+        return jsonify({"error": "Models are still loading, retry shortly"}), 503, {'Retry-After': '10'}
+    
+    def stream_events():
+        for event in pipeline.stream_query(query, data.get('source')):
+            yield json.dumps(query_event_payload(event)) + "\n"
+    
+    return Response(stream_with_context(stream_events()), 
+                    mimetype='application/x-ndjson')
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    """Report whether the models are loaded, for load balancer readiness checks."""
+    stats = model_warmup.stats()
+    return jsonify(stats), 200 if stats['ready'] else 503
+
+@app.route('/status', methods=['GET'])
+def status():
+    """Return job counts, model load times, Ollama host loads, coalesced LLM requests and what the retention sweeper has reclaimed."""
+    jobs = {}
+    for job in job_store.list():
+        jobs[job['status']] = jobs.get(job['status'], 0) + 1
     
-    return Response(stream_with_context(generate_results()), 
-                    mimetype='text/event-stream')
+    return jsonify({
+        'jobs': jobs,
+        'retention': retention_sweeper.stats(),
+        'models': model_warmup.stats(),
+        'ollama': {'llm': llm_pool.stats(), 'embeddings': embedding_pool.stats()},
+        'llm_requests': pipeline.ollama_llm.single_flight.stats() if pipeline.ollama_llm.single_flight else None
+    })
 
 @app.route('/download/<filename>')
 def download(filename):
@@ -479,6 +616,9 @@ def download(filename):
         if not os.path.exists(file_path):
             return jsonify({"error": f"File {filename} not found"}), 404
             
+        # Record the access so retention keeps recently downloaded results
+        os.utime(file_path)
+        
         # Determine mimetype based on extension
         mimetype = 'text/markdown' if filename.endswith('.md') else 'text/plain'
         
@@ -502,6 +642,9 @@ def download_text(filename):
         if not os.path.exists(file_path):
             return jsonify({"error": f"File {txt_filename} not found"}), 404
             
+        # Record the access so retention keeps recently downloaded results
+        os.utime(file_path)
+        
         return send_file(file_path, 
                         mimetype='text/plain', 
                         download_name=txt_filename,